@@ -0,0 +1,188 @@
+# /app/admission.py
+
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict, Optional
+
+from fastapi import Depends, HTTPException, status
+
+from .agents import tutor_intent_needs_llm
+from .dependencies import get_current_user
+from .metrics import registry
+from .schemas import UserIntent
+
+# --- CONFIGURAÇÃO (variáveis de ambiente) ---
+# Requisições que dependem do LLM atendidas ao mesmo tempo. Deve ficar abaixo do threadpool (40 no AnyIO)
+# para sobrar threads para os endpoints baratos (/lessons/answer, /study-plan/*).
+LLM_MAX_CONCURRENT = int(os.getenv("LLM_MAX_CONCURRENT", "16"))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "64"))
+LLM_QUEUE_TIMEOUT_SECONDS = float(os.getenv("LLM_QUEUE_TIMEOUT_SECONDS", "10"))
+LLM_MAX_CONCURRENT_PER_USER = int(os.getenv("LLM_MAX_CONCURRENT_PER_USER", "1"))
+LLM_MAX_QUEUED_PER_USER = int(os.getenv("LLM_MAX_QUEUED_PER_USER", "3"))
+MAX_RETRY_AFTER_SECONDS = 30
+
+admission_queue_depth = registry.gauge("admission_queue_depth", "Requisições aguardando admissão.")
+admission_active = registry.gauge("admission_active", "Requisições admitidas em execução.")
+admission_wait = registry.histogram("admission_wait_seconds", "Tempo de espera na fila de admissão (requisições admitidas).")
+admission_rejected = registry.counter("admission_rejected_total", "Requisições rejeitadas pela admissão, por motivo.")
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, status_code: int, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Limite global de concorrência com fila limitada e fila justa por usuário.
+    Quando uma vaga é liberada, ela vai para o próximo usuário (round-robin) que ainda está abaixo
+    do limite por usuário, e não para quem enfileirou mais requisições.
+    Roda no event loop: quem espera não ocupa uma thread do threadpool.
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, queue_timeout: float,
+                 max_concurrent_per_user: int, max_queued_per_user: int):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.max_concurrent_per_user = max_concurrent_per_user
+        self.max_queued_per_user = max_queued_per_user
+        self.active = 0
+        self.queued = 0
+        self._active_by_user: Dict[str, int] = {}
+        self._waiters: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+        # Média móvel do tempo de serviço, usada para prever a espera e calcular o Retry-After
+        self._avg_service_seconds = 1.0
+
+    def _can_run(self, user_id: str) -> bool:
+        return self.active < self.max_concurrent and self._active_by_user.get(user_id, 0) < self.max_concurrent_per_user
+
+    def _grant(self, user_id: str) -> None:
+        self.active += 1
+        self._active_by_user[user_id] = self._active_by_user.get(user_id, 0) + 1
+
+    def _estimated_wait(self) -> float:
+        return (self.queued + 1) / self.max_concurrent * self._avg_service_seconds
+
+    def _retry_after(self) -> int:
+        return min(MAX_RETRY_AFTER_SECONDS, max(1, math.ceil(self._estimated_wait())))
+
+    def _reject(self, status_code: int, reason: str) -> AdmissionRejected:
+        admission_rejected.inc(controller=self.name, reason=reason)
+        return AdmissionRejected(status_code, reason, self._retry_after())
+
+    async def acquire(self, user_id: str) -> None:
+        # Com vagas livres, quem está na fila está bloqueado pelo limite por usuário: não há por que furar a fila.
+        if self._can_run(user_id):
+            self._grant(user_id)
+            admission_wait.observe(0.0, controller=self.name)
+            return
+        user_waiters = self._waiters.get(user_id)
+        if user_waiters and len(user_waiters) >= self.max_queued_per_user:
+            raise self._reject(status.HTTP_429_TOO_MANY_REQUESTS, "user_queue_full")
+        if self.queued >= self.max_queue:
+            raise self._reject(status.HTTP_503_SERVICE_UNAVAILABLE, "queue_full")
+        if self._estimated_wait() > self.queue_timeout:
+            # Falha rápida: não adianta esperar se a previsão já estoura o prazo da fila.
+            raise self._reject(status.HTTP_503_SERVICE_UNAVAILABLE, "predicted_timeout")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(user_id, deque()).append(waiter)
+        self.queued += 1
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if not waiter.done():
+                self._abandon(user_id, waiter)
+                raise self._reject(status.HTTP_503_SERVICE_UNAVAILABLE, "queue_timeout")
+            # A vaga foi concedida no mesmo instante do timeout: segue admitido.
+        except BaseException:
+            # Cliente desconectou (cancelamento) enquanto esperava
+            if waiter.done() and not waiter.cancelled():
+                self.release(user_id)
+            else:
+                self._abandon(user_id, waiter)
+            raise
+        admission_wait.observe(time.monotonic() - started, controller=self.name)
+
+    def _abandon(self, user_id: str, waiter: asyncio.Future) -> None:
+        waiter.cancel()
+        user_waiters = self._waiters.get(user_id)
+        if user_waiters and waiter in user_waiters:
+            user_waiters.remove(waiter)
+            self.queued -= 1
+            if not user_waiters:
+                del self._waiters[user_id]
+
+    def release(self, user_id: str, service_seconds: Optional[float] = None) -> None:
+        self.active -= 1
+        remaining = self._active_by_user.get(user_id, 1) - 1
+        if remaining:
+            self._active_by_user[user_id] = remaining
+        else:
+            self._active_by_user.pop(user_id, None)
+        if service_seconds is not None:
+            self._avg_service_seconds = 0.8 * self._avg_service_seconds + 0.2 * service_seconds
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        for user_id in list(self._waiters):
+            if self.active >= self.max_concurrent:
+                return
+            if not self._can_run(user_id):
+                continue
+            user_waiters = self._waiters.pop(user_id)
+            waiter = user_waiters.popleft()
+            self.queued -= 1
+            if user_waiters:
+                # Volta para o fim da fila de usuários (round-robin)
+                self._waiters[user_id] = user_waiters
+            self._grant(user_id)
+            waiter.set_result(None)
+
+    def collect(self) -> None:
+        admission_queue_depth.set(self.queued, controller=self.name)
+        admission_active.set(self.active, controller=self.name)
+
+
+llm_admission = AdmissionController(
+    "llm", max_concurrent=LLM_MAX_CONCURRENT, max_queue=LLM_MAX_QUEUE, queue_timeout=LLM_QUEUE_TIMEOUT_SECONDS,
+    max_concurrent_per_user=LLM_MAX_CONCURRENT_PER_USER, max_queued_per_user=LLM_MAX_QUEUED_PER_USER)
+registry.add_collector(llm_admission.collect)
+
+
+@asynccontextmanager
+async def llm_slot(user_id: str) -> AsyncIterator[None]:
+    """ Ocupa uma vaga do LLM durante o bloco: espera na fila ou responde 429/503 com Retry-After. """
+    try:
+        await llm_admission.acquire(user_id)
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=f"Servidor ocupado ({e.reason}). Tente novamente em instantes.",
+                            headers={"Retry-After": str(e.retry_after)})
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        llm_admission.release(user_id, time.monotonic() - started)
+
+
+async def admit_tutor_intent(intent: UserIntent, user_id: str = Depends(get_current_user)):
+    """
+    Dependência do /tutor/interact: só as interações que podem chamar o LLM passam pela admissão
+    (app.agents.tutor_intent_needs_llm). Assim, um duplo clique se junta à geração em curso e completar
+    a lição não espera atrás das gerações dos outros alunos.
+    """
+    if not tutor_intent_needs_llm(user_id, intent):
+        yield user_id
+        return
+    async with llm_slot(user_id):
+        yield user_id
@@ -1,45 +1,174 @@
 # /app/agents.py
 
 from supabase.client import Client
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
-from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_core.output_parsers import StrOutputParser, JsonOutputParser
-from langchain_core.messages import AIMessage, HumanMessage
 from pydantic import BaseModel, Field
-from typing import Literal, List, Optional, Dict, Any, Tuple
+from typing import Literal, List, Optional, Dict, Any, Tuple, Callable, TYPE_CHECKING
 import random
 import json
+import hashlib
+import math
+import os
+import socket
+import uuid
+import re
+import time
+import unicodedata
 
 from .schemas import UserIntent, AIResponse, Lesson
+from .cache import TTLCache
+from .semantic_cache import SemanticResponseCache
+from .prefetch import schedule_next_lesson, take_ready_lesson, mastery_snapshot
+from .mastery import mastery_store
+from .seen_units import SeenUnits
+from .topic_index import get_topic_vocabulary
+from .tracing import span, traced
+from .log import get_logger, SAMPLED
+from .metrics import planner_attempts, planner_results, answers_graded, register_cache
+from .single_flight import SingleFlight
+from .hedging import hedged_invoke
+from .deadline import has_budget, remaining, expected_duration
+from .circuit_breaker import CircuitOpenError, openai_breaker, match_learning_units_breaker
+# LangChain/OpenAI (~1 s de import) só são carregados no primeiro uso ou pelo warm-up em background
+# (import_llm_stack): os endpoints que não usam o LLM ficam prontos sem esperar por eles.
+if TYPE_CHECKING:
+    from langchain_openai import OpenAIEmbeddings
 from .database import (
-    get_active_lesson, update_lesson_status, get_student_mastery_summary,
+    get_active_lesson, get_student_mastery_summary,
     get_recently_seen_units, get_learning_units_by_similarity, save_lesson,
     get_learning_unit_by_id, save_performance_record, save_tutor_message,
     save_conversation_turn, get_conversation_history, get_learning_units_by_topic,
-    mark_lesson_units_as_seen, get_units_by_dependency, get_all_topics_for_level
+    complete_lesson, get_units_by_dependency, get_all_topics_for_level, get_student_level,
+    try_acquire_lesson_generation_lock, release_lesson_generation_lock
 )
 
 # --- CONSTANTES DE CONFIGURAÇÃO ---
 MINIMUM_UNITS_FOR_LESSON = 4
 RECENTLY_SEEN_DAYS = 14
 WEAKNESS_FOCUS_PROBABILITY = 0.7
+ROUTER_CACHE_SIZE = 2048
+ROUTER_CACHE_TTL_SECONDS = 600
+ROUTER_CACHE_HISTORY_TURNS = 2
+DEFAULT_LEVEL = "A1"
+# "local": uma geração por aluno dentro deste processo; "supabase": também entre workers (sql/lesson_generation_locks.sql)
+LESSON_LOCK_BACKEND = os.getenv("LESSON_LOCK_BACKEND", "local").lower()
+LESSON_LOCK_TTL_SECONDS = 60
+LESSON_LOCK_POLL_SECONDS = 0.5
+# Margem sobre a duração estimada da busca semântica antes de considerar que ela cabe no prazo da requisição
+PLANNER_BUDGET_SAFETY_FACTOR = 1.5
+# Timeout mínimo das chamadas ao LLM limitadas pelo prazo da requisição
+LLM_MIN_TIMEOUT_SECONDS = 0.1
+BUDGET_UNIT_TYPES = ["exercise", "grammar_rule", "review_exercise"]
+# Funil geral: (tier, descrição, exclui strong_topics, exclui seen_units, título da lição, rótulo do log)
+GENERAL_FUNNEL_TIERS = [
+    ("general_ideal", "Tentativa 1 (Geral): Busca Dinâmica Ideal (filtros: strong_topics, seen_units)", True, True, "Sua Lição de Revisão Inteligente", "Lição de revisão ideal"),
+    ("general_reliable", "Tentativa 2 (Geral): Busca Dinâmica Confiável (filtro: seen_units)", False, True, "Sua Lição de Revisão", "Lição de revisão confiável"),
+    ("general_fallback", "Tentativa 3 (Geral): Busca Dinâmica 'Não Falha' (sem filtros)", False, False, "Sua Nova Lição", "Lição 'Não Falha'"),
+]
+
+logger = get_logger(__name__)
+
+# Cache das decisões do roteador: (mensagem normalizada, hash do histórico recente) -> TopicRouter
+_router_cache = TTLCache("router", maxsize=ROUTER_CACHE_SIZE, ttl=ROUTER_CACHE_TTL_SECONDS)
+# Cache semântico das respostas do tutor para perguntas conceituais que não dependem do histórico
+_semantic_response_cache = SemanticResponseCache()
+# Gerações de lição em andamento por aluno (duplo clique / retry do cliente se juntam à execução em curso)
+_lesson_generation = SingleFlight("lesson_generation")
+# Últimos candidatos da busca semântica por (nível, tópico de foco): matéria-prima do caminho barato quando o prazo aperta
+_semantic_candidates_cache = TTLCache("semantic_candidates", maxsize=2048, ttl=3600)
+register_cache(_router_cache.stats)
+register_cache(_semantic_response_cache.stats)
+register_cache(_semantic_candidates_cache.stats)
 
 class TopicRouter(BaseModel):
     tool_name: Literal["plan_new_lesson", "general_conversation"]
     topic_tag: str = Field(default="general-practice", description="O tópico normalizado em inglês ou 'general-practice'.")
+    needs_history: bool = Field(default=True, description="false apenas se a mensagem for uma pergunta autocontida que pode ser respondida sem o histórico da conversa.")
+
+def import_llm_stack() -> None:
+    """ Importa a pilha do LLM. Chamada em uma thread de background na subida da aplicação (main.lifespan). """
+    import langchain_openai, langchain_core.prompts, langchain_core.output_parsers, langchain_core.messages  # noqa: F401
+
+def warm_up_llm(target: str) -> None:
+    """
+    Cria os clientes da OpenAI (chat e embeddings) e faz uma invocação de teste do chain `target`
+    ("router", "conversation" ou "semantic_query"; "none" só cria os clientes). Usada no warm-up da subida
+    (app/warmup.py): abre o pool HTTP/TLS compartilhado pelos clientes antes da primeira requisição.
+    Fora de span e do hedging, para que a chamada fria não entre nas estimativas de duração.
+    """
+    _create_embeddings()
+    chains = {
+        "router": (_create_topic_router_chain, {"user_message": "Olá", "history": []}),
+        "conversation": (_create_conversational_chain, {"user_message": "Olá", "history": []}),
+        "semantic_query": (_create_semantic_query_chain, {"lesson_focus": "greetings", "weak_topics": "Nenhum", "strong_topics": "Nenhum"}),
+    }
+    if target == "none":
+        return
+    if target not in chains:
+        raise ValueError(f"alvo de warm-up desconhecido: '{target}'")
+    create_chain, inputs = chains[target]
+    with openai_breaker.guard():
+        create_chain().invoke(inputs)
 
 def _create_topic_router_chain():
+    from langchain_openai import ChatOpenAI
+    from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+    from langchain_core.output_parsers import JsonOutputParser
     llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
     parser = JsonOutputParser(pydantic_object=TopicRouter)
     prompt_template = ChatPromptTemplate.from_messages([
-        ("system", f"Você é um assistente de IA que analisa a mensagem de um usuário e a roteia para a ferramenta correta, extraindo uma tag de tópico normalizada. Responda APENAS com um objeto JSON formatado de acordo com o seguinte esquema: {{format_instructions}}. Regras para 'topic_tag': - A tag deve ser em inglês, minúscula e com espaços (ex: 'simple present'). NÃO use hífens. - Se nenhum tópico for encontrado, use 'general-practice'."),
+        ("system", f"Você é um assistente de IA que analisa a mensagem de um usuário e a roteia para a ferramenta correta, extraindo uma tag de tópico normalizada. Responda APENAS com um objeto JSON formatado de acordo com o seguinte esquema: {{format_instructions}}. Regras para 'topic_tag': - A tag deve ser em inglês, minúscula e com espaços (ex: 'simple present'). NÃO use hífens. - Se nenhum tópico for encontrado, use 'general-practice'. Regras para 'needs_history': - Use false somente para perguntas conceituais autocontidas (ex: 'qual a diferença entre do e does?'); na dúvida, use true."),
         MessagesPlaceholder(variable_name="history"),
         ("human", "Mensagem do usuário: {user_message}")
     ])
     prompt_with_instructions = prompt_template.partial(format_instructions=parser.get_format_instructions())
     return prompt_with_instructions | llm | parser
 
+def _normalize_user_message(text: str) -> str:
+    normalized = unicodedata.normalize("NFKC", text).lower()
+    normalized = re.sub(r"\s+", " ", normalized)
+    return normalized.strip(" .,!?;:'\"")
+
+def _router_cache_key(user_message: str, history_raw: List[Dict]) -> Tuple[str, str]:
+    # O último turno do histórico é a própria mensagem do usuário (já salva); usamos os turnos anteriores.
+    previous_turns = history_raw[:-1][-ROUTER_CACHE_HISTORY_TURNS:] if history_raw else []
+    context = "\n".join(f"{h['role']}:{_normalize_user_message(h['content'])}" for h in previous_turns)
+    return _normalize_user_message(user_message), hashlib.sha1(context.encode("utf-8")).hexdigest()[:12]
+
+def _route_user_message(user_message: str, history_raw: List[Dict], history_langchain: list) -> Dict[str, Any]:
+    key = _router_cache_key(user_message, history_raw)
+    cached = _router_cache.get(key)
+    if cached is not None:
+        stats = _router_cache.stats()
+        logger.info("[ROUTER CACHE] HIT para '%s' (taxa de acerto: %.0f%%, ~%.1fs economizados)", key[0], stats['hit_rate'] * 100, stats['saved_seconds'], extra=SAMPLED)
+        return dict(cached)
+    started = time.perf_counter()
+    with span("llm.router"), openai_breaker.guard():
+        router_result = hedged_invoke("router", _create_topic_router_chain(), {"user_message": user_message, "history": history_langchain})
+    _router_cache.record_miss_cost(time.perf_counter() - started)
+    if isinstance(router_result, dict) and router_result.get('tool_name'):
+        _router_cache.set(key, dict(router_result))
+    return router_result
+
+def _answer_standalone_question(user_message: str, level: str) -> str:
+    """
+    Responde a uma pergunta que não depende do histórico, consultando antes o cache semântico.
+    A resposta é gerada sem histórico para que possa ser reaproveitada por outros alunos do mesmo nível.
+    """
+    with span("llm.embeddings"), openai_breaker.guard():
+        question_embedding = _create_embeddings().embed_query(user_message)
+    cached = _semantic_response_cache.lookup(level, question_embedding)
+    if cached:
+        logger.info("[SEMANTIC CACHE] HIT (similaridade %.3f) com a pergunta '%s'", cached['score'], cached['question'], extra=SAMPLED)
+        return cached['answer']
+    with span("llm.conversation"), openai_breaker.guard():
+        response_text = _create_conversational_chain().invoke({"user_message": user_message, "history": []})
+    _semantic_response_cache.store(level, user_message, question_embedding, response_text)
+    return response_text
+
 def _create_conversational_chain():
+    from langchain_openai import ChatOpenAI
+    from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+    from langchain_core.output_parsers import StrOutputParser
     llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.7)
     prompt = ChatPromptTemplate.from_messages([
         ("system", "You are 'Alex', a friendly English tutor. Respond to the user in Brazilian Portuguese, considering the conversation history. Your main goal is the student's pedagogical progress. Be encouraging and brief."),
@@ -48,8 +177,21 @@ def _create_conversational_chain():
     ])
     return prompt | llm | StrOutputParser()
 
-def _create_semantic_query_chain() -> ChatPromptTemplate:
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.2)
+def _deadline_client_options() -> Dict[str, Any]:
+    """
+    Opções dos clientes da OpenAI dentro de uma requisição: o que resta do prazo vira o timeout da chamada,
+    sem retentativas. Fora de requisições (prefetch, warm-up) valem os padrões do cliente.
+    """
+    budget = remaining()
+    if budget == math.inf:
+        return {}
+    return {"timeout": max(budget, LLM_MIN_TIMEOUT_SECONDS), "max_retries": 0}
+
+def _create_semantic_query_chain(**client_options):
+    from langchain_openai import ChatOpenAI
+    from langchain_core.prompts import ChatPromptTemplate
+    from langchain_core.output_parsers import StrOutputParser
+    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.2, **client_options)
     prompt_template = ChatPromptTemplate.from_messages([
         ("system", "You are an English Curriculum Designer. Based on the requested focus, create a SINGLE descriptive sentence for a semantic search. Focus of the lesson: {lesson_focus}. Student's weak topics (for context, not necessarily for focus): {weak_topics}. Student's strong topics (to be avoided if possible): {strong_topics}. OUTPUT: ONLY the sentence for the semantic search."),
         ("human", "Generate the semantic query.")
@@ -62,6 +204,13 @@ def _build_and_save_lesson(supabase: Client, user_id: str, title: str, objective
     if not lesson_id: return None
     return {"lesson_id": lesson_id, "title": title, "objective": objective, "lesson_items": items}
 
+def _create_embeddings(**client_options) -> "OpenAIEmbeddings":
+    from langchain_openai import OpenAIEmbeddings
+    return OpenAIEmbeddings(**client_options)
+
+def _lesson_draft(title: str, objective: str, items: List[Dict[str, Any]], performance: Dict, planning_path: str) -> Dict[str, Any]:
+    return {"title": title, "objective": objective, "lesson_items": items, "mastery": mastery_snapshot(performance), "planning_path": planning_path}
+
 def _get_next_focus_topic(performance: dict, all_level_topics: list) -> Tuple[str, str]:
     weak_topics = performance.get('weak_topics', [])
     strong_topics = performance.get('strong_topics', [])
@@ -69,46 +218,88 @@ def _get_next_focus_topic(performance: dict, all_level_topics: list) -> Tuple[st
     unpracticed_topics = [t for t in all_level_topics if t not in practiced_topics]
     if weak_topics and random.random() < WEAKNESS_FOCUS_PROBABILITY:
         focus = random.choice(weak_topics)
-        print(f"--- [FOCUS DECISION] Estratégia: Foco em Ponto Fraco. Tópico: '{focus}'")
+        logger.info("[FOCUS DECISION] Estratégia: Foco em Ponto Fraco. Tópico: '%s'", focus, extra=SAMPLED)
         return focus, "weakness_focus"
     if unpracticed_topics:
         focus = random.choice(unpracticed_topics)
-        print(f"--- [FOCUS DECISION] Estratégia: Descoberta. Tópico novo: '{focus}'")
+        logger.info("[FOCUS DECISION] Estratégia: Descoberta. Tópico novo: '%s'", focus, extra=SAMPLED)
         return focus, "discovery"
     if weak_topics:
         focus = random.choice(weak_topics)
-        print(f"--- [FOCUS DECISION] Estratégia: Fallback para Ponto Fraco. Tópico: '{focus}'")
+        logger.info("[FOCUS DECISION] Estratégia: Fallback para Ponto Fraco. Tópico: '%s'", focus, extra=SAMPLED)
         return focus, "weakness_focus"
-    print("--- [FOCUS DECISION] Estratégia: Revisão Geral.")
+    logger.info("[FOCUS DECISION] Estratégia: Revisão Geral.", extra=SAMPLED)
     return "general review of all topics", "general_review"
 
-def _find_semantic_lesson(supabase: Client, user_id: str, level: str, performance: Dict, seen_units_ids: set, all_level_topics: list, exclude_strong_topics: bool, exclude_seen_units: bool) -> Optional[Tuple[List[Dict[str, Any]], str]]:
+def _select_lesson_units(candidate_units: List[Dict[str, Any]], level: str, performance: Dict, seen_units: SeenUnits, strong_topics: List[str], exclude_seen_units: bool) -> Optional[List[Dict[str, Any]]]:
+    if exclude_seen_units:
+        candidate_units = [u for u in candidate_units if u.get('id') not in seen_units]
+    vocabulary = get_topic_vocabulary(level)
+    candidates = list(zip(candidate_units, vocabulary.unit_masks(candidate_units)))
+    if strong_topics:
+        strong_mask = vocabulary.mask_of(strong_topics)
+        candidates = [(u, m) for u, m in candidates if not m & strong_mask]
+    if len(candidates) < MINIMUM_UNITS_FOR_LESSON:
+        return None
+    k = min(len(candidates), 6)
+    # Prioriza as unidades que cobrem mais tópicos fracos; empates são desfeitos aleatoriamente.
+    weak_mask = vocabulary.mask_of(performance.get('weak_topics', []))
+    candidates.sort(key=lambda pair: ((pair[1] & weak_mask).bit_count(), random.random()), reverse=True)
+    return [u for u, _ in candidates[:k]]
+
+def _find_semantic_lesson(supabase: Client, user_id: str, level: str, performance: Dict, seen_units: SeenUnits, all_level_topics: list, exclude_strong_topics: bool, exclude_seen_units: bool) -> Optional[Tuple[List[Dict[str, Any]], str]]:
     focus_topic, focus_type = _get_next_focus_topic(performance, all_level_topics)
     strong_topics = performance.get('strong_topics', []) if exclude_strong_topics else []
-    query_chain = _create_semantic_query_chain()
-    semantic_query = query_chain.invoke({"lesson_focus": focus_topic, "weak_topics": ", ".join(performance.get('weak_topics', []) or ["Nenhum"]), "strong_topics": ", ".join(strong_topics or ["Nenhum"])})
-    print(f"--- [PLANNER] Query Semântica gerada: '{semantic_query}' ---")
-    embeddings = OpenAIEmbeddings()
-    query_embedding = embeddings.embed_query(semantic_query)
+    client_options = _deadline_client_options()
+    query_chain = _create_semantic_query_chain(**client_options)
+    with span("llm.semantic_query"), openai_breaker.guard(client_options.get("timeout", math.inf)):
+        semantic_query = hedged_invoke("semantic_query", query_chain, {"lesson_focus": focus_topic, "weak_topics": ", ".join(performance.get('weak_topics', []) or ["Nenhum"]), "strong_topics": ", ".join(strong_topics or ["Nenhum"])})
+    logger.info("[PLANNER] Query Semântica gerada: '%s'", semantic_query, extra=SAMPLED)
+    client_options = _deadline_client_options()
+    embeddings = _create_embeddings(**client_options)
+    with span("llm.embeddings"), openai_breaker.guard(client_options.get("timeout", math.inf)):
+        query_embedding = embeddings.embed_query(semantic_query)
     candidate_units = get_learning_units_by_similarity(supabase, query_embedding, level, count=50)
-    if exclude_strong_topics:
-        candidate_units = [u for u in candidate_units if not set(u.get('metadata', {}).get('topic', [])).intersection(set(strong_topics))]
-    if exclude_seen_units:
-        candidate_units = [u for u in candidate_units if u.get('id') not in seen_units_ids]
-    if len(candidate_units) >= MINIMUM_UNITS_FOR_LESSON:
-        k = min(len(candidate_units), 6)
-        return random.sample(candidate_units, k), semantic_query
-    return None, None
+    if candidate_units:
+        _semantic_candidates_cache.set((level, focus_topic), (candidate_units, semantic_query))
+    lesson_items = _select_lesson_units(candidate_units, level, performance, seen_units, strong_topics, exclude_seen_units)
+    return (lesson_items, semantic_query) if lesson_items else (None, None)
 
-def tool_plan_new_lesson(supabase: Client, user_id: str, topic_tag: str, level: str = "A1") -> Optional[Dict]:
-    print(f"\n--- [DYNAMIC FUNNEL PLANNER V5.0] --- Tópico: '{topic_tag}' ---")
+def _find_lesson_within_budget(supabase: Client, level: str, performance: Dict, seen_units: SeenUnits, all_level_topics: list) -> Tuple[Optional[List[Dict[str, Any]]], Optional[str], str]:
+    """
+    Caminho barato, sem LLM nem embeddings: reaproveita os candidatos semânticos em cache para o tópico de foco
+    ou, na falta deles, busca as unidades do tópico direto no banco.
+    """
+    focus_topic, _ = _get_next_focus_topic(performance, all_level_topics)
+    cached = _semantic_candidates_cache.get((level, focus_topic))
+    if cached:
+        candidate_units, objective = cached
+        path = "budget_cached_candidates"
+    else:
+        if focus_topic not in all_level_topics and all_level_topics:
+            focus_topic = random.choice(all_level_topics)
+        candidate_units = get_learning_units_by_topic(supabase, focus_topic, level, BUDGET_UNIT_TYPES, count=20)
+        objective = f"Uma revisão rápida sobre {focus_topic}."
+        path = "budget_topic_index"
+    for exclude_seen_units in (True, False):
+        lesson_items = _select_lesson_units(candidate_units, level, performance, seen_units, [], exclude_seen_units)
+        if lesson_items:
+            return lesson_items, objective, path
+    return None, None, path
+
+@traced("planner.plan_lesson")
+def _plan_lesson(supabase: Client, user_id: str, topic_tag: str, level: str = "A1") -> Optional[Dict]:
+    """ Executa o funil de planejamento e devolve o rascunho da lição, sem salvá-lo. """
+    from openai import APITimeoutError
+    logger.info("[DYNAMIC FUNNEL PLANNER V5.0] Tópico: '%s'", topic_tag, extra=SAMPLED)
     performance = get_student_mastery_summary(supabase, user_id)
-    seen_units_ids = get_recently_seen_units(supabase, user_id, days_ago=RECENTLY_SEEN_DAYS)
+    seen_units = get_recently_seen_units(supabase, user_id, days_ago=RECENTLY_SEEN_DAYS)
     if topic_tag != 'general-practice':
-        print(f"--- [PLANNER] Tentativa 1 (Específica): Buscando Âncora para '{topic_tag}'...")
+        logger.info("[PLANNER] Tentativa 1 (Específica): Buscando Âncora para '%s'...", topic_tag, extra=SAMPLED)
+        planner_attempts.inc(tier="specific_anchor")
         anchor_types = ["read_and_answer", "dialogue"]
         anchors = get_learning_units_by_topic(supabase, topic_tag, level, anchor_types, count=10)
-        valid_anchors = [u for u in anchors if u.get('id') not in seen_units_ids]
+        valid_anchors = [u for u in anchors if u.get('id') not in seen_units]
         if valid_anchors:
             anchor = random.choice(valid_anchors)
             dependencies = get_units_by_dependency(supabase, anchor['id'], level)
@@ -116,96 +307,194 @@ def tool_plan_new_lesson(supabase: Client, user_id: str, topic_tag: str, level:
             if len(lesson_items) >= MINIMUM_UNITS_FOR_LESSON:
                 title = anchor.get('content', {}).get('title', f"Lição sobre {topic_tag.title()}")
                 objective = f"Praticar '{topic_tag.title()}' com base em um texto de exemplo."
-                print(f"--- [PLANNER] SUCESSO! Lição contextual encontrada com {len(lesson_items)} itens.")
-                return _build_and_save_lesson(supabase, user_id, title, objective, lesson_items)
-        print(f"--- [PLANNER] Tentativa 2 (Específica): Buscando exercícios para '{topic_tag}'...")
+                logger.info("[PLANNER] SUCESSO! Lição contextual encontrada com %d itens.", len(lesson_items), extra=SAMPLED)
+                planner_results.inc(tier="specific_anchor")
+                return _lesson_draft(title, objective, lesson_items, performance, "specific_anchor")
+        logger.info("[PLANNER] Tentativa 2 (Específica): Buscando exercícios para '%s'...", topic_tag, extra=SAMPLED)
+        planner_attempts.inc(tier="specific_exercises")
         exercise_types = ["exercise", "grammar_rule", "review_exercise"]
         exercises = get_learning_units_by_topic(supabase, topic_tag, level, exercise_types, count=20)
-        valid_exercises = [u for u in exercises if u.get('id') not in seen_units_ids]
+        valid_exercises = [u for u in exercises if u.get('id') not in seen_units]
         if len(valid_exercises) >= MINIMUM_UNITS_FOR_LESSON:
             k = min(len(valid_exercises), 5)
             lesson_items = random.sample(valid_exercises, k)
             title = f"Exercícios de {topic_tag.title()}"
             objective = f"Uma série de exercícios para reforçar seu conhecimento sobre {topic_tag}."
-            print(f"--- [PLANNER] SUCESSO! Lição de exercícios focados encontrada com {len(lesson_items)} itens.")
-            return _build_and_save_lesson(supabase, user_id, title, objective, lesson_items)
+            logger.info("[PLANNER] SUCESSO! Lição de exercícios focados encontrada com %d itens.", len(lesson_items), extra=SAMPLED)
+            planner_results.inc(tier="specific_exercises")
+            return _lesson_draft(title, objective, lesson_items, performance, "specific_exercises")
 
-    print("--- [PLANNER] Iniciando funil de lição geral...")
+    logger.info("[PLANNER] Iniciando funil de lição geral...", extra=SAMPLED)
     all_level_topics = get_all_topics_for_level(supabase, level)
-    print("--- [PLANNER] Tentativa 1 (Geral): Busca Dinâmica Ideal (filtros: strong_topics, seen_units)...")
-    lesson_items, objective = _find_semantic_lesson(supabase, user_id, level, performance, seen_units_ids, all_level_topics, exclude_strong_topics=True, exclude_seen_units=True)
-    if lesson_items:
-        print(f"--- [PLANNER] SUCESSO! Lição de revisão ideal encontrada com {len(lesson_items)} itens.")
-        return _build_and_save_lesson(supabase, user_id, "Sua Lição de Revisão Inteligente", objective, lesson_items)
-    print("--- [PLANNER] Tentativa 2 (Geral): Busca Dinâmica Confiável (filtro: seen_units)...")
-    lesson_items, objective = _find_semantic_lesson(supabase, user_id, level, performance, seen_units_ids, all_level_topics, exclude_strong_topics=False, exclude_seen_units=True)
-    if lesson_items:
-        print(f"--- [PLANNER] SUCESSO! Lição de revisão confiável encontrada com {len(lesson_items)} itens.")
-        return _build_and_save_lesson(supabase, user_id, "Sua Lição de Revisão", objective, lesson_items)
-    print("--- [PLANNER] Tentativa 3 (Geral): Busca Dinâmica 'Não Falha' (sem filtros)...")
-    lesson_items, objective = _find_semantic_lesson(supabase, user_id, level, performance, seen_units_ids, all_level_topics, exclude_strong_topics=False, exclude_seen_units=False)
-    if lesson_items:
-        print(f"--- [PLANNER] SUCESSO! Lição 'Não Falha' encontrada com {len(lesson_items)} itens.")
-        return _build_and_save_lesson(supabase, user_id, "Sua Nova Lição", objective, lesson_items)
-    print("--- [PLANNER] FALHA CRÍTICA: Não foi possível montar nenhuma lição.")
+    get_topic_vocabulary(level).load_topics(all_level_topics)
+    semantic_cost = expected_duration("llm.semantic_query", "llm.embeddings", "db.get_learning_units_by_similarity") * PLANNER_BUDGET_SAFETY_FACTOR
+    degraded = False
+    for tier, description, exclude_strong_topics, exclude_seen_units, title, label in GENERAL_FUNNEL_TIERS:
+        if openai_breaker.is_open() or match_learning_units_breaker.is_open():
+            logger.warning("[PLANNER] Circuito da OpenAI ou do 'match_learning_units' aberto; usando o caminho barato.")
+            planner_attempts.inc(tier="circuit_open")
+            degraded = True
+            break
+        if not has_budget(semantic_cost):
+            logger.warning("[PLANNER] Prazo insuficiente para a busca semântica (restam %.2fs, estimado %.2fs); usando o caminho barato.", remaining(), semantic_cost)
+            planner_attempts.inc(tier="budget")
+            degraded = True
+            break
+        logger.info("[PLANNER] %s...", description, extra=SAMPLED)
+        planner_attempts.inc(tier=tier)
+        try:
+            lesson_items, objective = _find_semantic_lesson(supabase, user_id, level, performance, seen_units, all_level_topics, exclude_strong_topics=exclude_strong_topics, exclude_seen_units=exclude_seen_units)
+        except CircuitOpenError as e:
+            logger.warning("[PLANNER] %s; usando o caminho barato.", e)
+            planner_attempts.inc(tier="circuit_open")
+            degraded = True
+            break
+        except APITimeoutError:
+            logger.warning("[PLANNER] A busca semântica estourou o prazo da requisição; usando o caminho barato.")
+            planner_attempts.inc(tier="budget")
+            degraded = True
+            break
+        if lesson_items:
+            logger.info("[PLANNER] SUCESSO! %s encontrada com %d itens.", label, len(lesson_items), extra=SAMPLED)
+            planner_results.inc(tier=tier)
+            return _lesson_draft(title, objective, lesson_items, performance, tier)
+    if degraded:
+        lesson_items, objective, path = _find_lesson_within_budget(supabase, level, performance, seen_units, all_level_topics)
+        if lesson_items:
+            logger.info("[PLANNER] SUCESSO! Lição rápida (%s) encontrada com %d itens.", path, len(lesson_items), extra=SAMPLED)
+            planner_results.inc(tier=path)
+            return _lesson_draft("Sua Lição Rápida de Revisão", objective, lesson_items, performance, path)
+    logger.error("[PLANNER] FALHA CRÍTICA: Não foi possível montar nenhuma lição.")
+    planner_results.inc(tier="none")
     return None
 
+def tool_plan_new_lesson(supabase: Client, user_id: str, topic_tag: str, level: str = "A1") -> Optional[Dict]:
+    draft = _plan_lesson(supabase, user_id, topic_tag, level)
+    if not draft: return None
+    lesson = _build_and_save_lesson(supabase, user_id, draft['title'], draft['objective'], draft['lesson_items'])
+    if lesson: lesson['planning_path'] = draft['planning_path']
+    return lesson
+
+def _activate_prefetched_lesson(supabase: Client, user_id: str) -> Optional[Dict]:
+    """ Salva e devolve a lição pré-gerada em background, se ainda for válida para a maestria atual. """
+    draft = take_ready_lesson(user_id, lambda: mastery_snapshot(get_student_mastery_summary(supabase, user_id)))
+    if not draft: return None
+    logger.info("[PREFETCH] Ativando lição pré-gerada para o usuário %s.", user_id)
+    lesson = _build_and_save_lesson(supabase, user_id, draft['title'], draft['objective'], draft['lesson_items'])
+    if lesson: lesson['planning_path'] = "prefetched"
+    return lesson
+
+def _plan_with_worker_lock(supabase: Client, user_id: str, plan: Callable[[], Optional[Dict]]) -> Tuple[str, Optional[Dict]]:
+    """ Só um worker gera a lição do aluno; os demais esperam a lição aparecer como ativa. """
+    owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    deadline = time.monotonic() + LESSON_LOCK_TTL_SECONDS
+    while True:
+        if try_acquire_lesson_generation_lock(supabase, user_id, owner, LESSON_LOCK_TTL_SECONDS):
+            try:
+                return "new", plan()
+            finally:
+                release_lesson_generation_lock(supabase, user_id, owner)
+        if time.monotonic() >= deadline:
+            return "new", None
+        logger.info("[SINGLE FLIGHT] Outro worker está gerando a lição do usuário %s; aguardando.", user_id)
+        time.sleep(LESSON_LOCK_POLL_SECONDS)
+        active_lesson_data = get_active_lesson(supabase, user_id)
+        if active_lesson_data:
+            return "new", active_lesson_data
+
+def _get_or_generate_lesson(supabase: Client, user_id: str, plan: Callable[[], Optional[Dict]]) -> Tuple[str, Optional[Dict]]:
+    """
+    Devolve ("active", lição) se o aluno já tem uma lição em andamento, ou ("new", lição gerada por `plan`).
+    Requisições concorrentes do mesmo aluno se juntam à geração em curso e recebem o mesmo resultado.
+    A verificação da lição ativa fica dentro do single-flight para fechar a janela entre o fim de uma
+    geração e o início da próxima.
+    """
+    def generate() -> Tuple[str, Optional[Dict]]:
+        active_lesson_data = get_active_lesson(supabase, user_id)
+        if active_lesson_data:
+            return "active", active_lesson_data
+        if LESSON_LOCK_BACKEND == "supabase":
+            return _plan_with_worker_lock(supabase, user_id, plan)
+        return "new", plan()
+    return _lesson_generation.do(user_id, generate)
+
+def tutor_intent_needs_llm(user_id: str, intent: UserIntent) -> bool:
+    """
+    Se a interação pode chamar o LLM (e portanto passa pelo controle de admissão). Completar a lição não
+    chama; um clique repetido em "nova lição" se junta à geração em curso, que já ocupa a vaga do aluno.
+    """
+    if intent.type != 'button_click':
+        return True
+    if intent.action_id == 'complete_current_lesson':
+        return False
+    return not (intent.action_id == 'generate_new_lesson' and _lesson_generation.is_running(user_id))
+
 def tutor_orchestrator(supabase: Client, user_id: str, intent: UserIntent) -> AIResponse:
     if intent.type == 'button_click':
         action = intent.action_id
         if action == 'generate_new_lesson':
-            active_lesson_data = get_active_lesson(supabase, user_id)
-            if active_lesson_data:
-                return AIResponse(response_type='active_lesson_returned', message_to_user="Você já tem uma lição em andamento.", content=Lesson(**active_lesson_data))
-            new_lesson_data = tool_plan_new_lesson(supabase, user_id=user_id, topic_tag='general-practice')
+            status, new_lesson_data = _get_or_generate_lesson(supabase, user_id, lambda: _activate_prefetched_lesson(supabase, user_id) or tool_plan_new_lesson(supabase, user_id=user_id, topic_tag='general-practice'))
+            if status == 'active':
+                return AIResponse(response_type='active_lesson_returned', message_to_user="Você já tem uma lição em andamento.", content=Lesson(**new_lesson_data))
             if not new_lesson_data:
                 return AIResponse(response_type='error', message_to_user="Desculpe, não consegui criar uma nova lição agora. Tente novamente em alguns instantes.")
-            return AIResponse(response_type='new_lesson', message_to_user="Aqui está sua nova lição personalizada!", content=Lesson(**new_lesson_data))
+            return AIResponse(response_type='new_lesson', message_to_user="Aqui está sua nova lição personalizada!", content=Lesson(**new_lesson_data), planning_path=new_lesson_data.get('planning_path'))
         elif action == 'complete_current_lesson':
             lesson_id = intent.metadata.get('lesson_id') if intent.metadata else None
             if not lesson_id: return AIResponse(response_type='error', message_to_user="Não foi possível identificar qual lição completar.")
-            update_lesson_status(supabase, lesson_id, "completed")
-            mark_lesson_units_as_seen(supabase, user_id, lesson_id)
+            if complete_lesson(supabase, user_id, lesson_id):
+                schedule_next_lesson(user_id, lambda: _plan_lesson(supabase, user_id, topic_tag='general-practice'))
             return AIResponse(response_type='tutor_feedback', message_to_user="Ótimo trabalho ao completar a lição!")
     elif intent.type == 'chat_message' and intent.text:
         save_conversation_turn(supabase, user_id, 'user', intent.text)
         history_raw = get_conversation_history(supabase, user_id)
+        from langchain_core.messages import AIMessage, HumanMessage
         history_langchain = [HumanMessage(content=h['content']) if h['role'] == 'user' else AIMessage(content=h['content']) for h in history_raw]
-        router_chain = _create_topic_router_chain()
-        router_result = router_chain.invoke({"user_message": intent.text, "history": history_langchain})
+        router_result = _route_user_message(intent.text, history_raw, history_langchain)
         if router_result['tool_name'] == "plan_new_lesson":
-            active_lesson_data = get_active_lesson(supabase, user_id)
-            if active_lesson_data:
-                response = AIResponse(response_type='active_lesson_returned', message_to_user="Boa ideia! Mas primeiro, vamos terminar a lição que já está em andamento.", content=Lesson(**active_lesson_data))
+            topic_tag = router_result['topic_tag']
+            status, new_lesson_data = _get_or_generate_lesson(supabase, user_id, lambda: tool_plan_new_lesson(supabase, user_id=user_id, topic_tag=topic_tag))
+            if status == 'active':
+                response = AIResponse(response_type='active_lesson_returned', message_to_user="Boa ideia! Mas primeiro, vamos terminar a lição que já está em andamento.", content=Lesson(**new_lesson_data))
             else:
-                topic_tag = router_result['topic_tag']
-                new_lesson_data = tool_plan_new_lesson(supabase, user_id=user_id, topic_tag=topic_tag)
                 if not new_lesson_data:
                     message = f"Ótimo pedido! No momento, não consegui montar uma lição sobre '{topic_tag.title()}'. Que tal praticarmos outro tópico ou uma revisão geral?"
                     response = AIResponse(response_type='tutor_feedback', message_to_user=message)
                 else:
-                    response = AIResponse(response_type='new_lesson', message_to_user=f"Ótimo! Preparei uma lição especial para você sobre {topic_tag.title()}.", content=Lesson(**new_lesson_data))
+                    response = AIResponse(response_type='new_lesson', message_to_user=f"Ótimo! Preparei uma lição especial para você sobre {topic_tag.title()}.", content=Lesson(**new_lesson_data), planning_path=new_lesson_data.get('planning_path'))
             save_conversation_turn(supabase, user_id, 'ai', response.message_to_user)
             return response
         elif router_result['tool_name'] == "general_conversation":
-            conv_chain = _create_conversational_chain()
-            response_text = conv_chain.invoke({"user_message": intent.text, "history": history_langchain})
+            if router_result.get('needs_history', True) is False:
+                # Partição do cache compartilhado entre alunos: sempre do lado do servidor, nunca do cliente.
+                # Quem ainda não começou a Jornada está no nível de entrada, o mesmo em que o planner monta as lições.
+                level = get_student_level(supabase, user_id) or DEFAULT_LEVEL
+                response_text = _answer_standalone_question(intent.text, level)
+            else:
+                conv_chain = _create_conversational_chain()
+                with span("llm.conversation"), openai_breaker.guard():
+                    response_text = conv_chain.invoke({"user_message": intent.text, "history": history_langchain})
             response = AIResponse(response_type='tutor_feedback', message_to_user=response_text)
             save_conversation_turn(supabase, user_id, 'ai', response.message_to_user)
             return response
     return AIResponse(response_type='error', message_to_user="Não entendi sua solicitação.")
 
 def original_process_student_answer(supabase: Client, user_id: str, lesson_id: str, unit_id: str, student_response: str):
-    print(f"--- [ANSWER PROCESSOR] Processando resposta para a unidade: {unit_id} ---")
+    logger.info("[ANSWER PROCESSOR] Processando resposta para a unidade: %s", unit_id, extra=SAMPLED)
     unit = get_learning_unit_by_id(supabase, unit_id)
     if not unit:
         return {"error": f"Unidade de aprendizado '{unit_id}' não encontrada."}
     content = unit.get("content", {})
     correct_answer = content.get("correct_answer")
+    unit_topics = unit.get("metadata", {}).get("topic", [])
     if correct_answer is None:
-        save_performance_record(supabase, user_id, lesson_id, unit_id, True, {"answer": student_response, "note": "Assumed correct from client."})
+        if save_performance_record(supabase, user_id, lesson_id, unit_id, True, {"answer": student_response, "note": "Assumed correct from client."}):
+            mastery_store.record_answer(user_id, unit_topics, True)
+        answers_graded.inc(result="assumed_correct")
         return {"is_correct": True, "correct_answer": student_response, "feedback": content.get("feedback", {})}
     is_correct = student_response.strip().lower() == str(correct_answer).strip().lower()
     feedback_obj = content.get("feedback", {})
-    save_performance_record(supabase, user_id, lesson_id, unit_id, is_correct, {"answer": student_response})
+    if save_performance_record(supabase, user_id, lesson_id, unit_id, is_correct, {"answer": student_response}):
+        mastery_store.record_answer(user_id, unit_topics, is_correct)
+    answers_graded.inc(result="correct" if is_correct else "incorrect")
     return {"is_correct": is_correct, "correct_answer": correct_answer, "feedback": feedback_obj}
\ No newline at end of file
@@ -0,0 +1,77 @@
+# /app/cache.py
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Cache em memória, thread-safe, com política LRU e expiração (TTL) por entrada.
+    Mantém estatísticas de acertos/erros e uma estimativa do tempo economizado
+    (custo médio de um 'miss' multiplicado pelos acertos).
+    """
+
+    def __init__(self, name: str, maxsize: int = 1024, ttl: float = 300.0):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self._avg_miss_cost = 0.0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                value, expires_at = entry
+                if expires_at > now:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    self.saved_seconds += self._avg_miss_cost
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.pop(key, _MISSING)
+        return default if entry is _MISSING else entry[0]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def record_miss_cost(self, seconds: float) -> None:
+        """ Atualiza a média móvel do custo de um 'miss' (usada para estimar o tempo economizado). """
+        with self._lock:
+            if self._avg_miss_cost == 0.0:
+                self._avg_miss_cost = seconds
+            else:
+                self._avg_miss_cost = 0.8 * self._avg_miss_cost + 0.2 * seconds
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "name": self.name, "size": len(self._data), "hits": self.hits, "misses": self.misses,
+            "hit_rate": (self.hits / total) if total else 0.0, "saved_seconds": round(self.saved_seconds, 3)
+        }
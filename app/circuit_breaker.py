@@ -0,0 +1,197 @@
+# /app/circuit_breaker.py
+
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Iterator, List, Optional, Tuple
+
+from .metrics import registry
+
+# --- CONFIGURAÇÃO (variáveis de ambiente) ---
+CIRCUIT_BREAKERS_ENABLED = os.getenv("CIRCUIT_BREAKERS_ENABLED", "true").lower() in ("1", "true", "yes")
+# Janela móvel (em segundos) de chamadas usada para calcular as taxas de erro e de lentidão
+CIRCUIT_WINDOW_SECONDS = float(os.getenv("CIRCUIT_WINDOW_SECONDS", "30"))
+CIRCUIT_MIN_CALLS = int(os.getenv("CIRCUIT_MIN_CALLS", "10"))
+CIRCUIT_FAILURE_RATE = float(os.getenv("CIRCUIT_FAILURE_RATE", "0.5"))
+CIRCUIT_SLOW_CALL_RATE = float(os.getenv("CIRCUIT_SLOW_CALL_RATE", "0.8"))
+# Tempo aberto antes de deixar passar as chamadas de teste (meio-aberto)
+CIRCUIT_OPEN_SECONDS = float(os.getenv("CIRCUIT_OPEN_SECONDS", "15"))
+CIRCUIT_HALF_OPEN_PROBES = int(os.getenv("CIRCUIT_HALF_OPEN_PROBES", "3"))
+# Erros do PostgREST/Postgres causados pela própria requisição (sem linhas, filtro inválido, violação de
+# constraint, JWT) ou pelos dados ("204": o maybe_single() do postgrest-py encontrou mais de uma linha):
+# o serviço respondeu, então não contam como falha da dependência.
+BENIGN_ERROR_CODE_PREFIXES = ("PGRST1", "PGRST3", "22", "23", "42", "204")
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+circuit_state = registry.gauge("circuit_breaker_state", "Estado de cada circuit breaker (0=fechado, 1=meio-aberto, 2=aberto).")
+circuit_failure_rate = registry.gauge("circuit_breaker_failure_rate", "Taxa de falhas na janela móvel de cada circuit breaker.")
+circuit_slow_rate = registry.gauge("circuit_breaker_slow_call_rate", "Taxa de chamadas lentas na janela móvel de cada circuit breaker.")
+circuit_rejected = registry.counter("circuit_breaker_rejected_total", "Chamadas rejeitadas na hora por circuito aberto.")
+circuit_transitions = registry.counter("circuit_breaker_transitions_total", "Mudanças de estado dos circuit breakers.")
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"circuito '{name}' aberto; nova tentativa em {retry_after:.0f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+def _is_dependency_failure(exc: BaseException) -> bool:
+    code = str(getattr(exc, "code", "") or "")
+    if code.startswith(BENIGN_ERROR_CODE_PREFIXES):
+        return False
+    # Erros 4xx da OpenAI (exceto 429) também são da requisição, não do serviço
+    status_code = getattr(exc, "status_code", None)
+    return not (isinstance(status_code, int) and 400 <= status_code < 500 and status_code != 429)
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker com janela móvel por tempo. Abre quando, com pelo menos CIRCUIT_MIN_CALLS chamadas na
+    janela, a taxa de falhas ou a de chamadas lentas (> `slow_call_seconds`) passa do limite. Aberto, rejeita
+    na hora com CircuitOpenError; depois de CIRCUIT_OPEN_SECONDS deixa passar até CIRCUIT_HALF_OPEN_PROBES
+    chamadas de teste: se todas forem bem-sucedidas e rápidas ele fecha, senão volta a abrir.
+    """
+
+    def __init__(self, name: str, slow_call_seconds: float):
+        self.name = name
+        self.slow_call_seconds = slow_call_seconds
+        self.state = CLOSED
+        self._calls: Deque[Tuple[float, bool, bool]] = deque()
+        self._failures = 0
+        self._slow = 0
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        # Incrementada a cada mudança de estado; identifica em que "fase" do circuito cada chamada foi admitida
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def _transition(self, state: str) -> None:
+        self.state = state
+        self._generation += 1
+        circuit_transitions.inc(breaker=self.name, state=state)
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+        elif state == HALF_OPEN:
+            self._probes_in_flight = self._probe_successes = 0
+        else:
+            self._calls.clear()
+            self._failures = self._slow = 0
+
+    def _prune(self, now: float) -> None:
+        while self._calls and self._calls[0][0] < now - CIRCUIT_WINDOW_SECONDS:
+            _, failed, slow = self._calls.popleft()
+            self._failures -= failed
+            self._slow -= slow
+
+    def retry_after(self) -> float:
+        return max(0.0, self._opened_at + CIRCUIT_OPEN_SECONDS - time.monotonic())
+
+    def is_open(self) -> bool:
+        """ True enquanto o circuito rejeita chamadas. Não consome as chamadas de teste do meio-aberto. """
+        return self.state == OPEN and self.retry_after() > 0
+
+    def _admit(self) -> Optional[int]:
+        """ Geração do circuito em que a chamada foi admitida, ou None se ela deve ser rejeitada. """
+        with self._lock:
+            if self.state == OPEN:
+                if self.retry_after() > 0:
+                    return None
+                self._transition(HALF_OPEN)
+            if self.state == HALF_OPEN:
+                if self._probes_in_flight >= CIRCUIT_HALF_OPEN_PROBES:
+                    return None
+                self._probes_in_flight += 1
+            return self._generation
+
+    def record(self, generation: int, failed: bool, seconds: float) -> None:
+        slow = seconds > self.slow_call_seconds
+        with self._lock:
+            # Chamadas admitidas antes da última mudança de estado (ex.: lentas que terminam com o circuito já aberto) são descartadas
+            if generation != self._generation:
+                return
+            if self.state == HALF_OPEN:
+                self._probes_in_flight -= 1
+                if failed or slow:
+                    self._transition(OPEN)
+                else:
+                    self._probe_successes += 1
+                    if self._probe_successes >= CIRCUIT_HALF_OPEN_PROBES:
+                        self._transition(CLOSED)
+                return
+            now = time.monotonic()
+            self._calls.append((now, failed, slow))
+            self._failures += failed
+            self._slow += slow
+            self._prune(now)
+            total = len(self._calls)
+            if total >= CIRCUIT_MIN_CALLS and (self._failures / total >= CIRCUIT_FAILURE_RATE
+                                               or self._slow / total >= CIRCUIT_SLOW_CALL_RATE):
+                self._transition(OPEN)
+
+    def _discard(self, generation: int) -> None:
+        """ Encerra uma chamada sem registrar resultado (neutra): só devolve a vaga de teste do meio-aberto. """
+        with self._lock:
+            if generation == self._generation and self.state == HALF_OPEN:
+                self._probes_in_flight -= 1
+
+    @contextmanager
+    def guard(self, budget: float = math.inf) -> Iterator[None]:
+        """
+        Envolve uma chamada à dependência: rejeita na hora se o circuito estiver aberto e registra o resultado.
+        `budget` é o timeout que nós mesmos demos à chamada (o prazo da requisição). Um erro depois dele é
+        o nosso prazo, não a dependência: não conta como falha, só como lenta se passar de `slow_call_seconds`.
+        """
+        if not CIRCUIT_BREAKERS_ENABLED:
+            yield
+            return
+        generation = self._admit()
+        if generation is None:
+            circuit_rejected.inc(breaker=self.name)
+            raise CircuitOpenError(self.name, self.retry_after())
+        started = time.perf_counter()
+        try:
+            yield
+        except BaseException as e:
+            seconds = time.perf_counter() - started
+            if seconds < budget:
+                self.record(generation, _is_dependency_failure(e), seconds)
+            elif seconds > self.slow_call_seconds:
+                self.record(generation, False, seconds)
+            else:
+                self._discard(generation)
+            raise
+        self.record(generation, False, time.perf_counter() - started)
+
+    def collect(self) -> None:
+        with self._lock:
+            self._prune(time.monotonic())
+            total = len(self._calls)
+            circuit_state.set(_STATE_VALUES[self.state], breaker=self.name)
+            circuit_failure_rate.set(self._failures / total if total else 0.0, breaker=self.name)
+            circuit_slow_rate.set(self._slow / total if total else 0.0, breaker=self.name)
+
+
+# Um breaker por dependência; os RPCs mais pesados têm o seu próprio, para que uma busca vetorial lenta
+# não derrube as demais consultas ao Supabase (e vice-versa).
+supabase_breaker = CircuitBreaker("supabase", slow_call_seconds=2.0)
+match_learning_units_breaker = CircuitBreaker("supabase.match_learning_units", slow_call_seconds=3.0)
+recently_seen_units_breaker = CircuitBreaker("supabase.recently_seen_units", slow_call_seconds=3.0)
+openai_breaker = CircuitBreaker("openai", slow_call_seconds=20.0)
+
+_breakers: List[CircuitBreaker] = [supabase_breaker, match_learning_units_breaker, recently_seen_units_breaker, openai_breaker]
+
+
+def _collect_breakers() -> None:
+    for breaker in _breakers:
+        breaker.collect()
+
+
+registry.add_collector(_collect_breakers)
@@ -2,10 +2,45 @@
 
 from supabase.client import Client, PostgrestAPIResponse
 from typing import List, Dict, Optional, Any
+from datetime import datetime, timedelta, timezone
 import json
 import os
 import uuid
 
+from .mastery import mastery_store, build_student_state, WINDOW_SIZE
+from .seen_units import seen_units_tracker, SeenUnits, ROLLING_WINDOW_DAYS
+from .tracing import traced
+from .circuit_breaker import CircuitBreaker, CircuitOpenError, supabase_breaker, match_learning_units_breaker, recently_seen_units_breaker
+from .log import get_logger
+from .cache import TTLCache
+from .metrics import register_cache
+
+logger = get_logger(__name__)
+
+ACTIVE_LESSON_STATUSES = ["not_started", "in_progress"]
+# O status da lição em cache é conferido a cada leitura (ver get_active_lesson): o TTL só limita a memória
+ACTIVE_LESSON_CACHE_TTL_SECONDS = 600
+
+# Linhas por página na reidratação das unidades vistas (o PostgREST corta cada resposta em db-max-rows, 1000 no Supabase)
+SEEN_UNITS_PAGE_SIZE = 1000
+# Catálogo de unidades e currículo publicado por nível: só mudam quando há publicação de conteúdo
+CATALOGUE_CACHE_TTL_SECONDS = 600
+# O nível do aluno só muda quando ele avança de módulo na Jornada
+STUDENT_LEVEL_CACHE_TTL_SECONDS = 600
+
+# Lição ativa por aluno (write-through): preenchida em save_lesson, removida quando a lição sai dos status ativos
+_active_lesson_cache = TTLCache("active_lesson", maxsize=4096, ttl=ACTIVE_LESSON_CACHE_TTL_SECONDS)
+# Ids e tópicos das unidades de cada nível (funil geral do planner, warm-up da subida)
+_level_catalogue_cache = TTLCache("level_catalogue", maxsize=16, ttl=CATALOGUE_CACHE_TTL_SECONDS)
+# Módulos publicados e número de lições de cada um, por nível (resumo do Plano de Estudos)
+_curriculum_cache = TTLCache("curriculum", maxsize=16, ttl=CATALOGUE_CACHE_TTL_SECONDS)
+# Nível atual de cada aluno, derivado do progresso na Jornada (partição do cache semântico de respostas)
+_student_level_cache = TTLCache("student_level", maxsize=4096, ttl=STUDENT_LEVEL_CACHE_TTL_SECONDS)
+register_cache(_active_lesson_cache.stats)
+register_cache(_student_level_cache.stats)
+register_cache(_level_catalogue_cache.stats)
+register_cache(_curriculum_cache.stats)
+
 # --- Instância Singleton do Cliente Supabase ---
 _supabase_client: Optional[Client] = None
 
@@ -25,7 +60,14 @@ def get_db() -> Client:
     return _supabase_client
 
 
+def _execute(query, breaker: CircuitBreaker = supabase_breaker):
+    """ Executa a consulta através do circuit breaker: com o circuito aberto, falha na hora (CircuitOpenError). """
+    with breaker.guard():
+        return query.execute()
+
+
 # --- FUNÇÃO CRÍTICA CORRIGIDA (VERSÃO FINAL E CORRETA) ---
+@traced("db.save_performance_record")
 def save_performance_record(supabase: Client, user_id: str, lesson_id: str, unit_id: str, is_correct: bool,
                             response_data: dict):
     """
@@ -42,23 +84,23 @@ def save_performance_record(supabase: Client, user_id: str, lesson_id: str, unit
 
             # Etapa 2: Verifica se este UUID válido REALMENTE existe na tabela 'lessons'.
             # Esta consulta é a chave. Se não encontrar nada, o erro de FK não ocorrerá.
-            lesson_check_res = supabase.table("lessons").select("id").eq("id",
-                                                                         potential_lesson_id).maybe_single().execute()
+            lesson_check_res = _execute(supabase.table("lessons").select("id").eq("id",
+                                                                         potential_lesson_id).maybe_single())
 
             if lesson_check_res and hasattr(lesson_check_res, 'data') and lesson_check_res.data:
                 # O ID existe! É uma lição do Modo Prática.
                 final_lesson_id_for_db = potential_lesson_id
                 # Tenta atualizar o status da lição de prática
-                supabase.table("lessons").update({"status": "in_progress"}).eq("id", final_lesson_id_for_db).eq(
-                    "status", "not_started").execute()
+                _execute(supabase.table("lessons").update({"status": "in_progress"}).eq("id", final_lesson_id_for_db).eq(
+                    "status", "not_started"))
             else:
                 # É um UUID válido, mas não está na tabela 'lessons'. Logo, é da Jornada.
                 # O valor para o banco será NULL.
-                print(f"Salvando desempenho para a Jornada Guiada (ID temporário: {lesson_id}).")
+                logger.debug("Salvando desempenho para a Jornada Guiada (ID temporário: %s).", lesson_id)
 
         except (ValueError, AttributeError):
             # Não é nem mesmo um UUID. Definitivamente é da Jornada.
-            print(f"Salvando desempenho para a Jornada Guiada (ID não-UUID: {lesson_id}).")
+            logger.debug("Salvando desempenho para a Jornada Guiada (ID não-UUID: %s).", lesson_id)
 
         # Etapa 3: Insere o registro de desempenho.
         performance_data = {
@@ -68,42 +110,47 @@ def save_performance_record(supabase: Client, user_id: str, lesson_id: str, unit
             "is_correct": is_correct,
             "response_data": response_data
         }
-        supabase.table("student_performance").insert(performance_data).execute()
+        _execute(supabase.table("student_performance").insert(performance_data))
+        seen_units_tracker.mark_seen(user_id, [unit_id])
         return True
     except Exception as e:
-        print(f"!!! ERRO ao salvar desempenho: {e} !!!")
+        logger.error("ERRO ao salvar desempenho: %s", e)
         return False
 
 
 # --- FUNÇÕES DA JORNADA GUIADA (STUDY PLAN) ---
+@traced("db.update_student_lesson_progress")
 def update_student_lesson_progress(supabase: Client, user_id: str, module_id: str) -> bool:
     try:
-        response = supabase.rpc('increment_lesson_progress', {'p_user_id': user_id, 'p_module_id': module_id}).execute()
+        response = _execute(supabase.rpc('increment_lesson_progress', {'p_user_id': user_id, 'p_module_id': module_id}))
         return response.data
     except Exception as e:
-        print(f"Erro no RPC increment_lesson_progress: {e}")
+        logger.error("Erro no RPC increment_lesson_progress: %s", e)
         return False
 
 
+@traced("db.get_lesson_for_module")
 def get_lesson_for_module(supabase: Client, user_id: str, module_id: str) -> Optional[Dict[str, Any]]:
     try:
-        progress_res = supabase.table("student_progress").select("current_lesson_order").eq("user_id", user_id).eq(
-            "module_id", module_id).maybe_single().execute()
+        progress_res = _execute(supabase.table("student_progress").select("current_lesson_order").eq("user_id", user_id).eq(
+            "module_id", module_id).maybe_single())
         lesson_order = 1
         if progress_res and hasattr(progress_res, 'data') and progress_res.data:
             lesson_order = progress_res.data.get('current_lesson_order', 1)
         else:
-            print(
-                f"Nenhum progresso encontrado para o usuário {user_id} no módulo {module_id}. Iniciando e criando registro para lesson_order 1.")
-            supabase.table("student_progress").insert(
+            logger.info("Nenhum progresso encontrado para o usuário %s no módulo %s. Iniciando e criando registro para lesson_order 1.",
+                        user_id, module_id)
+            _execute(supabase.table("student_progress").insert(
                 {"user_id": user_id, "module_id": module_id, "current_lesson_order": 1,
-                 "status": "in_progress"}).execute()
+                 "status": "in_progress"}))
+            # Novo módulo em andamento: o nível do aluno pode ter mudado
+            _student_level_cache.pop(user_id)
         items_res = (
-            supabase.table("module_items").select("*, learning_units(*)").eq("module_id", module_id).eq("lesson_order",
+            _execute(supabase.table("module_items").select("*, learning_units(*)").eq("module_id", module_id).eq("lesson_order",
                                                                                                         lesson_order).order(
-                "item_order", desc=False).execute())
+                "item_order", desc=False)))
         if not items_res.data:
-            print(f"Nenhum item de lição encontrado para o módulo {module_id}, lição {lesson_order}.")
+            logger.warning("Nenhum item de lição encontrado para o módulo %s, lição %s.", module_id, lesson_order)
             return None
         lesson_items = [item['learning_units'] for item in items_res.data if item.get('learning_units')]
         lesson_title = items_res.data[0].get('lesson_title', f'Módulo de Estudo - Lição {lesson_order}')
@@ -112,35 +159,76 @@ def get_lesson_for_module(supabase: Client, user_id: str, module_id: str) -> Opt
                 "objective": f"Jornada de Aprendizagem - Lição {lesson_order}", "lesson_items": lesson_items,
                 "module_id": module_id}
     except Exception as e:
-        print(f"Erro ao buscar lição para o módulo: {e}")
+        logger.error("Erro ao buscar lição para o módulo: %s", e)
         return None
 
 
+@traced("db.get_curriculum")
+def get_curriculum(supabase: Client, level: str) -> Optional[Dict[str, Any]]:
+    """
+    Módulos publicados de um nível (em ordem) e o número de lições de cada um. É igual para todos os alunos,
+    então fica em cache; None se o nível não tiver módulos publicados.
+    """
+    curriculum = _curriculum_cache.get(level)
+    if curriculum is not None:
+        return curriculum
+    modules_res = _execute(supabase.table("modules").select("*").eq("level", level).eq("is_published", True).order(
+        "module_order"))
+    if not modules_res.data: return None
+    module_ids = [m['id'] for m in modules_res.data]
+    items_res = _execute(supabase.table("module_items").select("module_id, lesson_order").in_("module_id", module_ids))
+    lessons_per_module: Dict[str, set] = {}
+    for item in items_res.data or []:
+        mod_id, lesson_order = item.get('module_id'), item.get('lesson_order')
+        if mod_id and lesson_order:
+            lessons_per_module.setdefault(mod_id, set()).add(lesson_order)
+    curriculum = {"modules": modules_res.data,
+                  "lessons_per_module": {mod_id: len(orders) for mod_id, orders in lessons_per_module.items()}}
+    _curriculum_cache.set(level, curriculum)
+    return curriculum
+
+
+@traced("db.get_student_level")
+def get_student_level(supabase: Client, user_id: str) -> Optional[str]:
+    """
+    Nível do aluno segundo o seu progresso na Jornada: o maior nível entre os módulos em andamento
+    (ou, se não houver, entre todos os módulos com progresso). None se o aluno ainda não começou nenhum módulo.
+    """
+    cached = _student_level_cache.get(user_id)
+    if cached is not None:
+        return cached
+    try:
+        response = _execute(supabase.table("student_progress").select("status, modules(level)").eq("user_id", user_id))
+        rows = [r for r in response.data or [] if (r.get('modules') or {}).get('level')]
+        in_progress = [r for r in rows if r.get('status') == 'in_progress']
+        levels = [r['modules']['level'] for r in (in_progress or rows)]
+        if not levels:
+            return None
+        # Os níveis do CEFR (A1 < A2 < B1 ...) seguem a ordem alfabética
+        level = max(levels)
+        _student_level_cache.set(user_id, level)
+        return level
+    except Exception as e:
+        logger.error("ERRO ao buscar o nível do aluno: %s", e); return None
+
+
+@traced("db.get_student_progress_summary")
 def get_student_progress_summary(supabase: Client, user_id: str, level: str) -> Optional[Dict[str, Any]]:
     """
     Consulta e monta a visão completa da jornada de aprendizado de um aluno.
     VERSÃO FINAL: Retorna o status real do banco, sem adivinhar.
     """
     try:
-        modules_res = supabase.table("modules").select("*").eq("level", level).eq("is_published", True).order(
-            "module_order").execute()
-        if not modules_res.data: return None
-        all_modules = modules_res.data
+        curriculum = get_curriculum(supabase, level)
+        if not curriculum: return None
+        all_modules = curriculum['modules']
+        lessons_per_module = curriculum['lessons_per_module']
 
         module_ids = [m['id'] for m in all_modules]
-        progress_res = supabase.table("student_progress").select("*").eq("user_id", user_id).in_("module_id",
-                                                                                                 module_ids).execute()
+        progress_res = _execute(supabase.table("student_progress").select("*").eq("user_id", user_id).in_("module_id",
+                                                                                                 module_ids))
         student_progress_map = {p['module_id']: p for p in progress_res.data}
 
-        items_res = supabase.table("module_items").select("module_id, lesson_order").execute()
-        lessons_per_module = {}
-        if items_res.data:
-            for item in items_res.data:
-                mod_id, lesson_order = item.get('module_id'), item.get('lesson_order')
-                if mod_id and lesson_order:
-                    if mod_id not in lessons_per_module: lessons_per_module[mod_id] = set()
-                    lessons_per_module[mod_id].add(lesson_order)
-
         modules_summary = []
         for module in all_modules:
             module_id = module['id']
@@ -149,7 +237,7 @@ def get_student_progress_summary(supabase: Client, user_id: str, level: str) ->
             # LÓGICA REFINADA: O status é o que está no banco, ou 'locked' por padrão.
             status = progress['status'] if progress else "locked"
 
-            total_lessons = len(lessons_per_module.get(module_id, set()))
+            total_lessons = lessons_per_module.get(module_id, 0)
             completed_lessons = (progress['current_lesson_order'] - 1) if progress and progress.get(
                 'current_lesson_order') else 0
 
@@ -169,119 +257,182 @@ def get_student_progress_summary(supabase: Client, user_id: str, level: str) ->
             "modules": modules_summary
         }
     except Exception as e:
-        print(f"Erro ao montar o resumo do progresso do aluno: {e}")
+        logger.error("Erro ao montar o resumo do progresso do aluno: %s", e)
         return None
 
 
 # --- FUNÇÕES DO MODO PRÁTICA (TUTOR INTERACT) ---
+@traced("db.get_active_lesson")
 def get_active_lesson(supabase: Client, user_id: str) -> Optional[Dict]:
+    """
+    Lição em andamento do aluno. Vem do cache quando possível; no miss, a lição, os itens do seu template e as
+    unidades chegam num único select com recursos embutidos (lessons -> lesson_templates -> lesson_template_items
+    -> learning_units).
+    O cache é por processo e a lição pode ter sido concluída em outro worker: no hit, só o status da lição
+    é conferido no banco (busca pela chave primária) antes de devolvê-la.
+    """
+    cached = _active_lesson_cache.get(user_id)
     try:
-        lesson_response = supabase.table("lessons").select("*").eq("user_id", user_id).in_("status", ["not_started",
-                                                                                                      "in_progress"]).maybe_single().execute()
+        if cached is not None:
+            status_response = _execute(supabase.table("lessons").select("status").eq("id", cached['lesson_id']).maybe_single())
+            if status_response and status_response.data and status_response.data.get('status') in ACTIVE_LESSON_STATUSES:
+                return dict(cached)
+            _active_lesson_cache.pop(user_id)
+        lesson_response = _execute(supabase.table("lessons").select(
+            "id, title, objective, lesson_templates(lesson_template_items(item_order, learning_units(*)))").eq(
+            "user_id", user_id).in_("status", ACTIVE_LESSON_STATUSES).order(
+            "item_order", foreign_table="lesson_templates.lesson_template_items").maybe_single())
         if not lesson_response or not lesson_response.data: return None
         lesson = lesson_response.data
         lesson_id = lesson.get('id')
         if not lesson_id: return None
-        items_response = supabase.table("lesson_items").select("*, learning_units(*)").eq("lesson_id", lesson_id).order(
-            "item_order", desc=False).execute()
-        lesson_items = [item['learning_units'] for item in items_response.data if
-                        'learning_units' in item and item['learning_units']] if items_response.data else []
-        return {"lesson_id": lesson_id, "title": lesson.get('title'), "objective": lesson.get('objective'),
-                "lesson_items": lesson_items}
+        template_items = (lesson.get('lesson_templates') or {}).get('lesson_template_items') or []
+        lesson_items = [item['learning_units'] for item in template_items if item.get('learning_units')]
+        active_lesson = {"lesson_id": lesson_id, "title": lesson.get('title'), "objective": lesson.get('objective'),
+                         "lesson_items": lesson_items}
+        _active_lesson_cache.set(user_id, active_lesson)
+        return dict(active_lesson)
     except Exception as e:
-        print(f"!!! ERRO no Supabase ao buscar lição ativa: {e} !!!"); return None
+        logger.error("ERRO no Supabase ao buscar lição ativa: %s", e); return None
 
 
+@traced("db.save_lesson")
 def save_lesson(supabase: Client, user_id: str, title: str, objective: str, items: list) -> Optional[str]:
+    """
+    Cria a lição do aluno num único RPC (sql/lesson_templates.sql). A lição aponta para um template endereçado
+    pelo hash da sequência de unidades; os itens só são gravados na primeira vez que essa sequência aparece.
+    """
     try:
-        lesson_data = {"user_id": user_id, "title": title, "objective": objective, "status": "not_started"}
-        lesson_response: PostgrestAPIResponse = supabase.table("lessons").insert(lesson_data).execute()
-        new_lesson_id = lesson_response.data[0]['id']
-        lesson_items_to_insert = [{"lesson_id": new_lesson_id, "unit_id": item['id'], "item_order": i + 1} for i, item
-                                  in enumerate(items)]
-        if lesson_items_to_insert: supabase.table("lesson_items").insert(lesson_items_to_insert).execute()
+        response = _execute(supabase.rpc('create_lesson_from_template', {
+            'p_user_id': user_id, 'p_title': title, 'p_objective': objective,
+            'p_unit_ids': [item['id'] for item in items]}))
+        new_lesson_id = response.data
+        if not new_lesson_id: return None
+        _active_lesson_cache.set(user_id, {"lesson_id": new_lesson_id, "title": title, "objective": objective,
+                                           "lesson_items": list(items)})
         return new_lesson_id
     except Exception as e:
-        print(f"!!! ERRO ao salvar a lição: {e} !!!"); return None
+        logger.error("ERRO ao salvar a lição: %s", e); return None
+
+
+@traced("db.try_acquire_lesson_generation_lock")
+def try_acquire_lesson_generation_lock(supabase: Client, user_id: str, owner: str, ttl_seconds: int) -> bool:
+    """
+    Tenta obter o lock (entre workers) de geração de lição do aluno. O lock expira sozinho após `ttl_seconds`.
+    Se o RPC falhar, devolve True: sem coordenação, o pior caso é o comportamento anterior (duas gerações).
+    """
+    try:
+        response = _execute(supabase.rpc('try_acquire_lesson_generation_lock',
+                                {'p_user_id': user_id, 'p_owner': owner, 'p_ttl_seconds': ttl_seconds}))
+        return bool(response.data)
+    except Exception as e:
+        logger.error("ERRO no RPC 'try_acquire_lesson_generation_lock': %s", e); return True
 
 
-def update_lesson_status(supabase: Client, lesson_id: str, new_status: str) -> bool:
+@traced("db.release_lesson_generation_lock")
+def release_lesson_generation_lock(supabase: Client, user_id: str, owner: str) -> bool:
     try:
-        supabase.table("lessons").update({"status": new_status}).eq("id", lesson_id).execute()
+        _execute(supabase.table("lesson_generation_locks").delete().eq("user_id", user_id).eq("owner", owner))
         return True
     except Exception as e:
-        print(f"!!! ERRO no Supabase ao atualizar status da lição: {e} !!!"); return False
+        logger.error("ERRO ao liberar o lock de geração de lição: %s", e); return False
 
 
-def mark_lesson_units_as_seen(supabase: Client, user_id: str, lesson_id: str):
+@traced("db.complete_lesson")
+def complete_lesson(supabase: Client, user_id: str, lesson_id: str) -> bool:
+    """
+    Conclui a lição num único RPC transacional (sql/complete_lesson.sql): muda o status, grava as unidades como
+    vistas e devolve essas unidades com seus tópicos, que alimentam o estado em memória (unidades vistas e maestria).
+    Retorna False se o RPC falhar ou se nada mudou (lição de outro aluno ou já concluída).
+    """
     try:
-        items_response = supabase.table("lesson_items").select("unit_id").eq("lesson_id", lesson_id).execute()
-        if not items_response.data: return
-        performance_records = [
-            {"user_id": user_id, "lesson_id": lesson_id, "unit_id": item['unit_id'], "is_correct": True,
-             "response_data": {"note": "Marked as seen upon lesson completion."}} for item in items_response.data]
-        if performance_records: supabase.table("student_performance").insert(performance_records).execute()
+        response = _execute(supabase.rpc('complete_lesson', {'p_lesson_id': lesson_id, 'p_user_id': user_id}))
+        _active_lesson_cache.pop(user_id)
+        completed_units = response.data or []
+        seen_units_tracker.mark_seen(user_id, [unit['unit_id'] for unit in completed_units])
+        # Os registros sintéticos contam como acertos na maestria, assim como no banco.
+        for unit in completed_units:
+            mastery_store.record_answer(user_id, unit.get('topics') or [], True)
+        return bool(completed_units)
     except Exception as e:
-        print(f"!!! ERRO ao marcar unidades da lição como vistas: {e} !!!")
+        logger.error("ERRO no RPC 'complete_lesson': %s", e); return False
 
 
-# --- FUNÇÕES GERAIS DE ACESSO A DADOS ---
+@traced("db.save_conversation_turn")
 def save_conversation_turn(supabase: Client, user_id: str, role: str, content: str) -> bool:
     try:
-        supabase.table("conversation_history").insert({"user_id": user_id, "role": role, "content": content}).execute()
+        _execute(supabase.table("conversation_history").insert({"user_id": user_id, "role": role, "content": content}))
         return True
     except Exception as e:
-        print(f"!!! ERRO no Supabase ao salvar turno da conversa: {e} !!!"); return False
+        logger.error("ERRO no Supabase ao salvar turno da conversa: %s", e); return False
 
 
+@traced("db.get_conversation_history")
 def get_conversation_history(supabase: Client, user_id: str, limit: int = 10) -> List[Dict]:
     try:
-        response = supabase.table("conversation_history").select("role, content").eq("user_id", user_id).order(
-            "created_at", desc=True).limit(limit).execute()
+        response = _execute(supabase.table("conversation_history").select("role, content").eq("user_id", user_id).order(
+            "created_at", desc=True).limit(limit))
         return list(reversed(response.data)) or []
     except Exception as e:
-        print(f"!!! ERRO no Supabase ao buscar histórico da conversa: {e} !!!"); return []
+        logger.error("ERRO no Supabase ao buscar histórico da conversa: %s", e); return []
 
 
+@traced("db.save_tutor_message")
 def save_tutor_message(supabase: Client, user_id: str, message: str) -> bool:
     try:
-        supabase.table("tutor_messages").insert({"user_id": user_id, "message_content": message}).execute()
+        _execute(supabase.table("tutor_messages").insert({"user_id": user_id, "message_content": message}))
         return True
     except Exception as e:
-        print(f"!!! ERRO no Supabase ao salvar mensagem do tutor: {e} !!!"); return False
+        logger.error("ERRO no Supabase ao salvar mensagem do tutor: %s", e); return False
 
 
+@traced("db.get_unread_tutor_messages")
 def get_unread_tutor_messages(supabase: Client, user_id: str) -> List[dict]:
     try:
-        response = supabase.table("tutor_messages").select("*").eq("user_id", user_id).eq("status", "unread").order(
-            "created_at", desc=True).execute()
+        response = _execute(supabase.table("tutor_messages").select("*").eq("user_id", user_id).eq("status", "unread").order(
+            "created_at", desc=True))
         return response.data or []
     except Exception as e:
-        print(f"!!! ERRO no Supabase ao buscar mensagens do tutor: {e} !!!"); return []
+        logger.error("ERRO no Supabase ao buscar mensagens do tutor: %s", e); return []
 
 
+@traced("db.mark_tutor_message_as_read")
 def mark_tutor_message_as_read(supabase: Client, message_id: int) -> bool:
     try:
-        supabase.table("tutor_messages").update({"status": "read"}).eq("id", message_id).execute()
+        _execute(supabase.table("tutor_messages").update({"status": "read"}).eq("id", message_id))
         return True
     except Exception as e:
-        print(f"!!! ERRO no Supabase ao marcar mensagem como lida: {e} !!!"); return False
-
-
+        logger.error("ERRO no Supabase ao marcar mensagem como lida: %s", e); return False
+
+
+@traced("db.get_level_catalogue")
+def get_level_catalogue(supabase: Client, level: str) -> Dict[str, List[str]]:
+    """ Ids e tópicos das unidades de um nível, em cache (vazios não são guardados). """
+    catalogue = _level_catalogue_cache.get(level)
+    if catalogue is not None:
+        return catalogue
+    response = _execute(supabase.table("learning_units").select("id, metadata->topic").eq("metadata->>level", level))
+    unit_ids, all_topics = [], set()
+    for item in response.data or []:
+        unit_ids.append(item['id'])
+        topics = item.get('topic')
+        if isinstance(topics, list):
+            all_topics.update(topics)
+    catalogue = {"unit_ids": unit_ids, "topics": sorted(all_topics)}
+    if unit_ids:
+        _level_catalogue_cache.set(level, catalogue)
+    return catalogue
+
+
+@traced("db.get_all_topics_for_level")
 def get_all_topics_for_level(supabase: Client, level: str) -> List[str]:
     try:
-        response = supabase.table("learning_units").select("metadata->topic").eq("metadata->>level", level).execute()
-        if not response.data: return []
-        all_topics = set()
-        for item in response.data:
-            topics = item.get('topic')
-            if isinstance(topics, list):
-                for topic in topics: all_topics.add(topic)
-        return list(all_topics)
+        return list(get_level_catalogue(supabase, level)["topics"])
     except Exception as e:
-        print(f"!!! ERRO ao buscar todos os tópicos para o nível: {e} !!!"); return []
+        logger.error("ERRO ao buscar todos os tópicos para o nível: %s", e); return []
 
 
+@traced("db.get_learning_units_by_topic")
 def get_learning_units_by_topic(supabase: Client, topic: str, level: str, unit_types: List[str],
                                 count: int = 15) -> list:
     try:
@@ -289,58 +440,81 @@ def get_learning_units_by_topic(supabase: Client, topic: str, level: str, unit_t
         query = supabase.table("learning_units").select("*").eq("metadata->>level", level).contains("metadata->topic",
                                                                                                     json_filter_value).in_(
             "type", unit_types).limit(count)
-        response = query.execute()
+        response = _execute(query)
         return response.data or []
     except Exception as e:
-        print(f"!!! ERRO ao buscar unidades por tópico e tipo: {e} !!!"); return []
+        logger.error("ERRO ao buscar unidades por tópico e tipo: %s", e); return []
 
 
+@traced("db.get_units_by_dependency")
 def get_units_by_dependency(supabase: Client, dependency_id: str, level: str) -> list:
     try:
         dependency_json = json.dumps([dependency_id])
-        response = supabase.table("learning_units").select("*").eq("metadata->>level", level).contains(
-            "metadata->dependencies", dependency_json).execute()
+        response = _execute(supabase.table("learning_units").select("*").eq("metadata->>level", level).contains(
+            "metadata->dependencies", dependency_json))
         return response.data or []
     except Exception as e:
-        print(f"!!! ERRO ao buscar unidades por dependência: {e} !!!"); return []
+        logger.error("ERRO ao buscar unidades por dependência: %s", e); return []
 
 
-def get_recently_seen_units(supabase: Client, user_id: str, days_ago: int = 7) -> set:
+@traced("db.get_recently_seen_units")
+def get_recently_seen_units(supabase: Client, user_id: str, days_ago: int = 7) -> SeenUnits:
+    """
+    Unidades vistas pelo aluno nos últimos `days_ago` dias, a partir do estado em memória (baldes diários).
+    O banco só é consultado para reidratar o aluno, com as respostas da janela de ROLLING_WINDOW_DAYS dias.
+    """
+    def _load_seen():
+        since = (datetime.now(timezone.utc) - timedelta(days=ROLLING_WINDOW_DAYS)).isoformat()
+        seen, start = [], 0
+        # Paginado (mais recentes primeiro, `id` desempata): alunos muito ativos passam do limite de linhas por resposta
+        while True:
+            response = _execute(supabase.table("student_performance").select("unit_id, created_at").eq("user_id", user_id).gte(
+                "created_at", since).order("created_at", desc=True).order("id").range(start, start + SEEN_UNITS_PAGE_SIZE - 1),
+                recently_seen_units_breaker)
+            rows = response.data or []
+            seen += [(item['unit_id'], datetime.fromisoformat(item['created_at'])) for item in rows]
+            if len(rows) < SEEN_UNITS_PAGE_SIZE:
+                return seen
+            start += SEEN_UNITS_PAGE_SIZE
     try:
-        response = supabase.rpc('get_recently_seen_unit_ids', {'p_user_id': user_id, 'p_days_ago': days_ago}).execute()
-        return {item['unit_id'] for item in response.data} if response.data else set()
+        return seen_units_tracker.seen(user_id, days_ago, _load_seen)
     except Exception as e:
-        print(f"!!! ERRO no RPC 'get_recently_seen_unit_ids': {e} !!!"); return []
+        logger.error("ERRO ao buscar unidades vistas recentemente: %s", e); return SeenUnits()
 
 
+@traced("db.get_learning_units_by_similarity")
 def get_learning_units_by_similarity(supabase: Client, embedding: list, level: str, count: int = 15) -> list:
     try:
-        response = supabase.rpc('match_learning_units',
-                                {'query_embedding': embedding, 'match_count': count, 'p_level': level}).execute()
+        response = _execute(supabase.rpc('match_learning_units',
+                                {'query_embedding': embedding, 'match_count': count, 'p_level': level}), match_learning_units_breaker)
         return response.data or []
+    except CircuitOpenError:
+        # O planner troca para o caminho barato (sem busca vetorial) em vez de tentar os demais níveis do funil
+        raise
     except Exception as e:
-        print(f"!!! ERRO no RPC 'match_learning_units': {e} !!!"); return []
+        logger.error("ERRO no RPC 'match_learning_units': %s", e); return []
 
 
+@traced("db.get_student_mastery_summary")
 def get_student_mastery_summary(supabase: Client, user_id: str) -> dict:
-    weak_topics, strong_topics = [], []
+    """
+    Tópicos fracos/fortes do aluno. Lê o estado em memória (atualizado a cada resposta) e só consulta
+    as últimas respostas de cada tópico (RPC recent_topic_answers) no primeiro acesso ou depois que o estado expira.
+    """
+    def _load_state():
+        answers_res = _execute(supabase.rpc("recent_topic_answers", {"p_user_id": user_id, "p_per_topic": WINDOW_SIZE}))
+        return build_student_state(answers_res.data or [])
     try:
-        response = supabase.table("student_topic_mastery").select("*").eq("user_id", user_id).execute()
-        if response.data:
-            for row in response.data:
-                if row.get('errors_in_last_5', 0) > row.get('successes_in_last_5', 0):
-                    weak_topics.append(row['topic'])
-                elif row.get('successful_streak_in_last_3', 0) >= 3:
-                    strong_topics.append(row['topic'])
-        return {"weak_topics": weak_topics, "strong_topics": strong_topics}
+        return mastery_store.get_summary(user_id, _load_state)
     except Exception as e:
-        print(f"!!! ERRO ao buscar maestria: {e} !!!"); return {"weak_topics": [], "strong_topics": []}
+        logger.error("ERRO ao buscar maestria: %s", e); return {"weak_topics": [], "strong_topics": []}
 
 
+@traced("db.get_learning_unit_by_id")
 def get_learning_unit_by_id(supabase: Client, unit_id: str) -> Optional[Dict]:
     try:
-        response: PostgrestAPIResponse = supabase.table("learning_units").select("*").eq("id",
-                                                                                         unit_id).single().execute()
+        response: PostgrestAPIResponse = _execute(supabase.table("learning_units").select("*").eq("id",
+                                                                                         unit_id).single())
         return response.data
     except Exception as e:
-        print(f"!!! ERRO ao buscar unidade por ID: {e} !!!"); return None
+        logger.error("ERRO ao buscar unidade por ID: %s", e); return None
@@ -0,0 +1,57 @@
+# /app/deadline.py
+
+import math
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+# --- CONFIGURAÇÃO (variáveis de ambiente) ---
+# Prazo padrão de cada requisição; o cliente pode encurtá-lo com o cabeçalho X-Request-Timeout-Ms.
+REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "20"))
+DEADLINE_HEADER = "x-request-timeout-ms"
+# Estimativas iniciais (s) usadas até haver medições das operações
+DEFAULT_EXPECTED_SECONDS = {"llm.semantic_query": 2.0, "llm.embeddings": 0.5, "db.get_learning_units_by_similarity": 0.3}
+# Operações cujas durações alimentam as estimativas mesmo com tracing e métricas desligados (app.tracing)
+BUDGETED_OPERATIONS = frozenset(DEFAULT_EXPECTED_SECONDS)
+EWMA_ALPHA = 0.2
+
+# Instante (time.monotonic) em que a requisição atual expira; None fora de requisições (ex.: prefetch em background).
+_deadline: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
+_expected: Dict[str, float] = {}
+_expected_lock = threading.Lock()
+
+
+def start_deadline(seconds: float) -> None:
+    _deadline.set(time.monotonic() + seconds)
+
+
+def request_timeout(header_value: Optional[str]) -> float:
+    """ Prazo da requisição: o padrão, ou o informado pelo cliente (em ms) se for menor. """
+    try:
+        if header_value:
+            return min(REQUEST_DEADLINE_SECONDS, max(0.0, float(header_value) / 1000))
+    except ValueError:
+        pass
+    return REQUEST_DEADLINE_SECONDS
+
+
+def remaining() -> float:
+    deadline = _deadline.get()
+    return math.inf if deadline is None else deadline - time.monotonic()
+
+
+def has_budget(seconds: float) -> bool:
+    return remaining() >= seconds
+
+
+def record_duration(name: str, seconds: float) -> None:
+    """ Alimentado pelos spans (app.tracing) das chamadas bem-sucedidas: média móvel da duração de cada operação. """
+    with _expected_lock:
+        previous = _expected.get(name)
+        _expected[name] = seconds if previous is None else (1 - EWMA_ALPHA) * previous + EWMA_ALPHA * seconds
+
+
+def expected_duration(*names: str) -> float:
+    return sum(_expected.get(name, DEFAULT_EXPECTED_SECONDS.get(name, 0.0)) for name in names)
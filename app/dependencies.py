@@ -1,11 +1,16 @@
 # /app/dependencies.py
 
+import hashlib
 import os
+import time
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 import jwt
 from jwt.exceptions import InvalidTokenError
 
+from .cache import TTLCache
+from .metrics import register_cache
+
 # Este esquema informa ao FastAPI para procurar por um 'Bearer Token' no cabeçalho Authorization
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
@@ -14,12 +19,23 @@ JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET")
 if not JWT_SECRET:
     raise ValueError("SUPABASE_JWT_SECRET não encontrado no .env")
 
+# Cache de claims já verificadas: sha256(token) -> user_id. A entrada expira junto com o 'exp' do token.
+TOKEN_CACHE_SIZE = 10000
+TOKEN_CACHE_MAX_TTL_SECONDS = 300
+_verified_token_cache = TTLCache("verified_token", maxsize=TOKEN_CACHE_SIZE, ttl=TOKEN_CACHE_MAX_TTL_SECONDS)
+register_cache(_verified_token_cache.stats)
+
 
 def get_current_user(token: str = Depends(oauth2_scheme)) -> str:
     """
     Decodifica o token JWT para obter o ID do usuário (sub).
     Esta função é uma dependência que pode ser usada em qualquer endpoint.
     """
+    # Tokens já verificados (e ainda não expirados) dispensam a verificação da assinatura
+    token_key = hashlib.sha256(token.encode("utf-8")).hexdigest()
+    cached_user_id = _verified_token_cache.get(token_key)
+    if cached_user_id is not None:
+        return cached_user_id
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Não foi possível validar as credenciais",
@@ -38,6 +54,10 @@ def get_current_user(token: str = Depends(oauth2_scheme)) -> str:
         user_id: str | None = payload.get("sub")
         if user_id is None:
             raise credentials_exception
+        # Nunca mantém o token em cache além do seu 'exp'
+        ttl = min(payload.get("exp", time.time() + TOKEN_CACHE_MAX_TTL_SECONDS) - time.time(), TOKEN_CACHE_MAX_TTL_SECONDS)
+        if ttl > 0:
+            _verified_token_cache.set(token_key, user_id, ttl=ttl)
         return user_id
     except InvalidTokenError:
         # Se o token for inválido (expirado, assinatura errada, audience errada, etc.)
@@ -0,0 +1,146 @@
+# /app/hedging.py
+
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from .metrics import registry
+
+# --- CONFIGURAÇÃO (variáveis de ambiente) ---
+HEDGING_ENABLED = os.getenv("HEDGING_ENABLED", "false").lower() in ("1", "true", "yes")
+# Dispara a segunda requisição quando a primeira passa desse percentil da latência recente
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "0.95"))
+# Orçamento: no máximo essa fração de requisições extras (ex.: 0.1 = até 10% a mais de chamadas ao LLM)
+HEDGE_BUDGET_RATIO = float(os.getenv("HEDGE_BUDGET_RATIO", "0.1"))
+HEDGE_BUDGET_BURST = 10.0
+HEDGE_MIN_SAMPLES = 20
+HEDGE_MIN_DELAY_SECONDS = 0.05
+LATENCY_WINDOW = 200
+
+hedges_issued = registry.counter("llm_hedges_issued_total", "Requisições de hedge disparadas, por chain.")
+hedges_won = registry.counter("llm_hedges_won_total", "Hedges que responderam antes da requisição original.")
+hedges_denied = registry.counter("llm_hedges_denied_total", "Hedges não disparados por falta de orçamento.")
+
+
+class LatencyTracker:
+    """ Janela das latências recentes de uma chain; o limiar de hedge é recalculado a cada 10 amostras. """
+
+    def __init__(self, percentile: float, window: int = LATENCY_WINDOW):
+        self.percentile = percentile
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._threshold: Optional[float] = None
+        self._since_update = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+            self._since_update += 1
+            if len(self._samples) >= HEDGE_MIN_SAMPLES and (self._threshold is None or self._since_update >= 10):
+                ordered = sorted(self._samples)
+                self._threshold = max(HEDGE_MIN_DELAY_SECONDS, ordered[int((len(ordered) - 1) * self.percentile)])
+                self._since_update = 0
+
+    def threshold(self) -> Optional[float]:
+        return self._threshold
+
+
+class HedgeBudget:
+    """ Token bucket: cada chamada original rende `ratio` fichas; cada hedge gasta uma. """
+
+    def __init__(self, ratio: float, burst: float = HEDGE_BUDGET_BURST):
+        self.ratio = ratio
+        self.burst = burst
+        self._tokens = burst
+        self._lock = threading.Lock()
+
+    def earn(self) -> None:
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return True
+            return False
+
+
+class _LoopThread:
+    """
+    Event loop dedicado em uma thread daemon. As chamadas com hedge rodam nele para que a requisição
+    perdedora possa ser cancelada de verdade (a conexão HTTP é fechada) e para que o cliente HTTP
+    assíncrono compartilhado fique sempre no mesmo loop.
+    """
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+    def loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="llm-hedging", daemon=True).start()
+            return self._loop
+
+
+_trackers: Dict[str, LatencyTracker] = {}
+_budget = HedgeBudget(HEDGE_BUDGET_RATIO)
+_loop_thread = _LoopThread()
+
+
+def _tracker(name: str) -> LatencyTracker:
+    tracker = _trackers.get(name)
+    if tracker is None:
+        tracker = _trackers.setdefault(name, LatencyTracker(HEDGE_PERCENTILE))
+    return tracker
+
+
+async def _race(name: str, chain, inputs: Any, delay: Optional[float]) -> Any:
+    primary = asyncio.ensure_future(chain.ainvoke(inputs))
+    if delay is None:
+        return await primary
+    done, _ = await asyncio.wait({primary}, timeout=delay)
+    if done:
+        return primary.result()
+    if not _budget.try_spend():
+        hedges_denied.inc(chain=name)
+        return await primary
+    hedges_issued.inc(chain=name)
+    hedge = asyncio.ensure_future(chain.ainvoke(inputs))
+    pending = {primary, hedge}
+    error: Optional[BaseException] = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is hedge:
+                        hedges_won.inc(chain=name)
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+def hedged_invoke(name: str, chain, inputs: Any) -> Any:
+    """
+    Invoca `chain` com hedge (se HEDGING_ENABLED): se a chamada não voltar até o percentil configurado da
+    latência recente dessa chain, uma segunda chamada idêntica é disparada e a primeira resposta vence;
+    a outra é cancelada. Só use em chains idempotentes e de saída curta (roteador, query semântica).
+    """
+    if not HEDGING_ENABLED:
+        return chain.invoke(inputs)
+    tracker = _tracker(name)
+    _budget.earn()
+    started = time.perf_counter()
+    future = asyncio.run_coroutine_threadsafe(_race(name, chain, inputs, tracker.threshold()), _loop_thread.loop())
+    result = future.result()
+    tracker.record(time.perf_counter() - started)
+    return result
@@ -0,0 +1,121 @@
+# /app/log.py
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import zlib
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Optional
+
+# --- CONFIGURAÇÃO (variáveis de ambiente) ---
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# "json" (uma linha JSON por registro) ou "text" (legível, para desenvolvimento)
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+# Fração das requisições cujas mensagens de alto volume (extra=SAMPLED) são registradas
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.1"))
+# Registros além desse limite são descartados em vez de bloquear a requisição
+LOG_QUEUE_SIZE = 10000
+
+# Marca uma mensagem de alto volume (passos do planner, hits de cache...) para amostragem.
+SAMPLED = {"sampled": True}
+
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class RequestContextFilter(logging.Filter):
+    """
+    Roda na thread da requisição: anexa o request id e aplica a amostragem.
+    A decisão de amostragem é por requisição, para que o funil de uma requisição amostrada apareça inteiro.
+    """
+
+    def __init__(self, sample_rate: float):
+        super().__init__()
+        self.sample_rate = sample_rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        request_id = request_id_var.get()
+        record.request_id = request_id
+        if getattr(record, "sampled", False) and record.levelno < logging.WARNING and self.sample_rate < 1.0:
+            if request_id is None:
+                return random.random() < self.sample_rate
+            return zlib.crc32(request_id.encode()) % 10000 < self.sample_rate * 10000
+        return True
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """ Enfileira sem bloquear; com a fila cheia o registro é descartado e contado. """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Só resolve a mensagem; a serialização fica para a thread do listener.
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", None),
+            "msg": record.getMessage(),
+        }
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def configure_logging(stream=None) -> None:
+    """ Configura o logger "app" com fila + listener em background. Idempotente. """
+    global _listener
+    if _listener is not None:
+        return
+    output = logging.StreamHandler(stream or sys.stdout)
+    if LOG_FORMAT == "text":
+        output.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s"))
+    else:
+        output.setFormatter(JsonFormatter())
+    handler = _DroppingQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+    handler.addFilter(RequestContextFilter(LOG_SAMPLE_RATE))
+    app_logger = logging.getLogger("app")
+    app_logger.setLevel(LOG_LEVEL)
+    app_logger.addHandler(handler)
+    app_logger.propagate = False
+    _listener = logging.handlers.QueueListener(handler.queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging() -> None:
+    """ Esvazia a fila e para o listener (chamado também na saída do processo). """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def get_logger(name: str) -> logging.Logger:
+    configure_logging()
+    return logging.getLogger(name)
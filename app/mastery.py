@@ -0,0 +1,136 @@
+# /app/mastery.py
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional
+
+# --- CONSTANTES DE CONFIGURAÇÃO ---
+WINDOW_SIZE = 5
+STREAK_SIZE = 3
+# Depois desse tempo o estado é reidratado do banco (respostas gravadas por outros workers).
+STATE_TTL_SECONDS = 900
+# Alunos mantidos em memória; além disso, os carregados há mais tempo são descartados
+MAX_TRACKED_USERS = 20000
+
+_WINDOW_MASK = (1 << WINDOW_SIZE) - 1
+
+
+def classify_topic(errors_in_last_5: int, successes_in_last_5: int, successful_streak_in_last_3: int) -> Optional[str]:
+    """ Regra única de classificação: 'weak', 'strong' ou None. """
+    if errors_in_last_5 > successes_in_last_5:
+        return "weak"
+    if successful_streak_in_last_3 >= STREAK_SIZE:
+        return "strong"
+    return None
+
+
+class TopicWindow:
+    """
+    Janela deslizante das últimas 5 respostas de um tópico, guardada como um inteiro de 5 bits
+    (bit 0 = resposta mais recente, 1 = correta).
+    """
+    __slots__ = ("bits", "length")
+
+    def __init__(self, bits: int = 0, length: int = 0):
+        self.bits = bits
+        self.length = length
+
+    def push(self, is_correct: bool) -> None:
+        self.bits = ((self.bits << 1) | int(is_correct)) & _WINDOW_MASK
+        self.length = min(self.length + 1, WINDOW_SIZE)
+
+    def counters(self) -> tuple:
+        successes = bin(self.bits).count("1")
+        streak = 0
+        while streak < min(STREAK_SIZE, self.length) and (self.bits >> streak) & 1:
+            streak += 1
+        return self.length - successes, successes, streak
+
+
+class StudentMasteryState:
+    """ Estado de maestria de um aluno, com os conjuntos de tópicos fracos/fortes mantidos incrementalmente. """
+
+    def __init__(self):
+        self.windows: Dict[str, TopicWindow] = {}
+        self.weak_topics: Dict[str, None] = {}
+        self.strong_topics: Dict[str, None] = {}
+        self.loaded_at = time.monotonic()
+
+    def _reclassify(self, topic: str) -> None:
+        self.weak_topics.pop(topic, None)
+        self.strong_topics.pop(topic, None)
+        label = classify_topic(*self.windows[topic].counters())
+        if label == "weak":
+            self.weak_topics[topic] = None
+        elif label == "strong":
+            self.strong_topics[topic] = None
+
+    def set_window(self, topic: str, window: TopicWindow) -> None:
+        self.windows[topic] = window
+        self._reclassify(topic)
+
+    def record(self, topic: str, is_correct: bool) -> None:
+        self.windows.setdefault(topic, TopicWindow()).push(is_correct)
+        self._reclassify(topic)
+
+    def summary(self) -> dict:
+        return {"weak_topics": list(self.weak_topics), "strong_topics": list(self.strong_topics)}
+
+
+def build_student_state(topic_answers: List[dict]) -> StudentMasteryState:
+    """
+    Monta o estado do aluno a partir do banco. `topic_answers` são as últimas respostas de cada tópico
+    (RPC recent_topic_answers, em ordem cronológica dentro do tópico): a janela de cada tópico é exata.
+    """
+    sequences: Dict[str, List[bool]] = {}
+    for answer in topic_answers:
+        sequences.setdefault(answer['topic'], []).append(bool(answer['is_correct']))
+    state = StudentMasteryState()
+    for topic, sequence in sequences.items():
+        window = TopicWindow()
+        for is_correct in sequence[-WINDOW_SIZE:]:
+            window.push(is_correct)
+        state.set_window(topic, window)
+    return state
+
+
+class MasteryStore:
+    """
+    Estados de maestria por aluno, em memória, reidratados sob demanda a partir do banco. Os alunos ficam em
+    ordem de carga: a cada reidratação, os expirados e os excedentes de `max_users` saem da frente.
+    """
+
+    def __init__(self, ttl: float = STATE_TTL_SECONDS, max_users: int = MAX_TRACKED_USERS):
+        self.ttl = ttl
+        self.max_users = max_users
+        self._states: "OrderedDict[str, StudentMasteryState]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_summary(self, user_id: str, load_state: Callable[[], StudentMasteryState]) -> dict:
+        with self._lock:
+            state = self._states.get(user_id)
+            if state and time.monotonic() - state.loaded_at < self.ttl:
+                return state.summary()
+        state = load_state()
+        with self._lock:
+            self._states.pop(user_id, None)
+            self._states[user_id] = state
+            while self._states:
+                oldest = next(iter(self._states.values()))
+                if len(self._states) <= self.max_users and state.loaded_at - oldest.loaded_at <= self.ttl:
+                    break
+                self._states.popitem(last=False)
+            return state.summary()
+
+    def record_answer(self, user_id: str, topics: Iterable[str], is_correct: bool) -> None:
+        # Alunos ainda não carregados são ignorados: a próxima leitura reidrata do banco.
+        with self._lock:
+            state = self._states.get(user_id)
+            if state is None:
+                return
+            for topic in topics:
+                state.record(topic, is_correct)
+
+
+mastery_store = MasteryStore()
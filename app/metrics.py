@@ -0,0 +1,198 @@
+# /app/metrics.py
+
+import bisect
+import os
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+# --- CONFIGURAÇÃO ---
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+METRIC_PREFIX = "englishtutor_"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str):
+        self.name = METRIC_PREFIX + name
+        self.documentation = documentation
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str):
+        super().__init__(name, documentation)
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def set_total(self, value: float, **labels) -> None:
+        """ Espelha um contador mantido por outro componente (ex.: acertos de um TTLCache). """
+        with self._lock:
+            self._values[tuple(sorted(labels.items()))] = value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return self.header() + [f"{self.name}{_format_labels(k)} {_format_value(v)}" for k, v in values]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str):
+        super().__init__(name, documentation)
+        self._values: Dict[tuple, float] = {}
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[tuple(sorted(labels.items()))] = value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return self.header() + [f"{self.name}{_format_labels(k)} {_format_value(v)}" for k, v in values]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [contagens por bucket (não cumulativas) + overflow, soma]
+        self._values: Dict[tuple, list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(sorted(labels.items()))
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = [(k, list(counts), total) for k, (counts, total) in self._values.items()]
+        lines = self.header()
+        for key, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(key, ('le', _format_value(bound)))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """ Registro das métricas do processo, exposto no formato texto do Prometheus (0.0.4). """
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Callable[[], None]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str) -> Counter:
+        return self.register(Counter(name, documentation))
+
+    def gauge(self, name: str, documentation: str) -> Gauge:
+        return self.register(Gauge(name, documentation))
+
+    def histogram(self, name: str, documentation: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, buckets))
+
+    def add_collector(self, collect: Callable[[], None]) -> None:
+        """ `collect` é chamado a cada coleta para atualizar gauges que são lidos de outros componentes. """
+        self._collectors.append(collect)
+
+    def render(self) -> str:
+        for collect in self._collectors:
+            try:
+                collect()
+            except Exception:
+                pass
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+# --- MÉTRICAS DA APLICAÇÃO ---
+operation_duration = registry.histogram(
+    "operation_duration_seconds", "Duração das operações instrumentadas (kind=db|llm|planner).")
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds", "Duração das requisições HTTP por rota.")
+planner_attempts = registry.counter("planner_attempts_total", "Tentativas do funil do planner, por nível (tier).")
+planner_results = registry.counter("planner_results_total", "Resultado do planner: nível que montou a lição ou 'none'.")
+answers_graded = registry.counter("answers_graded_total", "Respostas de exercícios corrigidas.")
+threadpool_tokens = registry.gauge("threadpool_tokens", "Ocupação do threadpool do AnyIO (state=borrowed|total|waiting).")
+cache_hits = registry.counter("cache_hits_total", "Acertos por cache.")
+cache_misses = registry.counter("cache_misses_total", "Erros (misses) por cache.")
+cache_size = registry.gauge("cache_entries", "Entradas atualmente em cada cache.")
+cache_hit_ratio = registry.gauge("cache_hit_ratio", "Taxa de acerto acumulada por cache.")
+cache_saved_seconds = registry.counter("cache_saved_seconds_total", "Tempo estimado economizado pelos acertos (custo médio de um miss x acertos).")
+
+
+def observe_operation(name: str, seconds: float) -> None:
+    """ `name` segue a convenção dos spans: 'db.get_active_lesson', 'llm.router', 'planner.plan_lesson'. """
+    kind, _, operation = name.partition(".")
+    operation_duration.observe(seconds, kind=kind, operation=operation or kind)
+
+
+def register_cache(stats: Callable[[], dict]) -> None:
+    """ Publica as estatísticas de um cache (dict com name, size, hits, misses, hit_rate e, se houver, saved_seconds) a cada coleta. """
+    def collect():
+        s = stats()
+        cache_hits.set_total(s['hits'], cache=s['name'])
+        cache_misses.set_total(s['misses'], cache=s['name'])
+        cache_size.set(s['size'], cache=s['name'])
+        cache_hit_ratio.set(s['hit_rate'], cache=s['name'])
+        if 'saved_seconds' in s:
+            cache_saved_seconds.set_total(s['saved_seconds'], cache=s['name'])
+    registry.add_collector(collect)
+
+
+def _collect_threadpool() -> None:
+    # Só funciona dentro do event loop (o endpoint /metrics é assíncrono).
+    import anyio.to_thread
+    statistics = anyio.to_thread.current_default_thread_limiter().statistics()
+    threadpool_tokens.set(statistics.borrowed_tokens, state="borrowed")
+    threadpool_tokens.set(statistics.total_tokens, state="total")
+    threadpool_tokens.set(statistics.tasks_waiting, state="waiting")
+
+
+registry.add_collector(_collect_threadpool)
@@ -0,0 +1,73 @@
+# /app/prefetch.py
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from .cache import TTLCache
+from .log import get_logger
+
+logger = get_logger(__name__)
+
+# --- CONSTANTES DE CONFIGURAÇÃO ---
+PREFETCH_WORKERS = 2
+CANDIDATE_TTL_SECONDS = 6 * 3600
+# Rascunhos guardados ao mesmo tempo; além disso, os dos alunos inativos há mais tempo são descartados (LRU)
+MAX_CANDIDATES = 4096
+
+# Pool de background que planeja a próxima lição enquanto o aluno não está esperando
+_executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="lesson-prefetch")
+_candidates = TTLCache("prefetch_candidates", maxsize=MAX_CANDIDATES, ttl=CANDIDATE_TTL_SECONDS)
+_in_flight: set = set()
+_lock = threading.Lock()
+
+
+def mastery_snapshot(performance: dict) -> tuple:
+    return frozenset(performance.get('weak_topics', [])), frozenset(performance.get('strong_topics', []))
+
+
+def schedule_next_lesson(user_id: str, plan: Callable[[], Optional[Dict[str, Any]]]) -> bool:
+    """
+    Agenda o planejamento da próxima lição do aluno em background.
+    `plan` deve devolver o rascunho da lição (sem salvar) com a chave 'mastery' contendo o snapshot usado.
+    Retorna False se já houver um planejamento em andamento para o aluno.
+    """
+    with _lock:
+        if user_id in _in_flight:
+            return False
+        _in_flight.add(user_id)
+        _candidates.pop(user_id, None)
+
+    def _run():
+        try:
+            draft = plan()
+            if draft:
+                _candidates.set(user_id, {"draft": draft, "created_at": time.time()})
+                logger.info("[PREFETCH] Próxima lição pronta para o usuário %s (%d itens).", user_id, len(draft['lesson_items']))
+        except Exception as e:
+            logger.error("ERRO ao pré-gerar a próxima lição: %s", e)
+        finally:
+            with _lock:
+                _in_flight.discard(user_id)
+
+    _executor.submit(_run)
+    return True
+
+
+def take_ready_lesson(user_id: str, get_current_mastery: Callable[[], tuple]) -> Optional[Dict[str, Any]]:
+    """
+    Retira o candidato pronto do aluno. O candidato é descartado se expirou ou se a maestria do aluno
+    (tópicos fracos/fortes) mudou desde o planejamento.
+    """
+    candidate = _candidates.pop(user_id)
+    if not candidate:
+        return None
+    if time.time() - candidate['created_at'] > CANDIDATE_TTL_SECONDS:
+        logger.info("[PREFETCH] Candidato expirado descartado para o usuário %s.", user_id)
+        return None
+    if candidate['draft'].get('mastery') != get_current_mastery():
+        logger.info("[PREFETCH] Maestria mudou desde o planejamento; candidato descartado para o usuário %s.", user_id)
+        return None
+    return candidate['draft']
+
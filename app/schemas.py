@@ -31,6 +31,7 @@ class AIResponse(BaseModel):
     response_type: Literal['new_lesson', 'active_lesson_returned', 'tutor_feedback', 'error']
     message_to_user: str
     content: Optional[Lesson] = None
+    planning_path: Optional[str] = None # Caminho do planner que montou a lição (ex.: 'general_ideal', 'budget_topic_index')
 
 # --- Modelos para Endpoints Diversos ---
 
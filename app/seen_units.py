@@ -0,0 +1,98 @@
+# /app/seen_units.py
+
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Callable, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from .unit_index import unit_index
+
+# --- CONSTANTES DE CONFIGURAÇÃO ---
+ROLLING_WINDOW_DAYS = 14
+# Depois desse tempo o estado é reidratado do banco (unidades vistas em outros workers).
+STATE_TTL_SECONDS = 900
+# Alunos mantidos em memória; além disso, os carregados há mais tempo são descartados
+MAX_TRACKED_USERS = 20000
+
+
+def _day_of(moment: Optional[datetime] = None) -> int:
+    return (moment or datetime.now(timezone.utc)).astimezone(timezone.utc).toordinal()
+
+
+class SeenUnits:
+    """ Unidades vistas (somente leitura): índices da tabela de interning, consultados pelo UUID da unidade. """
+    __slots__ = ("_indexes",)
+
+    def __init__(self, indexes: FrozenSet[int] = frozenset()):
+        self._indexes = indexes
+
+    def __contains__(self, unit_id: str) -> bool:
+        return unit_index.lookup(unit_id) in self._indexes
+
+    def __len__(self) -> int:
+        return len(self._indexes)
+
+
+class SeenUnitsTracker:
+    """
+    Unidades vistas por aluno, em "baldes" diários com os índices (int32, app/unit_index.py) das unidades:
+    4 bytes por unidade, em vez de um set de strings de UUID por aluno. Baldes mais antigos que a janela
+    de ROLLING_WINDOW_DAYS dias são descartados. Os alunos ficam em ordem de carga: a cada reidratação,
+    os expirados (que seriam recarregados de qualquer forma) e os excedentes de `max_users` saem da frente.
+    A consulta devolve um SeenUnits: o planner testa os candidatos pelo UUID sem montar um set de strings.
+    """
+
+    def __init__(self, window_days: int = ROLLING_WINDOW_DAYS, ttl: float = STATE_TTL_SECONDS, max_users: int = MAX_TRACKED_USERS):
+        self.window_days = window_days
+        self.ttl = ttl
+        self.max_users = max_users
+        self._users: "OrderedDict[str, Tuple[float, Dict[int, array]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _store(self, user_id: str, entry: Tuple[float, Dict[int, array]]) -> None:
+        self._users.pop(user_id, None)
+        self._users[user_id] = entry
+        while self._users:
+            oldest = next(iter(self._users.values()))
+            if len(self._users) <= self.max_users and entry[0] - oldest[0] <= self.ttl:
+                break
+            self._users.popitem(last=False)
+
+    def _expire(self, buckets: Dict[int, array], today: int) -> None:
+        for day in [d for d in buckets if d < today - self.window_days]:
+            del buckets[day]
+
+    def seen(self, user_id: str, days: int, load_seen: Callable[[], List[Tuple[str, datetime]]]) -> SeenUnits:
+        """ Unidades vistas nos últimos `days` dias (limitado à janela). `load_seen` reidrata o aluno do banco. """
+        today = _day_of()
+        with self._lock:
+            entry = self._users.get(user_id)
+        if entry is None or time.monotonic() - entry[0] > self.ttl:
+            days_seen: Dict[int, set] = {}
+            for unit_id, seen_at in load_seen():
+                days_seen.setdefault(_day_of(seen_at), set()).add(unit_index.intern(unit_id))
+            entry = (time.monotonic(), {day: array("i", sorted(indexes)) for day, indexes in days_seen.items()})
+            with self._lock:
+                self._store(user_id, entry)
+        first_day = today - min(days, self.window_days)
+        with self._lock:
+            buckets = entry[1]
+            self._expire(buckets, today)
+            return SeenUnits(frozenset().union(*(bucket for day, bucket in buckets.items() if day >= first_day)))
+
+    def mark_seen(self, user_id: str, unit_ids: Iterable[str]) -> None:
+        # Alunos ainda não carregados são ignorados: a próxima leitura reidrata do banco.
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is None:
+                return
+            today = _day_of()
+            buckets = entry[1]
+            bucket = buckets.setdefault(today, array("i"))
+            bucket.extend(sorted(set(map(unit_index.intern, unit_ids)).difference(bucket)))
+            self._expire(buckets, today)
+
+
+seen_units_tracker = SeenUnitsTracker()
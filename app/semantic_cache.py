@@ -0,0 +1,74 @@
+# /app/semantic_cache.py
+
+import math
+import operator
+import threading
+import time
+from typing import Dict, List, Optional
+
+# --- CONSTANTES DE CONFIGURAÇÃO ---
+SIMILARITY_THRESHOLD = 0.93
+MAX_ENTRIES_PER_LEVEL = 500
+ENTRY_TTL_SECONDS = 7 * 24 * 3600
+
+
+def _normalize(vector: List[float]) -> List[float]:
+    norm = math.sqrt(sum(v * v for v in vector))
+    return [v / norm for v in vector] if norm else list(vector)
+
+
+class SemanticResponseCache:
+    """
+    Armazena respostas do tutor para perguntas conceituais "canônicas", particionadas por nível.
+    A busca é por similaridade de cosseno entre embeddings normalizados; entradas expiram por TTL
+    e, quando a partição enche, a menos usada recentemente é descartada.
+    """
+
+    def __init__(self, threshold: float = SIMILARITY_THRESHOLD, max_entries_per_level: int = MAX_ENTRIES_PER_LEVEL,
+                 ttl: float = ENTRY_TTL_SECONDS):
+        self.threshold = threshold
+        self.max_entries_per_level = max_entries_per_level
+        self.ttl = ttl
+        self._partitions: Dict[str, List[dict]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _evict_stale(self, entries: List[dict], now: float) -> None:
+        entries[:] = [e for e in entries if now - e['created_at'] < self.ttl]
+
+    def lookup(self, level: str, embedding: List[float]) -> Optional[dict]:
+        query = _normalize(embedding)
+        now = time.time()
+        with self._lock:
+            entries = self._partitions.get(level, [])
+            self._evict_stale(entries, now)
+            entries = list(entries)
+        # A varredura (um produto escalar por entrada) roda fora do lock: buscas concorrentes não se serializam
+        best, best_score = None, -1.0
+        for entry in entries:
+            score = sum(map(operator.mul, query, entry['vector']))
+            if score > best_score:
+                best, best_score = entry, score
+        with self._lock:
+            if best is not None and best_score >= self.threshold:
+                best['last_hit'] = now
+                self.hits += 1
+                return {"question": best['question'], "answer": best['answer'], "score": best_score}
+            self.misses += 1
+            return None
+
+    def store(self, level: str, question: str, embedding: List[float], answer: str) -> None:
+        now = time.time()
+        with self._lock:
+            entries = self._partitions.setdefault(level, [])
+            self._evict_stale(entries, now)
+            if len(entries) >= self.max_entries_per_level:
+                entries.remove(min(entries, key=lambda e: e['last_hit']))
+            entries.append({"question": question, "vector": _normalize(embedding), "answer": answer,
+                            "created_at": now, "last_hit": now})
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {"name": "semantic_response", "size": sum(len(p) for p in self._partitions.values()),
+                "hits": self.hits, "misses": self.misses, "hit_rate": (self.hits / total) if total else 0.0}
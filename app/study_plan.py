@@ -7,6 +7,9 @@ from typing import Dict, Any, Optional
 from .dependencies import get_current_user
 from .database import get_db, get_student_progress_summary, get_lesson_for_module, update_student_lesson_progress
 from .schemas import Lesson
+from .log import get_logger
+
+logger = get_logger(__name__)
 
 router = APIRouter(
     prefix="/api/v1/study-plan",
@@ -21,7 +24,7 @@ def get_user_study_plan_progress(user_id: str = Depends(get_current_user), supab
             return {"overall_progress": {"completed_modules": 0, "total_modules": 0, "percentage": 0}, "modules": []}
         return progress_summary
     except Exception as e:
-        print(f"!!! ERRO CRÍTICO ao buscar progresso do plano de estudos: {e} !!!")
+        logger.error("ERRO CRÍTICO ao buscar progresso do plano de estudos: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/start-lesson", response_model=Lesson)
@@ -32,7 +35,7 @@ def start_next_study_plan_lesson(module_id: str = Body(..., embed=True), user_id
             raise HTTPException(status_code=404, detail="Nenhuma lição disponível ou o módulo já foi concluído.")
         return lesson_data
     except Exception as e:
-        print(f"!!! ERRO ao iniciar a lição do plano de estudos: {e} !!!")
+        logger.error("ERRO ao iniciar a lição do plano de estudos: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 # --- NOVO ENDPOINT PARA COMPLETAR UMA LIÇÃO ---
@@ -48,5 +51,5 @@ def complete_study_plan_lesson(module_id: str = Body(..., embed=True), user_id:
         # Retorna 204 No Content em caso de sucesso
         return
     except Exception as e:
-        print(f"!!! ERRO ao completar lição do plano de estudos: {e} !!!")
+        logger.error("ERRO ao completar lição do plano de estudos: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
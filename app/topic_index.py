@@ -0,0 +1,58 @@
+# /app/topic_index.py
+
+import threading
+from typing import Dict, Iterable, List, Tuple
+
+
+class TopicVocabulary:
+    """
+    Vocabulário de tópicos de um nível: cada tópico ocupa um bit. Os tópicos de cada unidade são
+    pré-calculados como máscara, de modo que exclusão e cobertura viram operações AND.
+    As máscaras ficam em cache pela lista de tópicos da unidade (e não pelo id): editar os tópicos de uma
+    unidade não deixa máscara velha, e o cache só cresce com as combinações de tópicos do catálogo.
+    """
+
+    def __init__(self, level: str):
+        self.level = level
+        self._bits: Dict[str, int] = {}
+        self._topic_set_masks: Dict[Tuple[str, ...], int] = {}
+        self._lock = threading.Lock()
+
+    def _bit(self, topic: str) -> int:
+        bit = self._bits.get(topic)
+        if bit is None:
+            with self._lock:
+                bit = self._bits.setdefault(topic, 1 << len(self._bits))
+        return bit
+
+    def load_topics(self, topics: Iterable[str]) -> None:
+        for topic in topics:
+            self._bit(topic)
+
+    def mask_of(self, topics: Iterable[str]) -> int:
+        mask = 0
+        for topic in topics:
+            mask |= self._bit(topic)
+        return mask
+
+    def unit_mask(self, unit: dict) -> int:
+        topics = tuple(unit.get('metadata', {}).get('topic', []))
+        mask = self._topic_set_masks.get(topics)
+        if mask is None:
+            mask = self._topic_set_masks[topics] = self.mask_of(topics)
+        return mask
+
+    def unit_masks(self, units: List[dict]) -> List[int]:
+        return [self.unit_mask(u) for u in units]
+
+
+_vocabularies: Dict[str, TopicVocabulary] = {}
+_vocabularies_lock = threading.Lock()
+
+
+def get_topic_vocabulary(level: str) -> TopicVocabulary:
+    vocabulary = _vocabularies.get(level)
+    if vocabulary is None:
+        with _vocabularies_lock:
+            vocabulary = _vocabularies.setdefault(level, TopicVocabulary(level))
+    return vocabulary
@@ -0,0 +1,113 @@
+# /app/tracing.py
+
+import functools
+import json
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, List, Optional
+
+from .metrics import METRICS_ENABLED, observe_operation
+from .deadline import BUDGETED_OPERATIONS, record_duration
+
+# --- CONFIGURAÇÃO (variáveis de ambiente) ---
+# TRACING_ENABLED=true liga a coleta de spans e o cabeçalho Server-Timing.
+# TRACE_FILE=/caminho/traces.jsonl exporta também cada requisição como uma linha JSON.
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "false").lower() in ("1", "true", "yes")
+TRACE_FILE = os.getenv("TRACE_FILE")
+
+# Lista de spans (nome, duração) da requisição atual; None quando não há requisição sendo rastreada.
+_request_spans: ContextVar[Optional[list]] = ContextVar("request_spans", default=None)
+_trace_file_lock = threading.Lock()
+
+
+class _Span:
+    __slots__ = ("name", "spans", "started")
+
+    def __init__(self, name: str, spans: Optional[list]):
+        self.name = name
+        self.spans = spans
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        duration = time.perf_counter() - self.started
+        if self.spans is not None:
+            self.spans.append((self.name, duration))
+        if METRICS_ENABLED:
+            observe_operation(self.name, duration)
+        # Chamadas que falharam ou foram rejeitadas (ex.: circuito aberto) não dizem quanto a operação demora
+        if exc_type is None:
+            record_duration(self.name, duration)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def span(name: str):
+    """
+    Mede um trecho de código (`with span("llm.router"): ...`): a duração vai para o trace da requisição
+    atual, para o histograma de operações do /metrics e para as estimativas de prazo (app.deadline).
+    Com tracing e métricas desligados, só as operações de BUDGETED_OPERATIONS são medidas.
+    """
+    spans = _request_spans.get()
+    if spans is None and not METRICS_ENABLED and name not in BUDGETED_OPERATIONS:
+        return _NOOP_SPAN
+    return _Span(name, spans)
+
+
+def traced(name: str) -> Callable:
+    """
+    Decorador que registra cada chamada da função como um span. Com tracing e métricas desligados, devolve a
+    própria função (exceto para as operações que alimentam as estimativas de prazo).
+    """
+    def decorator(func: Callable) -> Callable:
+        if not TRACING_ENABLED and not METRICS_ENABLED and name not in BUDGETED_OPERATIONS:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def start_request_trace() -> list:
+    spans: list = []
+    _request_spans.set(spans)
+    return spans
+
+
+def server_timing_header(spans: List[tuple], total: float) -> str:
+    """ Agrega os spans por nome no formato do cabeçalho Server-Timing (durações em ms). """
+    aggregated = {}
+    for name, duration in spans:
+        count, total_duration = aggregated.get(name, (0, 0.0))
+        aggregated[name] = (count + 1, total_duration + duration)
+    entries = [f'{name};dur={duration * 1000:.1f};desc="x{count}"' for name, (count, duration) in aggregated.items()]
+    entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries)
+
+
+def export_trace(method: str, path: str, status_code: int, spans: List[tuple], total: float) -> None:
+    if not TRACE_FILE:
+        return
+    record = {"ts": time.time(), "method": method, "path": path, "status": status_code, "total_ms": round(total * 1000, 2),
+              "spans": [{"name": name, "ms": round(duration * 1000, 2)} for name, duration in spans]}
+    with _trace_file_lock, open(TRACE_FILE, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
@@ -0,0 +1,44 @@
+# /app/unit_index.py
+
+import threading
+from typing import Dict, Iterable, List, Optional
+
+
+class UnitIndex:
+    """
+    Tabela de "interning" dos UUIDs das unidades de aprendizado: cada UUID recebe um índice inteiro denso
+    (cabe em int32). Os conjuntos de unidades guardados por aluno (app/seen_units.py) usam os índices, e a
+    tabela guarda uma única cópia de cada UUID para o catálogo inteiro.
+    """
+
+    def __init__(self):
+        self._indexes: Dict[str, int] = {}
+        self._unit_ids: List[str] = []
+        self._lock = threading.Lock()
+
+    def intern(self, unit_id: str) -> int:
+        index = self._indexes.get(unit_id)
+        if index is not None:
+            return index
+        with self._lock:
+            index = self._indexes.get(unit_id)
+            if index is None:
+                index = len(self._unit_ids)
+                self._unit_ids.append(unit_id)
+                self._indexes[unit_id] = index
+            return index
+
+    def lookup(self, unit_id: str) -> Optional[int]:
+        return self._indexes.get(unit_id)
+
+    def load_catalogue(self, unit_ids: Iterable[str]) -> int:
+        """ Interna o catálogo inteiro de uma vez (índices estáveis e densos desde o início). """
+        for unit_id in unit_ids:
+            self.intern(unit_id)
+        return len(self._unit_ids)
+
+    def __len__(self) -> int:
+        return len(self._unit_ids)
+
+
+unit_index = UnitIndex()
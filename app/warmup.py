@@ -0,0 +1,113 @@
+# /app/warmup.py
+
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from .agents import import_llm_stack, warm_up_llm
+from .database import get_db, get_level_catalogue, get_curriculum
+from .unit_index import unit_index
+from .topic_index import get_topic_vocabulary
+from .log import get_logger
+from .metrics import registry
+
+logger = get_logger(__name__)
+
+# --- CONFIGURAÇÃO (variáveis de ambiente) ---
+# Desligado, o worker fica pronto na hora e paga a subida fria nas primeiras requisições
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() in ("1", "true", "yes")
+# Níveis cujo catálogo, vocabulário de tópicos e currículo são carregados na subida
+WARMUP_LEVELS = [level.strip() for level in os.getenv("WARMUP_LEVELS", "A1").split(",") if level.strip()]
+# Chain usado na invocação de teste: "router", "conversation", "semantic_query" ou "none" (só cria os clientes)
+WARMUP_LLM_TARGET = os.getenv("WARMUP_LLM_TARGET", "router").lower()
+# Passado esse tempo, o /ready libera o worker mesmo com o warm-up em andamento (frio é melhor que fora do balanceador)
+WARMUP_TIMEOUT_SECONDS = float(os.getenv("WARMUP_TIMEOUT_SECONDS", "60"))
+
+warmup_ready = registry.gauge("warmup_ready", "1 depois que o warm-up da subida terminou (ou estourou WARMUP_TIMEOUT_SECONDS).")
+warmup_step_duration = registry.gauge("warmup_step_duration_seconds", "Duração de cada etapa do warm-up da subida.")
+
+
+class WarmupState:
+    """ Estado do warm-up deste worker, consultado pelo /ready. As etapas falham isoladamente, sem impedir a prontidão. """
+
+    def __init__(self):
+        self.steps: List[Dict[str, Any]] = []
+        self._started_at: Optional[float] = None
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        self._started_at = time.monotonic()
+
+    def finish(self) -> None:
+        self._done.set()
+
+    def is_ready(self) -> bool:
+        if self._done.is_set():
+            return True
+        return self._started_at is not None and time.monotonic() - self._started_at > WARMUP_TIMEOUT_SECONDS
+
+    def run_step(self, name: str, fn: Callable[[], Any]) -> None:
+        started = time.perf_counter()
+        error = None
+        try:
+            fn()
+        except Exception as e:
+            error = str(e)
+            logger.error("ERRO no warm-up (%s): %s", name, e)
+        seconds = time.perf_counter() - started
+        warmup_step_duration.set(seconds, step=name)
+        with self._lock:
+            self.steps.append({"step": name, "seconds": round(seconds, 3), "ok": error is None, **({"error": error} if error else {})})
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            steps = list(self.steps)
+        return {"ready": self.is_ready(), "warmup_complete": self._done.is_set(), "steps": steps}
+
+
+warmup_state = WarmupState()
+
+
+def _collect_warmup() -> None:
+    warmup_ready.set(1 if warmup_state.is_ready() else 0)
+
+
+registry.add_collector(_collect_warmup)
+
+
+def _warm_level(level: str) -> None:
+    supabase = get_db()
+    catalogue = get_level_catalogue(supabase, level)
+    unit_index.load_catalogue(catalogue["unit_ids"])
+    get_topic_vocabulary(level).load_topics(catalogue["topics"])
+    get_curriculum(supabase, level)
+
+
+def run_warmup() -> None:
+    """
+    Aquece o worker antes de receber tráfego: importa a pilha do LLM, cria o cliente do Supabase (a primeira
+    consulta abre a conexão do pool), carrega catálogo, vocabulário de tópicos e currículo de WARMUP_LEVELS
+    e faz uma invocação de teste do chain WARMUP_LLM_TARGET. Roda em uma thread iniciada por main.lifespan.
+    """
+    started = time.perf_counter()
+    try:
+        warmup_state.run_step("import_llm_stack", import_llm_stack)
+        warmup_state.run_step("supabase_client", get_db)
+        for level in WARMUP_LEVELS:
+            warmup_state.run_step(f"catalogue:{level}", lambda level=level: _warm_level(level))
+        warmup_state.run_step(f"llm:{WARMUP_LLM_TARGET}", lambda: warm_up_llm(WARMUP_LLM_TARGET))
+    finally:
+        warmup_state.finish()
+    logger.info("Warm-up concluído em %.2fs: %s", time.perf_counter() - started,
+                ", ".join(f"{s['step']}={s['seconds']}s{'' if s['ok'] else ' (ERRO)'}" for s in warmup_state.steps))
+
+
+def start_warmup() -> None:
+    """ Inicia o warm-up em background; desligado (WARMUP_ENABLED=false), marca o worker como pronto na hora. """
+    warmup_state.start()
+    if not WARMUP_ENABLED:
+        warmup_state.finish()
+        return
+    threading.Thread(target=run_warmup, name="startup-warmup", daemon=True).start()
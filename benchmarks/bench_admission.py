@@ -0,0 +1,101 @@
+# /benchmarks/bench_admission.py
+"""
+Mede o efeito do controle de admissão do LLM quando a OpenAI fica lenta.
+
+Um grupo de alunos dispara /tutor/interact (chat, LLM lento) em laço fechado enquanto outro grupo
+responde exercícios em /lessons/answer. Sem admissão, as requisições do LLM ocupam o threadpool e
+as respostas de exercício esperam na fila de threads; com admissão, o excedente espera no event loop
+(ou recebe 503/429 com Retry-After) e os endpoints baratos continuam rápidos.
+
+Uso:
+    python -m benchmarks.bench_admission --chat-users 80 --answer-users 8 --llm-latency 3 --seconds 20
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+import uuid
+from typing import Dict, List
+
+import httpx
+
+from benchmarks.bench_endpoints import percentile
+from benchmarks.standins import FakeOpenAIServer, FakeSupabase, load_app_with_standins, make_token, seed_catalogue
+
+
+async def _closed_loop(client: httpx.AsyncClient, request, stop_at: float, latencies: List[float], statuses: Dict[int, int]) -> None:
+    while time.monotonic() < stop_at:
+        started = time.perf_counter()
+        try:
+            response = await request(client)
+            status_code = response.status_code
+        except Exception:
+            status_code = 0
+        statuses[status_code] = statuses.get(status_code, 0) + 1
+        if status_code == 200 or status_code == 204:
+            latencies.append(time.perf_counter() - started)
+        elif status_code in (429, 503):
+            await asyncio.sleep(float(response.headers.get("retry-after", 1)))
+
+
+async def run(app, db: FakeSupabase, args) -> dict:
+    exercises = [u for u in db.tables["learning_units"] if "correct_answer" in u['content']]
+    chat_latencies, answer_latencies = [], []
+    chat_statuses, answer_statuses = {}, {}
+
+    def chat_request(user_id: str):
+        headers = {"Authorization": f"Bearer {make_token(user_id)}"}
+        return lambda client: client.post("/api/v1/tutor/interact", headers=headers,
+                                          json={"type": "chat_message", "text": "obrigado pela ajuda"})
+
+    def answer_request(user_id: str):
+        headers = {"Authorization": f"Bearer {make_token(user_id)}"}
+        unit = exercises[hash(user_id) % len(exercises)]
+        return lambda client: client.post("/api/v1/lessons/answer", headers=headers, json={
+            "lesson_id": str(uuid.uuid4()), "unit_id": unit['id'], "student_response": unit['content']['correct_answer']})
+
+    stop_at = time.monotonic() + args.seconds
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=120) as client:
+        tasks = [_closed_loop(client, chat_request(str(uuid.uuid4())), stop_at, chat_latencies, chat_statuses)
+                 for _ in range(args.chat_users)]
+        tasks += [_closed_loop(client, answer_request(str(uuid.uuid4())), stop_at, answer_latencies, answer_statuses)
+                  for _ in range(args.answer_users)]
+        await asyncio.gather(*tasks)
+
+    def stats(latencies: List[float], statuses: Dict[int, int]) -> dict:
+        return {"ok": len(latencies), "statuses": statuses, "p50_ms": round(percentile(latencies, 0.5) * 1000, 1),
+                "p95_ms": round(percentile(latencies, 0.95) * 1000, 1), "p99_ms": round(percentile(latencies, 0.99) * 1000, 1)}
+
+    return {"tutor_interact": stats(chat_latencies, chat_statuses), "lessons_answer": stats(answer_latencies, answer_statuses)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chat-users", type=int, default=80)
+    parser.add_argument("--answer-users", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--llm-latency", type=float, default=3.0)
+    parser.add_argument("--db-latency", type=float, default=0.01)
+    args = parser.parse_args()
+
+    db = FakeSupabase(latency=args.db_latency)
+    seed_catalogue(db)
+    llm_server = FakeOpenAIServer(median_latency=args.llm_latency, sigma=0.3).start()
+    try:
+        app = load_app_with_standins(db, llm_server)
+        logging.getLogger("app").setLevel(logging.CRITICAL)
+        from app.admission import llm_admission
+        configured = (llm_admission.max_concurrent, llm_admission.max_queue)
+        for label, limits in (("sem admissão", (10 ** 6, 10 ** 6)), ("com admissão", configured)):
+            llm_admission.max_concurrent, llm_admission.max_queue = limits
+            result = asyncio.run(run(app, db, args))
+            print(f"--- {label} (max_concurrent={limits[0]}, max_queue={limits[1]}) ---")
+            for name, values in result.items():
+                print(f"{name:<16} {values}")
+    finally:
+        llm_server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+# /benchmarks/bench_auth.py
+"""
+Mede o custo de autenticação por requisição em `get_current_user`, com e sem o cache de tokens verificados.
+
+Uso:
+    python -m benchmarks.bench_auth --requests 20000
+"""
+
+import argparse
+import os
+import time
+import uuid
+
+os.environ.setdefault("SUPABASE_JWT_SECRET", "benchmark-secret")
+
+import jwt
+
+from app import dependencies
+
+
+def _make_token(user_id: str, ttl: int = 3600) -> str:
+    claims = {"sub": user_id, "aud": "authenticated", "exp": int(time.time()) + ttl}
+    return jwt.encode(claims, dependencies.JWT_SECRET, algorithm="HS256")
+
+
+def _run(tokens: list, requests: int, use_cache: bool) -> float:
+    dependencies._verified_token_cache.clear()
+    started = time.perf_counter()
+    for i in range(requests):
+        if not use_cache:
+            dependencies._verified_token_cache.clear()
+        dependencies.get_current_user(tokens[i % len(tokens)])
+    return (time.perf_counter() - started) / requests
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--users", type=int, default=50, help="Tokens distintos em rotação.")
+    args = parser.parse_args()
+
+    tokens = [_make_token(str(uuid.uuid4())) for _ in range(args.users)]
+    without_cache = _run(tokens, args.requests, use_cache=False)
+    with_cache = _run(tokens, args.requests, use_cache=True)
+    print(f"sem cache: {without_cache * 1e6:8.1f} µs/requisição")
+    print(f"com cache: {with_cache * 1e6:8.1f} µs/requisição ({without_cache / with_cache:.1f}x mais rápido)")
+
+
+if __name__ == "__main__":
+    main()
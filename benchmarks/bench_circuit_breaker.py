@@ -0,0 +1,92 @@
+# /benchmarks/bench_circuit_breaker.py
+"""
+Mede o efeito dos circuit breakers (app.circuit_breaker) quando o RPC `match_learning_units` degrada.
+
+Cada aluno gera uma lição geral e a completa, em laço fechado. O RPC de busca vetorial do Supabase
+falso passa a levar `--rpc-latency` segundos. Sem breakers, toda geração espera o RPC lento; com
+breakers, depois de CIRCUIT_MIN_CALLS chamadas lentas o circuito abre e o planner passa a usar o
+caminho barato (candidatos em cache ou índice de tópicos) até as chamadas de teste do meio-aberto.
+
+Uso:
+    python -m benchmarks.bench_circuit_breaker --users 12 --rpc-latency 5 --seconds 30
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+import uuid
+from typing import Dict, List
+
+import httpx
+
+from benchmarks.bench_endpoints import percentile
+from benchmarks.standins import FakeOpenAIServer, FakeSupabase, load_app_with_standins, make_token, seed_catalogue
+
+
+async def _student(client: httpx.AsyncClient, stop_at: float, latencies: List[float], paths: Dict[str, int]) -> None:
+    headers = {"Authorization": f"Bearer {make_token(str(uuid.uuid4()))}"}
+    while time.monotonic() < stop_at:
+        started = time.perf_counter()
+        response = await client.post("/api/v1/tutor/interact", headers=headers,
+                                     json={"type": "button_click", "action_id": "generate_new_lesson"})
+        body = response.json() if response.status_code == 200 else {}
+        path = body.get("planning_path") or f"{body.get('response_type', response.status_code)}"
+        paths[path] = paths.get(path, 0) + 1
+        if not body.get("content"):
+            await asyncio.sleep(0.5)
+            continue
+        latencies.append(time.perf_counter() - started)
+        await client.post("/api/v1/tutor/interact", headers=headers, json={
+            "type": "button_click", "action_id": "complete_current_lesson",
+            "metadata": {"lesson_id": body["content"]["lesson_id"]}})
+
+
+async def run(app, args) -> dict:
+    latencies: List[float] = []
+    paths: Dict[str, int] = {}
+    stop_at = time.monotonic() + args.seconds
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=120) as client:
+        await asyncio.gather(*(_student(client, stop_at, latencies, paths) for _ in range(args.users)))
+    return {"lessons": len(latencies), "p50_ms": round(percentile(latencies, 0.5) * 1000),
+            "p95_ms": round(percentile(latencies, 0.95) * 1000), "paths": paths}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=12)
+    parser.add_argument("--seconds", type=float, default=30)
+    parser.add_argument("--rpc-latency", type=float, default=5.0)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--db-latency", type=float, default=0.005)
+    args = parser.parse_args()
+
+    db = FakeSupabase(latency=args.db_latency)
+    seed_catalogue(db)
+    execute_rpc = db._execute_rpc
+
+    def degraded_rpc(name: str, params: dict):
+        # Fora do lock do banco falso: as chamadas lentas se sobrepõem, como num Postgres de verdade
+        if name == "match_learning_units":
+            time.sleep(args.rpc_latency)
+        return execute_rpc(name, params)
+
+    db._execute_rpc = degraded_rpc
+    llm_server = FakeOpenAIServer(median_latency=args.llm_latency, sigma=0.2).start()
+    try:
+        app = load_app_with_standins(db, llm_server)
+        logging.getLogger("app").setLevel(logging.CRITICAL)
+        from app import circuit_breaker
+        from app.metrics import registry
+        for enabled in (False, True):
+            circuit_breaker.CIRCUIT_BREAKERS_ENABLED = enabled
+            result = asyncio.run(run(app, args))
+            print(f"breakers={'on ' if enabled else 'off'} {result}")
+        print("\n".join(l for l in registry.render().splitlines()
+                        if l.startswith("englishtutor_circuit_breaker") and "match_learning_units" in l))
+    finally:
+        llm_server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+# /benchmarks/bench_endpoints.py
+"""
+Benchmark dos endpoints da API, executando a aplicação FastAPI em processo (httpx + ASGITransport),
+com Supabase e OpenAI substituídos pelos stand-ins locais de `benchmarks.standins`.
+
+Uso:
+    python -m benchmarks.bench_endpoints --requests 200 --concurrency 8 --db-latency 0.02 --llm-latency 0.3
+    python -m benchmarks.bench_endpoints --endpoints lessons_answer study_plan_progress --output resultados.json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import random
+import statistics
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, List
+
+import httpx
+
+from benchmarks.standins import FakeOpenAIServer, FakeSupabase, load_app_with_standins, make_token, seed_catalogue
+
+
+def percentile(samples: List[float], q: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    position = (len(ordered) - 1) * q
+    lower, upper = int(position), min(int(position) + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> Dict[str, float]:
+    return {
+        "requests": len(latencies) + errors, "errors": errors,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 2) if latencies else 0.0,
+        "throughput_rps": round((len(latencies) + errors) / elapsed, 2) if elapsed else 0.0,
+    }
+
+
+class Scenario:
+    """ Um endpoint a medir: `request(client, i)` faz a i-ésima requisição e devolve a resposta. """
+
+    def __init__(self, name: str, request: Callable[[httpx.AsyncClient, int], Awaitable[httpx.Response]]):
+        self.name = name
+        self.request = request
+
+
+def build_scenarios(db: FakeSupabase) -> List[Scenario]:
+    units = db.tables["learning_units"]
+    exercises = [u for u in units if "correct_answer" in u['content']]
+    module_ids = [m['id'] for m in db.tables["modules"]]
+    users = [str(uuid.uuid4()) for _ in range(64)]
+
+    def auth(user_id: str) -> dict:
+        return {"Authorization": f"Bearer {make_token(user_id)}"}
+
+    async def lessons_answer(client, i):
+        unit = exercises[i % len(exercises)]
+        answer = unit['content']['correct_answer'] if i % 3 else "wrong"
+        return await client.post("/api/v1/lessons/answer", headers=auth(users[i % len(users)]),
+                                 json={"lesson_id": str(uuid.uuid4()), "unit_id": unit['id'], "student_response": answer})
+
+    async def study_plan_progress(client, i):
+        return await client.get("/api/v1/study-plan/progress", headers=auth(users[i % len(users)]))
+
+    async def study_plan_start_lesson(client, i):
+        return await client.post("/api/v1/study-plan/start-lesson", headers=auth(users[i % len(users)]),
+                                 json={"module_id": module_ids[i % len(module_ids)]})
+
+    async def tutor_interact_chat(client, i):
+        text = random.choice(["qual a diferença entre do e does?", "como uso o simple past?", "obrigado pela ajuda",
+                              "o que significa 'there is'?"])
+        return await client.post("/api/v1/tutor/interact", headers=auth(users[i % len(users)]),
+                                 json={"type": "chat_message", "text": text})
+
+    async def tutor_interact_generate(client, i):
+        # Um aluno novo por requisição: sem lição ativa, o funil de planejamento completo é executado.
+        return await client.post("/api/v1/tutor/interact", headers=auth(str(uuid.uuid4())),
+                                 json={"type": "button_click", "action_id": "generate_new_lesson"})
+
+    return [Scenario("lessons_answer", lessons_answer), Scenario("study_plan_progress", study_plan_progress),
+            Scenario("study_plan_start_lesson", study_plan_start_lesson),
+            Scenario("tutor_interact_chat", tutor_interact_chat),
+            Scenario("tutor_interact_generate", tutor_interact_generate)]
+
+
+async def run_scenario(client: httpx.AsyncClient, scenario: Scenario, requests: int, concurrency: int) -> Dict[str, float]:
+    latencies: List[float] = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int) -> None:
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                response = await scenario.request(client, i)
+                ok = response.status_code < 400
+            except Exception:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+
+async def main_async(args) -> Dict[str, Dict[str, float]]:
+    db = FakeSupabase(latency=args.db_latency)
+    seed_catalogue(db)
+    llm_server = FakeOpenAIServer(median_latency=args.llm_latency, sigma=args.llm_sigma).start()
+    try:
+        app = load_app_with_standins(db, llm_server)
+        if not args.verbose:
+            logging.getLogger("app").setLevel(logging.CRITICAL)
+        scenarios = [s for s in build_scenarios(db) if not args.endpoints or s.name in args.endpoints]
+        results = {}
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            for scenario in scenarios:
+                quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+                with quiet:
+                    results[scenario.name] = await run_scenario(client, scenario, args.requests, args.concurrency)
+                print(f"{scenario.name:<26} {json.dumps(results[scenario.name])}")
+        return results
+    finally:
+        llm_server.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=100, help="Requisições por endpoint.")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--db-latency", type=float, default=0.01, help="Latência por round trip ao Supabase (s).")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Latência mediana da OpenAI (s).")
+    parser.add_argument("--llm-sigma", type=float, default=0.5, help="Dispersão log-normal da latência da OpenAI.")
+    parser.add_argument("--endpoints", nargs="*", help="Subconjunto de cenários a executar.")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--verbose", action="store_true", help="Mostra os logs da aplicação.")
+    args = parser.parse_args()
+
+    results = asyncio.run(main_async(args))
+    report = {"config": {k: v for k, v in vars(args).items() if k != "output"}, "results": results}
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"--- Resultados gravados em {args.output} ---")
+
+
+if __name__ == "__main__":
+    main()
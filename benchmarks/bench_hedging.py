@@ -0,0 +1,77 @@
+# /benchmarks/bench_hedging.py
+"""
+Avalia o hedge de requisições ao LLM (app.hedging) contra um LLM falso com latência de cauda pesada.
+
+A latência de cada chamada é uma mistura: na maior parte das vezes uma log-normal em torno de
+`--median`, e com probabilidade `--tail-probability` uma cauda de Pareto (chamadas que "travam").
+As mesmas chamadas do roteador são feitas com e sem hedge, e o relatório mostra p50/p95/p99 e
+quantas chamadas extras o hedge custou.
+
+Uso:
+    python -m benchmarks.bench_hedging --calls 600 --concurrency 8
+"""
+
+import argparse
+import logging
+import math
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.bench_endpoints import percentile
+from benchmarks.standins import FakeOpenAIServer, FakeSupabase, load_app_with_standins
+
+
+def heavy_tailed_sampler(median: float, tail_probability: float, tail_scale: float, max_latency: float):
+    def sample() -> float:
+        if random.random() < tail_probability:
+            return min(max_latency, tail_scale * random.paretovariate(1.5))
+        return random.lognormvariate(math.log(median), 0.25)
+    return sample
+
+
+def run(calls: int, concurrency: int) -> list:
+    from app.agents import _create_topic_router_chain
+    from app.hedging import hedged_invoke
+
+    def one(i: int) -> float:
+        started = time.perf_counter()
+        hedged_invoke("router", _create_topic_router_chain(), {"user_message": f"mensagem {i}", "history": []})
+        return time.perf_counter() - started
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(one, range(calls)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=600)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--median", type=float, default=0.3)
+    parser.add_argument("--tail-probability", type=float, default=0.05)
+    parser.add_argument("--tail-scale", type=float, default=1.5)
+    parser.add_argument("--max-latency", type=float, default=10.0)
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer(latency_sampler=heavy_tailed_sampler(
+        args.median, args.tail_probability, args.tail_scale, args.max_latency)).start()
+    try:
+        load_app_with_standins(FakeSupabase(), server)
+        logging.getLogger("app").setLevel(logging.CRITICAL)
+        from app import hedging
+        from app.metrics import registry
+        for enabled in (False, True):
+            hedging.HEDGING_ENABLED = enabled
+            calls_before = server.calls
+            latencies = run(args.calls, args.concurrency)
+            extra = (server.calls - calls_before - args.calls) / args.calls
+            print(f"hedge={'on ' if enabled else 'off'} p50={percentile(latencies, 0.5) * 1000:7.0f} ms  "
+                  f"p95={percentile(latencies, 0.95) * 1000:7.0f} ms  p99={percentile(latencies, 0.99) * 1000:7.0f} ms  "
+                  f"max={max(latencies) * 1000:7.0f} ms  chamadas extras={extra:.1%}")
+        print("\n".join(l for l in registry.render().splitlines() if l.startswith("englishtutor_llm_hedges")))
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
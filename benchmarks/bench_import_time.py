@@ -0,0 +1,80 @@
+# /benchmarks/bench_import_time.py
+"""
+Mede o custo de cold start do `import main` com `python -X importtime`.
+
+Roda o import em processos novos (`--repeat` vezes), interpreta a saída do -X importtime e mostra a
+mediana do tempo total e os pacotes de topo que mais pesam (soma do tempo próprio de seus módulos).
+Com `--budget-ms`, termina com código 1 se a mediana passar do orçamento (uso em CI).
+
+Uso:
+    python -m benchmarks.bench_import_time --repeat 5 --top 10
+    python -m benchmarks.bench_import_time --budget-ms 900
+"""
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+# "import time:       self [us] |  cumulative | imported package"
+_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_importtime(stderr: str) -> Tuple[Dict[str, int], Dict[str, int]]:
+    """ Devolve (tempo cumulativo por módulo, tempo próprio somado por pacote de topo), em microssegundos. """
+    cumulative: Dict[str, int] = {}
+    by_package: Dict[str, int] = {}
+    for line in stderr.splitlines():
+        match = _LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, module = int(match.group(1)), int(match.group(2)), match.group(4)
+        cumulative[module] = cumulative_us
+        package = module.split(".")[0]
+        by_package[package] = by_package.get(package, 0) + self_us
+    return cumulative, by_package
+
+
+def measure(module: str) -> Tuple[Dict[str, int], Dict[str, int]]:
+    env = dict(os.environ, SUPABASE_JWT_SECRET=os.environ.get("SUPABASE_JWT_SECRET", "bench"),
+               OPENAI_API_KEY=os.environ.get("OPENAI_API_KEY", "bench"))
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    return parse_importtime(result.stderr)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--budget-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    totals: List[float] = []
+    packages: Dict[str, List[int]] = {}
+    llm_loaded = False
+    for _ in range(args.repeat):
+        cumulative, by_package = measure(args.module)
+        totals.append(cumulative[args.module] / 1000)
+        for package, self_us in by_package.items():
+            packages.setdefault(package, []).append(self_us)
+        llm_loaded = llm_loaded or any(p in by_package for p in ("langchain_openai", "langchain_core", "openai"))
+
+    median_ms = statistics.median(totals)
+    print(f"import {args.module}: mediana {median_ms:.0f} ms (min {min(totals):.0f}, max {max(totals):.0f}, n={args.repeat})")
+    print(f"pilha do LLM (langchain/openai) importada na subida: {'sim' if llm_loaded else 'não'}")
+    ranking = sorted(packages.items(), key=lambda item: statistics.median(item[1]), reverse=True)[:args.top]
+    for package, samples in ranking:
+        print(f"  {package:<28} {statistics.median(samples) / 1000:8.1f} ms")
+    if args.budget_ms is not None and median_ms > args.budget_ms:
+        print(f"ACIMA DO ORÇAMENTO: {median_ms:.0f} ms > {args.budget_ms:.0f} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
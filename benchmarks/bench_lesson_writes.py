@@ -0,0 +1,65 @@
+# /benchmarks/bench_lesson_writes.py
+"""
+Conta as linhas gravadas para criar lições do Modo Prática com templates endereçados pelo conteúdo
+(sql/lesson_templates.sql), comparando com o esquema anterior (uma linha em `lessons` + uma em
+`lesson_items` por unidade).
+
+Cada iteração escolhe um aluno, planeja uma lição (por tópico com probabilidade `--topic-share`,
+geral no restante), salva e completa a lição, para que o aluno possa receber a próxima.
+
+Uso:
+    python -m benchmarks.bench_lesson_writes --lessons 1000 --students 200
+"""
+
+import argparse
+import logging
+import random
+import uuid
+
+from benchmarks.standins import TOPICS, FakeOpenAIServer, FakeSupabase, load_app_with_standins, seed_catalogue
+
+TEMPLATE_TABLES = ("lessons", "lesson_templates", "lesson_template_items")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lessons", type=int, default=1000)
+    parser.add_argument("--students", type=int, default=200)
+    parser.add_argument("--topic-share", type=float, default=0.7)
+    args = parser.parse_args()
+
+    db = FakeSupabase()
+    seed_catalogue(db)
+    llm_server = FakeOpenAIServer(median_latency=0.001, sigma=0.1).start()
+    try:
+        load_app_with_standins(db, llm_server)
+        logging.getLogger("app").setLevel(logging.CRITICAL)
+        from app.agents import tool_plan_new_lesson
+        from app.database import complete_lesson
+
+        students = [str(uuid.uuid4()) for _ in range(args.students)]
+        before = {table: len(db.tables.get(table, [])) for table in TEMPLATE_TABLES}
+        legacy_rows = lessons = 0
+        while lessons < args.lessons:
+            user_id = random.choice(students)
+            topic_tag = random.choice(TOPICS) if random.random() < args.topic_share else "general-practice"
+            lesson = tool_plan_new_lesson(db, user_id, topic_tag)
+            if not lesson:
+                continue
+            lessons += 1
+            legacy_rows += 1 + len(lesson['lesson_items'])
+            complete_lesson(db, user_id, lesson['lesson_id'])
+        written = {table: len(db.tables.get(table, [])) - before[table] for table in TEMPLATE_TABLES}
+    finally:
+        llm_server.stop()
+
+    template_rows = sum(written.values())
+    per_thousand = 1000 / lessons
+    print(f"lições: {lessons}  templates distintos: {written['lesson_templates']}")
+    print(f"esquema anterior (lessons + lesson_items): {legacy_rows * per_thousand:8.0f} linhas / 1.000 lições")
+    print(f"com templates ({' + '.join(TEMPLATE_TABLES)}): {template_rows * per_thousand:8.0f} linhas / 1.000 lições "
+          f"({1 - template_rows / legacy_rows:.0%} a menos)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# /benchmarks/bench_logging.py
+"""
+Compara o custo, na thread da requisição, de `print` síncrono e do logger estruturado com fila (app.log).
+
+Cada "requisição" emite as mensagens de um funil do planner (padrão: 12). Várias threads simulam o
+threadpool do servidor. A saída vai para um arquivo; `--sink-delay` simula um stdout lento (pipe cheio,
+coletor de logs com backpressure), que é onde o print bloqueia a requisição.
+
+Uso:
+    python -m benchmarks.bench_logging --threads 8 --requests 2000 --sink-delay 0.0002
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.bench_endpoints import percentile
+
+
+class SlowSink:
+    """ Arquivo cujo write demora `delay` segundos, serializado como um descritor real. """
+
+    def __init__(self, target, delay: float):
+        self.target = target
+        self.delay = delay
+        self._lock = threading.Lock()
+
+    def write(self, text: str) -> int:
+        with self._lock:
+            if self.delay:
+                time.sleep(self.delay)
+            return self.target.write(text)
+
+    def flush(self) -> None:
+        self.target.flush()
+
+
+def _request_with_print(messages: int) -> None:
+    for i in range(messages):
+        print(f"--- [PLANNER] Tentativa {i} (Geral): Busca Dinâmica para 'simple present'...")
+
+
+def _request_with_logger(logger, sampled_extra, messages: int) -> None:
+    for i in range(messages):
+        logger.info("[PLANNER] Tentativa %d (Geral): Busca Dinâmica para '%s'...", i, "simple present", extra=sampled_extra)
+
+
+def _run(label: str, request, threads: int, requests: int) -> dict:
+    latencies = []
+
+    def timed(_):
+        started = time.perf_counter()
+        request()
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(timed, range(requests)))
+    elapsed = time.perf_counter() - started
+    return {"mode": label, "p50_us": round(percentile(latencies, 0.50) * 1e6, 1),
+            "p99_us": round(percentile(latencies, 0.99) * 1e6, 1), "requests_per_s": round(requests / elapsed, 1)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--messages", type=int, default=12, help="Mensagens de log por requisição.")
+    parser.add_argument("--sink-delay", type=float, default=0.0, help="Atraso (s) por write na saída.")
+    args = parser.parse_args()
+
+    os.environ["LOG_SAMPLE_RATE"] = "1.0"
+    from app import log
+
+    with tempfile.TemporaryDirectory() as directory:
+        target = open(os.path.join(directory, "out.log"), "w", buffering=1, encoding="utf-8")
+        sink = SlowSink(target, args.sink_delay)
+        log.configure_logging(stream=sink)
+        logger = log.get_logger("app.bench")
+        sampling_filter = logger.parent.handlers[0].filters[0]
+
+        results = []
+        original_stdout = sys.stdout
+        sys.stdout = sink
+        try:
+            results.append(_run("print", lambda: _request_with_print(args.messages), args.threads, args.requests))
+        finally:
+            sys.stdout = original_stdout
+        for rate in (1.0, 0.1):
+            sampling_filter.sample_rate = rate
+            # Cada requisição tem seu próprio id, para que a amostragem por requisição se aplique.
+            def request():
+                log.request_id_var.set(os.urandom(8).hex())
+                _request_with_logger(logger, log.SAMPLED, args.messages)
+            results.append(_run(f"logger (amostragem {rate:.0%})", request, args.threads, args.requests))
+            started = time.perf_counter()
+            while not log._listener.queue.empty():
+                time.sleep(0.001)
+            results[-1]["drain_s"] = round(time.perf_counter() - started, 2)
+        log.shutdown_logging()
+        target.close()
+
+    print(f"--- {args.threads} threads, {args.requests} requisições x {args.messages} mensagens, atraso de escrita {args.sink_delay * 1e6:.0f} µs ---")
+    for result in results:
+        print(result)
+
+
+if __name__ == "__main__":
+    main()
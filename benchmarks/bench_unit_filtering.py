@@ -0,0 +1,169 @@
+# /benchmarks/bench_unit_filtering.py
+"""
+Compara, por requisição de planejamento, o filtro de unidades vistas do planner em quatro representações:
+
+- o app (app/seen_units.py): baldes diários como array int32 de índices da tabela de interning; a consulta
+  une os índices num frozenset e o filtro testa o índice de cada candidato (SeenUnits);
+- set de UUIDs por balde: união dos baldes num frozenset + list comprehension;
+- bitset sobre uma tabela de "interning" (UUID -> índice denso): OR dos baldes + teste bit a bit;
+- NumPy (se instalado): baldes como arrays int32 de índices, vistas como array bool do catálogo e
+  filtro vetorizado sobre os índices dos candidatos.
+
+Também mede a memória dos baldes de um aluno. Uma requisição monta o conjunto de vistas uma vez e filtra até `--filters` listas de `--candidates`
+candidatos (dicts novos, como chegam do RPC). Também mede o filtro sobre o catálogo inteiro, onde a
+vetorização compensa, mas que o planner não faz. Em todas as variantes, cada candidato ainda passa por
+uma busca em dict pelo UUID: é esse custo que domina com dezenas de candidatos.
+
+Uso:
+    python -m benchmarks.bench_unit_filtering --catalogue 10000 100000 --seen 300 --active-days 7
+"""
+
+import argparse
+import random
+import sys
+import timeit
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, List
+
+from app.seen_units import SeenUnitsTracker
+from app.unit_index import UnitIndex, unit_index
+
+try:
+    import numpy as np
+except ImportError:  # opcional: só para a variante vetorizada
+    np = None
+
+
+def mask_to_bitmap(mask: int) -> bytes:
+    return mask.to_bytes((mask.bit_length() + 7) >> 3, "little")
+
+
+class BitsetIndex(UnitIndex):
+    """ A tabela de interning do app com o filtro por bitset avaliado (e não adotado) no planner. """
+
+    def mask_of(self, unit_ids: Iterable[str]) -> int:
+        mask = 0
+        for unit_id in unit_ids:
+            mask |= 1 << self.intern(unit_id)
+        return mask
+
+    def exclude(self, units: List[dict], mask: int) -> List[dict]:
+        """ Remove de `units` as unidades cujo índice está em `mask` (teste num bitmap de bytes). """
+        if not mask:
+            return list(units)
+        bitmap = mask_to_bitmap(mask)
+        size = len(bitmap) << 3
+        lookup = self.lookup
+        kept = []
+        for unit in units:
+            index = lookup(unit.get('id'))
+            if index is None or index >= size or not (bitmap[index >> 3] >> (index & 7)) & 1:
+                kept.append(unit)
+        return kept
+
+
+def _bench(fn, number: int) -> float:
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number * 1e6
+
+
+def _fresh(unit_ids: List[str]) -> List[dict]:
+    # Strings recém-decodificadas do JSON, não as mesmas instâncias do catálogo
+    return [{"id": "".join(u)} for u in unit_ids]
+
+
+def run(catalogue_size: int, seen: int, active_days: int, candidates: int, filters: int) -> None:
+    rng = random.Random(catalogue_size)
+    unit_ids = [str(uuid.UUID(int=rng.getrandbits(128))) for _ in range(catalogue_size)]
+    index = BitsetIndex()
+    index.load_catalogue(unit_ids)
+
+    seen_ids = rng.sample(unit_ids, min(seen, catalogue_size))
+    day_ids = [seen_ids[day::active_days] for day in range(active_days)]
+    set_buckets = [{u['id'] for u in _fresh(ids)} for ids in day_ids]
+    mask_buckets = [index.mask_of(ids) for ids in day_ids]
+    batches = [_fresh(rng.sample(unit_ids, candidates)) for _ in range(filters)]
+
+    def with_sets():
+        seen_units = frozenset().union(*set_buckets)
+        return [[u for u in batch if u.get('id') not in seen_units] for batch in batches]
+
+    def with_bitsets():
+        mask = 0
+        for bucket in mask_buckets:
+            mask |= bucket
+        return [index.exclude(batch, mask) for batch in batches]
+
+    unit_index.load_catalogue(unit_ids)
+    tracker = SeenUnitsTracker()
+    now = datetime.now(timezone.utc)
+    user_id = f"aluno-{catalogue_size}"
+    tracker.seen(user_id, 14, lambda: [(u['id'], now - timedelta(days=day)) for day, ids in enumerate(day_ids) for u in _fresh(ids)])
+
+    def with_tracker():
+        seen_units = tracker.seen(user_id, 14, list)
+        return [[u for u in batch if u.get('id') not in seen_units] for batch in batches]
+
+    assert [len(b) for b in with_tracker()] == [len(b) for b in with_sets()]
+    rows = [("app (int32 por balde, SeenUnits)", _bench(with_tracker, 500)),
+            ("set de UUIDs por balde", _bench(with_sets, 500)),
+            ("bitset com interning", _bench(with_bitsets, 500))]
+    memory = [
+        ("app (int32 por balde, SeenUnits)", sum(sys.getsizeof(b) for b in tracker._users[user_id][1].values())),
+        ("set de UUIDs por balde", sum(sys.getsizeof(b) + sum(sys.getsizeof(u) for u in b) for b in set_buckets)),
+        ("bitset com interning", sum(sys.getsizeof(m) for m in mask_buckets)),
+    ]
+
+    if np is not None:
+        array_buckets = [np.fromiter((index.lookup(u) for u in ids), dtype=np.int32, count=len(ids)) for ids in day_ids]
+
+        def with_numpy():
+            seen_flags = np.zeros(len(index), dtype=bool)
+            for bucket in array_buckets:
+                seen_flags[bucket] = True
+            kept = []
+            for batch in batches:
+                indexes = np.fromiter((index.lookup(u.get('id')) for u in batch), dtype=np.int32, count=len(batch))
+                kept.append([u for u, keep in zip(batch, ~seen_flags[indexes]) if keep])
+            return kept
+
+        assert [len(b) for b in with_numpy()] == [len(b) for b in with_sets()]
+        rows.append(("NumPy (índices int32 + array bool)", _bench(with_numpy, 500)))
+        memory.append(("NumPy (índices int32 + array bool)", sum(b.nbytes for b in array_buckets)))
+    assert [len(b) for b in with_bitsets()] == [len(b) for b in with_sets()]
+
+    catalogue_units = [{"id": u} for u in unit_ids]
+    seen_set = frozenset(seen_ids)
+    seen_mask = index.mask_of(seen_ids)
+    catalogue_mask = (1 << catalogue_size) - 1
+    whole = [("set de UUIDs", _bench(lambda: [u for u in catalogue_units if u['id'] not in seen_set], 5)),
+             ("bitset (AND NOT, só a contagem)", _bench(lambda: (catalogue_mask & ~seen_mask).bit_count(), 500))]
+
+    print(f"\n--- catálogo: {catalogue_size} unidades; aluno com {len(seen_ids)} vistas em {active_days} dias ---")
+    print(f"por requisição (monta as vistas + {filters} filtros de {candidates} candidatos):")
+    for name, micros in rows:
+        print(f"  {name:<38} {micros:>10.1f} µs")
+    print("memória dos baldes do aluno:")
+    for name, size in memory:
+        print(f"  {name:<38} {size:>10} bytes")
+    print("catálogo inteiro (não usado pelo planner):")
+    for name, micros in whole:
+        print(f"  {name:<38} {micros:>10.1f} µs")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--catalogue", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--seen", type=int, default=300, help="unidades vistas pelo aluno na janela de 14 dias")
+    parser.add_argument("--active-days", type=int, default=7, help="dias da janela em que o aluno estudou (baldes)")
+    parser.add_argument("--candidates", type=int, default=50)
+    parser.add_argument("--filters", type=int, default=5, help="filtros por requisição (tentativas do funil)")
+    args = parser.parse_args()
+    if np is None:
+        print("NumPy não instalado: a variante vetorizada fica de fora.")
+    for size in args.catalogue:
+        run(size, args.seen, args.active_days, args.candidates, args.filters)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+# /benchmarks/check_hedging.py
+"""
+Confere o comportamento do hedge de requisições ao LLM (app.hedging) contra uma chain falsa com latência
+controlada (sem rede):
+
+- sem atraso acima do limiar, não há hedge (nenhuma chamada extra);
+- a primeira resposta vence (seja a original ou o hedge) e a perdedora é cancelada;
+- uma falha da primeira chamada não derruba o hedge que ainda pode responder;
+- esgotado o orçamento (`HEDGE_BUDGET_RATIO` + rajada), os hedges param e a chamada original segue sozinha;
+- com latência de cauda pesada, o p99 cai e as chamadas extras ficam dentro do orçamento.
+
+Termina com código 1 se qualquer verificação falhar.
+
+Uso:
+    python -m benchmarks.check_hedging --calls 300
+"""
+
+import argparse
+import asyncio
+import math
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+from app import hedging
+from benchmarks.bench_endpoints import percentile
+from benchmarks.bench_hedging import heavy_tailed_sampler
+
+THRESHOLD_SECONDS = 0.1
+
+
+class FakeChain:
+    """ Chain com a latência (e a falha) de cada chamada definida por `plan(número da chamada)`. """
+
+    def __init__(self, plan: Callable[[int], tuple]):
+        self.plan = plan
+        self.calls = 0
+        self.cancelled = 0
+        self._lock = threading.Lock()
+
+    def _next(self) -> tuple:
+        with self._lock:
+            self.calls += 1
+            return (self.calls,) + self.plan(self.calls)
+
+    async def ainvoke(self, inputs):
+        call, latency, fails = self._next()
+        try:
+            await asyncio.sleep(latency)
+        except asyncio.CancelledError:
+            with self._lock:
+                self.cancelled += 1
+            raise
+        if fails:
+            raise RuntimeError(f"falha na chamada {call}")
+        return f"resposta {call}"
+
+    def invoke(self, inputs):
+        call, latency, fails = self._next()
+        time.sleep(latency)
+        if fails:
+            raise RuntimeError(f"falha na chamada {call}")
+        return f"resposta {call}"
+
+
+class FixedTracker(hedging.LatencyTracker):
+    """ Limiar fixo em THRESHOLD_SECONDS: as verificações pontuais não dependem da janela de latências. """
+
+    def record(self, seconds: float) -> None:
+        pass
+
+    def threshold(self) -> Optional[float]:
+        return THRESHOLD_SECONDS
+
+
+def _reset(name: str, ratio: float = 1.0, burst: float = hedging.HEDGE_BUDGET_BURST, adaptive: bool = False) -> None:
+    """ Liga o hedge com orçamento novo e limiar inicial THRESHOLD_SECONDS (fixo, se não for `adaptive`). """
+    hedging.HEDGING_ENABLED = True
+    hedging._budget = hedging.HedgeBudget(ratio, burst)
+    tracker = hedging.LatencyTracker(hedging.HEDGE_PERCENTILE) if adaptive else FixedTracker(hedging.HEDGE_PERCENTILE)
+    for _ in range(hedging.HEDGE_MIN_SAMPLES):
+        tracker.record(THRESHOLD_SECONDS)
+    hedging._trackers[name] = tracker
+
+
+def _wait_cancelled(chain: FakeChain, expected: int) -> int:
+    # O cancelamento da perdedora é entregue no loop do hedge logo depois da resposta
+    deadline = time.monotonic() + 1.0
+    while chain.cancelled < expected and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return chain.cancelled
+
+
+def _timed(chain: FakeChain, name: str) -> tuple:
+    started = time.perf_counter()
+    try:
+        result: Optional[str] = hedging.hedged_invoke(name, chain, {})
+    except Exception as e:
+        result = f"erro: {e}"
+    return result, time.perf_counter() - started
+
+
+def check_fast_call_is_not_hedged() -> List[str]:
+    _reset("fast")
+    chain = FakeChain(lambda call: (0.01, False))
+    result, _ = _timed(chain, "fast")
+    failures = []
+    if result != "resposta 1" or chain.calls != 1:
+        failures.append(f"chamada rápida: esperado 1 chamada e 'resposta 1', obtido {chain.calls} e {result!r}")
+    return failures
+
+
+def check_hedge_wins_and_primary_is_cancelled() -> List[str]:
+    _reset("hedge_wins")
+    chain = FakeChain(lambda call: (2.0, False) if call == 1 else (0.02, False))
+    result, elapsed = _timed(chain, "hedge_wins")
+    failures = []
+    if result != "resposta 2":
+        failures.append(f"hedge vence: esperado 'resposta 2', obtido {result!r}")
+    if elapsed > 0.5:
+        failures.append(f"hedge vence: a chamada demorou {elapsed:.2f}s (a original trava por 2s)")
+    if _wait_cancelled(chain, 1) != 1:
+        failures.append(f"hedge vence: a original não foi cancelada ({chain.cancelled} canceladas)")
+    return failures
+
+
+def check_primary_wins_and_hedge_is_cancelled() -> List[str]:
+    _reset("primary_wins")
+    chain = FakeChain(lambda call: (0.15, False) if call == 1 else (2.0, False))
+    result, elapsed = _timed(chain, "primary_wins")
+    failures = []
+    if result != "resposta 1" or chain.calls != 2:
+        failures.append(f"original vence: esperado 2 chamadas e 'resposta 1', obtido {chain.calls} e {result!r}")
+    if elapsed > 0.5:
+        failures.append(f"original vence: a chamada esperou o hedge ({elapsed:.2f}s)")
+    if _wait_cancelled(chain, 1) != 1:
+        failures.append(f"original vence: o hedge não foi cancelado ({chain.cancelled} canceladas)")
+    return failures
+
+
+def check_failed_primary_falls_back_to_hedge() -> List[str]:
+    _reset("primary_fails")
+    chain = FakeChain(lambda call: (0.15, True) if call == 1 else (0.1, False))
+    result, _ = _timed(chain, "primary_fails")
+    if result != "resposta 2":
+        return [f"original falha: esperado 'resposta 2' do hedge, obtido {result!r}"]
+    return []
+
+
+def check_budget_stops_hedging(calls: int) -> List[str]:
+    ratio, burst = 0.1, 2.0
+    _reset("budget", ratio=ratio, burst=burst)
+    # Todas as chamadas passam do limiar: sem orçamento, cada uma dispararia um hedge
+    chain = FakeChain(lambda call: (THRESHOLD_SECONDS * 1.5, False))
+    for _ in range(calls):
+        result, _ = _timed(chain, "budget")
+        if result.startswith("erro"):
+            return [f"orçamento: chamada falhou ({result})"]
+    hedges = chain.calls - calls
+    allowed = math.floor(burst + ratio * calls)
+    failures = []
+    if hedges > allowed:
+        failures.append(f"orçamento: {hedges} hedges em {calls} chamadas (máximo {allowed})")
+    if hedges < allowed - 1:
+        failures.append(f"orçamento: só {hedges} hedges em {calls} chamadas (esperado ~{allowed})")
+    return failures
+
+
+def check_heavy_tail(calls: int) -> List[str]:
+    random.seed(43)
+    sample = heavy_tailed_sampler(median=0.02, tail_probability=0.05, tail_scale=0.15, max_latency=2.0)
+    ratio = hedging.HEDGE_BUDGET_RATIO
+    p99 = {}
+    extra = 0.0
+    for enabled in (False, True):
+        _reset("heavy_tail", ratio=ratio, adaptive=True)
+        hedging.HEDGING_ENABLED = enabled
+        chain = FakeChain(lambda call: (sample(), False))
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            latencies = [elapsed for _, elapsed in pool.map(lambda _: _timed(chain, "heavy_tail"), range(calls))]
+        p99[enabled] = percentile(latencies, 0.99)
+        extra = (chain.calls - calls) / calls
+    print(f"cauda pesada: p99 sem hedge={p99[False] * 1000:.0f} ms, com hedge={p99[True] * 1000:.0f} ms, "
+          f"chamadas extras={extra:.1%}")
+    failures = []
+    if p99[True] >= p99[False]:
+        failures.append("cauda pesada: o hedge não reduziu o p99")
+    if extra > ratio + hedging.HEDGE_BUDGET_BURST / calls:
+        failures.append(f"cauda pesada: {extra:.1%} de chamadas extras, acima do orçamento de {ratio:.0%}")
+    return failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=300)
+    args = parser.parse_args()
+
+    checks = [
+        ("sem hedge abaixo do limiar", check_fast_call_is_not_hedged),
+        ("hedge vence, original cancelada", check_hedge_wins_and_primary_is_cancelled),
+        ("original vence, hedge cancelado", check_primary_wins_and_hedge_is_cancelled),
+        ("original falha, hedge responde", check_failed_primary_falls_back_to_hedge),
+        ("orçamento esgotado para os hedges", lambda: check_budget_stops_hedging(min(args.calls, 60))),
+        ("cauda pesada", lambda: check_heavy_tail(args.calls)),
+    ]
+    failed = 0
+    for name, check in checks:
+        failures = check()
+        print(f"{'OK   ' if not failures else 'FALHA'} {name}")
+        for failure in failures:
+            print(f"      {failure}")
+        failed += bool(failures)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
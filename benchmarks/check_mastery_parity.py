@@ -0,0 +1,108 @@
+# /benchmarks/check_mastery_parity.py
+"""
+Confere a paridade entre a maestria em memória (app/mastery.py) e a lógica original por contadores
+(`student_topic_mastery`: fraco se erros > acertos nas últimas 5, forte se as últimas 3 forem acertos).
+
+Para cada histórico, o estado é reidratado do banco (RPC recent_topic_answers) e recebe novas respostas
+como no endpoint de respostas (grava no banco e atualiza o estado em memória). Depois de cada resposta,
+os tópicos fracos/fortes do estado em memória são comparados com os calculados a partir da view.
+
+- exaustivo: um tópico, todos os históricos de 0 a `--max-history` respostas seguidos de todas as
+  continuações de 1 a `--max-continuation` respostas;
+- aleatório: `--random-trials` alunos com unidades de 1 ou 2 tópicos (entre 4) e históricos longos.
+
+Termina com código 1 se houver qualquer divergência.
+
+Uso:
+    python -m benchmarks.check_mastery_parity --max-history 8 --max-continuation 3 --random-trials 300
+"""
+
+import argparse
+import itertools
+import random
+import sys
+import uuid
+from typing import Dict, List, Tuple
+
+from benchmarks.standins import FakeSupabase
+
+MULTI_TOPICS = ["articles", "numbers", "greetings", "simple past"]
+
+
+def _catalogue(db: FakeSupabase, topic_sets: List[Tuple[str, ...]]) -> Dict[Tuple[str, ...], str]:
+    units = {topics: str(uuid.uuid4()) for topics in topic_sets}
+    db.tables["learning_units"] = [{"id": unit_id, "metadata": {"level": "A1", "topic": list(topics)}}
+                                   for topics, unit_id in units.items()]
+    return units
+
+
+def _answer(db: FakeSupabase, user_id: str, unit_id: str, is_correct: bool) -> None:
+    db.tables.setdefault("student_performance", []).append(db._prepare_insert(
+        "student_performance", {"user_id": user_id, "unit_id": unit_id, "is_correct": is_correct}))
+
+
+def _counter_summary(db: FakeSupabase, user_id: str) -> Tuple[set, set]:
+    """ get_student_mastery_summary anterior ao estado em memória. """
+    weak, strong = set(), set()
+    for row in db._rows("student_topic_mastery"):
+        if row['user_id'] != user_id:
+            continue
+        if row.get('errors_in_last_5', 0) > row.get('successes_in_last_5', 0):
+            weak.add(row['topic'])
+        elif row.get('successful_streak_in_last_3', 0) >= 3:
+            strong.add(row['topic'])
+    return weak, strong
+
+
+def _run_case(history: List[Tuple[Tuple[str, ...], bool]], continuation: List[Tuple[Tuple[str, ...], bool]],
+              topic_sets: List[Tuple[str, ...]]) -> int:
+    from app.database import get_student_mastery_summary
+    from app.mastery import mastery_store
+    db = FakeSupabase()
+    units = _catalogue(db, topic_sets)
+    user_id = str(uuid.uuid4())
+    for topics, is_correct in history:
+        _answer(db, user_id, units[topics], is_correct)
+    get_student_mastery_summary(db, user_id)  # reidrata o estado do banco
+    mismatches = 0
+    for topics, is_correct in continuation:
+        _answer(db, user_id, units[topics], is_correct)
+        mastery_store.record_answer(user_id, topics, is_correct)
+        summary = get_student_mastery_summary(db, user_id)
+        if (set(summary['weak_topics']), set(summary['strong_topics'])) != _counter_summary(db, user_id):
+            mismatches += 1
+    mastery_store._states.pop(user_id, None)
+    return mismatches
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max-history", type=int, default=8)
+    parser.add_argument("--max-continuation", type=int, default=3)
+    parser.add_argument("--random-trials", type=int, default=300)
+    args = parser.parse_args()
+
+    single = ("simple present",)
+    checks = mismatches = 0
+    for history_length in range(args.max_history + 1):
+        for history in itertools.product([False, True], repeat=history_length):
+            for continuation_length in range(1, args.max_continuation + 1):
+                for continuation in itertools.product([False, True], repeat=continuation_length):
+                    mismatches += _run_case([(single, c) for c in history], [(single, c) for c in continuation], [single])
+                    checks += continuation_length
+    print(f"exaustivo (1 tópico): {checks} comparações, {mismatches} divergências")
+
+    rng = random.Random(31)
+    topic_sets = [(t,) for t in MULTI_TOPICS] + list(itertools.combinations(MULTI_TOPICS, 2))
+    random_checks = random_mismatches = 0
+    for _ in range(args.random_trials):
+        history = [(rng.choice(topic_sets), rng.random() < 0.6) for _ in range(rng.randint(0, 60))]
+        continuation = [(rng.choice(topic_sets), rng.random() < 0.6) for _ in range(10)]
+        random_mismatches += _run_case(history, continuation, topic_sets)
+        random_checks += len(continuation)
+    print(f"aleatório (4 tópicos, unidades com 1-2 tópicos): {random_checks} comparações, {random_mismatches} divergências")
+    sys.exit(1 if mismatches or random_mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
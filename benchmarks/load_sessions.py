@@ -0,0 +1,235 @@
+# /benchmarks/load_sessions.py
+"""
+Gerador de carga com sessões realistas de alunos, para descobrir quantos alunos simultâneos um worker sustenta.
+
+Cada aluno virtual repete a sessão: login -> progresso do plano de estudos -> inicia uma lição de módulo ->
+responde cada exercício (com tempo de reflexão) -> conclui a lição -> conversa com o tutor.
+A carga sobe em degraus (ramp) e, para cada degrau, são medidos latência, vazão, taxa de erro e, no modo
+em processo, a ocupação do threadpool do AnyIO/Starlette.
+
+Uso:
+    python -m benchmarks.load_sessions --max-users 200 --step-users 20 --step-seconds 30
+    python -m benchmarks.load_sessions --url http://localhost:8000 --jwt-secret "$SUPABASE_JWT_SECRET"
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import random
+import sys
+import time
+import uuid
+from typing import Dict, List, Optional
+
+import httpx
+
+from benchmarks.bench_endpoints import percentile
+
+PASS_RATE = 0.7
+
+
+class StageStats:
+    def __init__(self, users: int):
+        self.users = users
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors = 0
+        self.requests = 0
+        self.started = time.perf_counter()
+        self.threadpool_samples: List[tuple] = []
+
+    def record(self, name: str, latency: Optional[float]) -> None:
+        self.requests += 1
+        if latency is None:
+            self.errors += 1
+        else:
+            self.latencies.setdefault(name, []).append(latency)
+
+    def summary(self) -> dict:
+        elapsed = time.perf_counter() - self.started
+        all_latencies = [l for values in self.latencies.values() for l in values]
+        result = {
+            "users": self.users, "requests": self.requests, "errors": self.errors,
+            "error_rate": round(self.errors / self.requests, 4) if self.requests else 0.0,
+            "throughput_rps": round(self.requests / elapsed, 2) if elapsed else 0.0,
+            "p50_ms": round(percentile(all_latencies, 0.50) * 1000, 1),
+            "p95_ms": round(percentile(all_latencies, 0.95) * 1000, 1),
+            "p99_ms": round(percentile(all_latencies, 0.99) * 1000, 1),
+            "per_endpoint_p95_ms": {name: round(percentile(values, 0.95) * 1000, 1) for name, values in self.latencies.items()},
+        }
+        if self.threadpool_samples:
+            result["threadpool"] = {
+                "max_borrowed": max(s[0] for s in self.threadpool_samples),
+                "total_tokens": self.threadpool_samples[-1][1],
+                "max_waiting": max(s[2] for s in self.threadpool_samples),
+            }
+        return result
+
+
+class LoadRun:
+    def __init__(self, client: httpx.AsyncClient, make_token, think_mean: float, stage: StageStats):
+        self.client = client
+        self.make_token = make_token
+        self.think_mean = think_mean
+        self.stage = stage
+        self.stopping = False
+
+    async def _think(self) -> None:
+        if self.think_mean > 0:
+            await asyncio.sleep(random.expovariate(1 / self.think_mean))
+
+    async def _call(self, name: str, method: str, path: str, headers: dict, **kwargs) -> Optional[httpx.Response]:
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, path, headers=headers, **kwargs)
+        except Exception:
+            self.stage.record(name, None)
+            return None
+        self.stage.record(name, time.perf_counter() - started if response.status_code < 400 else None)
+        return response if response.status_code < 400 else None
+
+    async def student_session(self, user_id: str) -> None:
+        headers = {"Authorization": f"Bearer {self.make_token(user_id)}"}
+        progress = await self._call("study_plan_progress", "GET", "/api/v1/study-plan/progress", headers)
+        modules = progress.json().get("modules", []) if progress else []
+        if modules:
+            module_id = random.choice(modules)["module_id"]
+            lesson = await self._call("study_plan_start_lesson", "POST", "/api/v1/study-plan/start-lesson", headers,
+                                      json={"module_id": module_id})
+            if lesson:
+                lesson_data = lesson.json()
+                for item in lesson_data.get("lesson_items", []):
+                    if self.stopping:
+                        return
+                    correct_answer = item.get("content", {}).get("correct_answer")
+                    if correct_answer is None:
+                        continue
+                    await self._think()
+                    answer = correct_answer if random.random() < PASS_RATE else "não sei"
+                    await self._call("lessons_answer", "POST", "/api/v1/lessons/answer", headers,
+                                     json={"lesson_id": lesson_data["lesson_id"], "unit_id": item["id"], "student_response": answer})
+                await self._call("study_plan_complete_lesson", "POST", "/api/v1/study-plan/complete-lesson", headers,
+                                 json={"module_id": module_id})
+        await self._think()
+        await self._call("tutor_interact", "POST", "/api/v1/tutor/interact", headers,
+                         json={"type": "chat_message", "text": random.choice(
+                             ["qual a diferença entre do e does?", "como uso o simple past?", "quero uma lição de simple present"])})
+
+    async def virtual_user(self) -> None:
+        user_id = str(uuid.uuid4())
+        while not self.stopping:
+            await self.student_session(user_id)
+
+
+async def _sample_threadpool(stage_ref: list, interval: float = 0.2) -> None:
+    import anyio.to_thread
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    while True:
+        statistics = limiter.statistics()
+        stage_ref[0].threadpool_samples.append((statistics.borrowed_tokens, statistics.total_tokens, statistics.tasks_waiting))
+        await asyncio.sleep(interval)
+
+
+def detect_saturation(stages: List[dict], knee_factor: float, max_error_rate: float) -> dict:
+    baseline = stages[0]["p95_ms"] if stages else 0
+    report = {"latency_knee_users": None, "throughput_plateau_users": None, "threadpool_exhausted_users": None,
+              "error_rate_exceeded_users": None}
+    for previous, stage in zip([None] + stages[:-1], stages):
+        if report["latency_knee_users"] is None and baseline and stage["p95_ms"] > knee_factor * baseline:
+            report["latency_knee_users"] = stage["users"]
+        if report["throughput_plateau_users"] is None and previous and stage["throughput_rps"] < previous["throughput_rps"] * 1.05:
+            report["throughput_plateau_users"] = stage["users"]
+        threadpool = stage.get("threadpool")
+        if report["threadpool_exhausted_users"] is None and threadpool and threadpool["max_waiting"] > 0:
+            report["threadpool_exhausted_users"] = stage["users"]
+        if report["error_rate_exceeded_users"] is None and stage["error_rate"] > max_error_rate:
+            report["error_rate_exceeded_users"] = stage["users"]
+    return report
+
+
+async def main_async(args) -> dict:
+    llm_server = None
+    if args.url:
+        import jwt
+        client = httpx.AsyncClient(base_url=args.url, timeout=args.timeout)
+
+        def make_token(user_id: str) -> str:
+            return jwt.encode({"sub": user_id, "aud": "authenticated", "exp": int(time.time()) + 3600},
+                              args.jwt_secret, algorithm="HS256")
+    else:
+        from benchmarks.standins import FakeOpenAIServer, FakeSupabase, load_app_with_standins, make_token, seed_catalogue
+        db = FakeSupabase(latency=args.db_latency)
+        seed_catalogue(db)
+        llm_server = FakeOpenAIServer(median_latency=args.llm_latency, sigma=args.llm_sigma).start()
+        app = load_app_with_standins(db, llm_server)
+        if not args.verbose:
+            logging.getLogger("app").setLevel(logging.CRITICAL)
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://load", timeout=args.timeout)
+
+    stages: List[dict] = []
+    stage_ref = [StageStats(0)]
+    runs: List[LoadRun] = []
+    tasks: List[asyncio.Task] = []
+    sampler = asyncio.create_task(_sample_threadpool(stage_ref)) if not args.url else None
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    with quiet:
+        try:
+            users = 0
+            while users < args.max_users:
+                users = min(users + (args.step_users if users else args.start_users), args.max_users)
+                stage = StageStats(users)
+                stage_ref[0] = stage
+                for run in runs:
+                    run.stage = stage
+                while len(runs) < users:
+                    run = LoadRun(client, make_token, args.think_time, stage)
+                    runs.append(run)
+                    tasks.append(asyncio.create_task(run.virtual_user()))
+                await asyncio.sleep(args.step_seconds)
+                stages.append(stage.summary())
+                print(json.dumps(stages[-1]), file=sys.stderr)
+        finally:
+            for run in runs:
+                run.stopping = True
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if sampler:
+                sampler.cancel()
+            await client.aclose()
+            if llm_server:
+                llm_server.stop()
+    return {"stages": stages, "saturation": detect_saturation(stages, args.knee_factor, args.max_error_rate)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="URL de um uvicorn em execução (padrão: aplicação em processo com stand-ins).")
+    parser.add_argument("--jwt-secret", help="Segredo para emitir tokens aceitos pelo servidor em --url.")
+    parser.add_argument("--start-users", type=int, default=10)
+    parser.add_argument("--step-users", type=int, default=10)
+    parser.add_argument("--max-users", type=int, default=100)
+    parser.add_argument("--step-seconds", type=float, default=20)
+    parser.add_argument("--think-time", type=float, default=3.0, help="Tempo médio de reflexão entre exercícios (s).")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--db-latency", type=float, default=0.02)
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--llm-sigma", type=float, default=0.6)
+    parser.add_argument("--knee-factor", type=float, default=2.0, help="p95 acima de N x o p95 do primeiro degrau.")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--output", default="load_results.json")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+    if args.url and not args.jwt_secret:
+        parser.error("--jwt-secret é obrigatório com --url")
+
+    report = asyncio.run(main_async(args))
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report["saturation"], indent=2))
+
+
+if __name__ == "__main__":
+    main()
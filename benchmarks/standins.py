@@ -0,0 +1,621 @@
+# /benchmarks/standins.py
+"""
+Substitutos locais do Supabase e da OpenAI para benchmarks e testes de carga, sem serviços externos.
+
+- `FakeSupabase`: implementa o subconjunto do query builder do supabase-py usado em app/database.py,
+  sobre tabelas em memória, com latência configurável por chamada.
+- `FakeOpenAIServer`: servidor HTTP local compatível com /v1/chat/completions e /v1/embeddings,
+  com latência log-normal configurável (mediana e dispersão).
+"""
+
+import base64
+import hashlib
+import json
+import math
+import random
+import re
+import struct
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional
+
+TOPICS = ["simple present", "simple past", "present continuous", "verb to be", "articles", "plural nouns",
+          "possessive adjectives", "there is there are", "can for ability", "prepositions of place",
+          "greetings", "numbers"]
+ANCHOR_TYPES = ["read_and_answer", "dialogue"]
+EXERCISE_TYPES = ["exercise", "grammar_rule", "review_exercise"]
+
+# Relações usadas nos selects embutidos: (tabela, relação) -> (cardinalidade, coluna local, coluna remota)
+RELATIONS = {
+    ("lesson_items", "learning_units"): ("one", "unit_id", "id"),
+    ("module_items", "learning_units"): ("one", "unit_id", "id"),
+    ("student_performance", "learning_units"): ("one", "unit_id", "id"),
+    ("student_progress", "modules"): ("one", "module_id", "id"),
+    ("lessons", "lesson_items"): ("many", "id", "lesson_id"),
+    ("lessons", "lesson_templates"): ("one", "template_id", "id"),
+    ("lesson_templates", "lesson_template_items"): ("many", "id", "template_id"),
+    ("lesson_template_items", "learning_units"): ("one", "unit_id", "id"),
+}
+
+# Valores padrão preenchidos pelo banco na inserção
+DEFAULTS = {
+    "lessons": {"status": "not_started"},
+    "tutor_messages": {"status": "unread"},
+}
+
+SERIAL_ID_TABLES = {"tutor_messages", "conversation_history"}
+
+# Limite de linhas por resposta do PostgREST (db-max-rows padrão do Supabase)
+MAX_ROWS = 1000
+
+
+class FakeAPIError(Exception):
+    # Mesmo código do PostgREST para .single() sem exatamente uma linha
+    code = "PGRST116"
+
+
+class FakeResponse:
+    def __init__(self, data: Any, count: Optional[int] = None):
+        self.data = data
+        self.count = count
+
+
+def _resolve(row: dict, path: str) -> Any:
+    """ Resolve caminhos como 'metadata->>level' e 'metadata->topic'. """
+    parts = re.split(r"(->>|->)", path)
+    value = row.get(parts[0])
+    for i in range(1, len(parts), 2):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(parts[i + 1])
+        if parts[i] == "->>" and value is not None and not isinstance(value, str):
+            value = json.dumps(value)
+    return value
+
+
+def _split_columns(columns: str) -> List[str]:
+    items, depth, current = [], 0, ""
+    for char in columns:
+        if char == "," and depth == 0:
+            items.append(current.strip())
+            current = ""
+            continue
+        depth += (char == "(") - (char == ")")
+        current += char
+    if current.strip():
+        items.append(current.strip())
+    return items
+
+
+class FakeQuery:
+    def __init__(self, db: "FakeSupabase", table: str):
+        self.db = db
+        self.table = table
+        self.operation = "select"
+        self.columns = "*"
+        self.payload: Any = None
+        self.filters: List[Callable[[dict], bool]] = []
+        self.orders: Dict[Optional[str], List[tuple]] = {}
+        self.limit_count: Optional[int] = None
+        self.row_range: Optional[tuple] = None
+        self.single_mode: Optional[str] = None
+        self.upsert_options: dict = {}
+
+    # --- Operações ---
+    def select(self, columns: str = "*", count: Optional[str] = None) -> "FakeQuery":
+        self.operation, self.columns = "select", columns
+        return self
+
+    def insert(self, data: Any, **kwargs) -> "FakeQuery":
+        self.operation, self.payload = "insert", data
+        return self
+
+    def upsert(self, data: Any, on_conflict: str = "", ignore_duplicates: bool = False, **kwargs) -> "FakeQuery":
+        self.operation, self.payload = "upsert", data
+        self.upsert_options = {"on_conflict": on_conflict, "ignore_duplicates": ignore_duplicates}
+        return self
+
+    def update(self, data: dict, **kwargs) -> "FakeQuery":
+        self.operation, self.payload = "update", data
+        return self
+
+    def delete(self, **kwargs) -> "FakeQuery":
+        self.operation = "delete"
+        return self
+
+    # --- Filtros ---
+    def eq(self, column: str, value: Any) -> "FakeQuery":
+        self.filters.append(lambda row: _resolve(row, column) == value)
+        return self
+
+    def neq(self, column: str, value: Any) -> "FakeQuery":
+        self.filters.append(lambda row: _resolve(row, column) != value)
+        return self
+
+    def gt(self, column: str, value: Any) -> "FakeQuery":
+        self.filters.append(lambda row: _resolve(row, column) is not None and _resolve(row, column) > value)
+        return self
+
+    def gte(self, column: str, value: Any) -> "FakeQuery":
+        self.filters.append(lambda row: _resolve(row, column) is not None and _resolve(row, column) >= value)
+        return self
+
+    def lt(self, column: str, value: Any) -> "FakeQuery":
+        self.filters.append(lambda row: _resolve(row, column) is not None and _resolve(row, column) < value)
+        return self
+
+    def in_(self, column: str, values: list) -> "FakeQuery":
+        allowed = set(values)
+        self.filters.append(lambda row: _resolve(row, column) in allowed)
+        return self
+
+    def contains(self, column: str, value: Any) -> "FakeQuery":
+        expected = json.loads(value) if isinstance(value, str) else value
+        self.filters.append(lambda row: all(v in (_resolve(row, column) or []) for v in expected))
+        return self
+
+    # --- Modificadores ---
+    def order(self, column: str, desc: bool = False, nullsfirst: Optional[bool] = None,
+              foreign_table: Optional[str] = None) -> "FakeQuery":
+        # Recursos aninhados ("a.b") são ordenados pelo nome da relação mais interna
+        self.orders.setdefault(foreign_table.split(".")[-1] if foreign_table else None, []).append((column, desc))
+        return self
+
+    def limit(self, count: int, foreign_table: Optional[str] = None) -> "FakeQuery":
+        self.limit_count = count
+        return self
+
+    def range(self, start: int, end: int) -> "FakeQuery":
+        self.row_range = (start, end)
+        return self
+
+    def single(self) -> "FakeQuery":
+        self.single_mode = "single"
+        return self
+
+    def maybe_single(self) -> "FakeQuery":
+        self.single_mode = "maybe_single"
+        return self
+
+    def execute(self) -> Optional[FakeResponse]:
+        return self.db._execute(self)
+
+
+class FakeRPC:
+    def __init__(self, db: "FakeSupabase", name: str, params: dict):
+        self.db, self.name, self.params = db, name, params
+
+    def execute(self) -> FakeResponse:
+        return self.db._execute_rpc(self.name, self.params)
+
+
+class FakeSupabase:
+    """
+    Cliente Supabase em memória. `latency` (s) é aplicada a cada round trip; selects devolvem no máximo
+    `max_rows` linhas, como o PostgREST.
+    """
+
+    def __init__(self, latency: float = 0.0, max_rows: int = MAX_ROWS):
+        self.latency = latency
+        self.max_rows = max_rows
+        self.tables: Dict[str, List[dict]] = {}
+        self.rpc_handlers: Dict[str, Callable[[dict], Any]] = {
+            "increment_lesson_progress": self._rpc_increment_lesson_progress,
+            "get_recently_seen_unit_ids": self._rpc_get_recently_seen_unit_ids,
+            "match_learning_units": self._rpc_match_learning_units,
+            "try_acquire_lesson_generation_lock": self._rpc_try_acquire_lesson_generation_lock,
+            "complete_lesson": self._rpc_complete_lesson,
+            "create_lesson_from_template": self._rpc_create_lesson_from_template,
+            "recent_topic_answers": self._rpc_recent_topic_answers,
+        }
+        self.round_trips = 0
+        self.rows_written: Dict[str, int] = {}
+        self._serial = 0
+        self._clock = datetime.now(timezone.utc)
+        self._lock = threading.RLock()
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
+
+    def rpc(self, name: str, params: dict) -> FakeRPC:
+        return FakeRPC(self, name, params)
+
+    # --- Infraestrutura ---
+    def _round_trip(self) -> None:
+        self.round_trips += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _now(self) -> str:
+        # Timestamps estritamente crescentes para ordenações determinísticas
+        self._clock = max(self._clock + timedelta(microseconds=1), datetime.now(timezone.utc))
+        return self._clock.isoformat()
+
+    def _rows(self, table: str) -> List[dict]:
+        if table == "student_topic_mastery":
+            return self._student_topic_mastery()
+        return self.tables.setdefault(table, [])
+
+    def _prepare_insert(self, table: str, row: dict) -> dict:
+        new_row = dict(DEFAULTS.get(table, {}))
+        new_row.update(row)
+        if "id" not in new_row:
+            if table in SERIAL_ID_TABLES:
+                self._serial += 1
+                new_row["id"] = self._serial
+            else:
+                new_row["id"] = str(uuid.uuid4())
+        new_row.setdefault("created_at", self._now())
+        self.rows_written[table] = self.rows_written.get(table, 0) + 1
+        return new_row
+
+    def _project(self, table: str, row: dict, columns: str, orders: Dict[Optional[str], List[tuple]]) -> dict:
+        result = {}
+        for column in _split_columns(columns):
+            embedded = re.match(r"^(\w+)\((.*)\)$", column)
+            if column == "*":
+                result.update(row)
+            elif embedded:
+                relation, inner = embedded.group(1), embedded.group(2)
+                kind, local_key, remote_key = RELATIONS[(table, relation)]
+                matches = [r for r in self._rows(relation) if r.get(remote_key) == row.get(local_key)]
+                for key, desc in reversed(orders.get(relation, [])):
+                    matches.sort(key=lambda r: (r.get(key) is None, r.get(key)), reverse=desc)
+                projected = [self._project(relation, r, inner, orders) for r in matches]
+                result[relation] = (projected[0] if projected else None) if kind == "one" else projected
+            else:
+                alias = re.split(r"->>|->", column)[-1]
+                result[alias] = _resolve(row, column)
+        return result
+
+    def _execute(self, query: FakeQuery) -> Optional[FakeResponse]:
+        self._round_trip()
+        with self._lock:
+            rows = self._rows(query.table)
+            if query.operation in ("insert", "upsert"):
+                payload = query.payload if isinstance(query.payload, list) else [query.payload]
+                inserted = []
+                for row in payload:
+                    conflict = query.upsert_options.get("on_conflict")
+                    existing = next((r for r in rows if conflict and all(r.get(c) == row.get(c) for c in conflict.split(","))), None)
+                    if existing is not None:
+                        if not query.upsert_options.get("ignore_duplicates"):
+                            existing.update(row)
+                            inserted.append(dict(existing))
+                        continue
+                    new_row = self._prepare_insert(query.table, row)
+                    rows.append(new_row)
+                    inserted.append(dict(new_row))
+                return FakeResponse(inserted)
+
+            matched = [r for r in rows if all(f(r) for f in query.filters)]
+            if query.operation == "update":
+                for row in matched:
+                    row.update(query.payload)
+                self.rows_written[query.table] = self.rows_written.get(query.table, 0) + len(matched)
+                return FakeResponse([dict(r) for r in matched])
+            if query.operation == "delete":
+                for row in matched:
+                    rows.remove(row)
+                return FakeResponse([dict(r) for r in matched])
+
+            for key, desc in reversed(query.orders.get(None, [])):
+                matched.sort(key=lambda r: (r.get(key) is None, r.get(key)), reverse=desc)
+            if query.row_range:
+                matched = matched[query.row_range[0]:query.row_range[1] + 1]
+            if query.limit_count is not None:
+                matched = matched[:query.limit_count]
+            matched = matched[:self.max_rows]
+            data = [self._project(query.table, r, query.columns, query.orders) for r in matched]
+
+        if query.single_mode:
+            if len(data) > 1 or (query.single_mode == "single" and not data):
+                raise FakeAPIError(f"JSON object requested, multiple (or no) rows returned ({len(data)})")
+            if not data:
+                return None
+            return FakeResponse(data[0])
+        return FakeResponse(data)
+
+    def _execute_rpc(self, name: str, params: dict) -> FakeResponse:
+        self._round_trip()
+        with self._lock:
+            return FakeResponse(self.rpc_handlers[name](params))
+
+    # --- "Views" e funções do banco ---
+    def _student_topic_mastery(self) -> List[dict]:
+        units = {u['id']: u for u in self.tables.get("learning_units", [])}
+        history: Dict[tuple, List[bool]] = {}
+        for answer in sorted(self.tables.get("student_performance", []), key=lambda r: r['created_at']):
+            topics = units.get(answer['unit_id'], {}).get('metadata', {}).get('topic', [])
+            for topic in topics:
+                history.setdefault((answer['user_id'], topic), []).append(bool(answer['is_correct']))
+        rows = []
+        for (user_id, topic), results in history.items():
+            last5, streak = results[-5:], 0
+            for is_correct in reversed(results[-3:]):
+                if not is_correct:
+                    break
+                streak += 1
+            rows.append({"user_id": user_id, "topic": topic, "errors_in_last_5": last5.count(False),
+                         "successes_in_last_5": last5.count(True), "successful_streak_in_last_3": streak})
+        return rows
+
+    def _rpc_recent_topic_answers(self, params: dict) -> List[dict]:
+        """ Mesma semântica de sql/recent_topic_answers.sql. """
+        units = {u['id']: u for u in self.tables.get("learning_units", [])}
+        by_topic: Dict[str, List[dict]] = {}
+        for answer in sorted(self.tables.get("student_performance", []), key=lambda r: r['created_at']):
+            if answer['user_id'] != params['p_user_id']:
+                continue
+            for topic in (units.get(answer['unit_id'], {}).get('metadata') or {}).get('topic', []):
+                by_topic.setdefault(topic, []).append({"topic": topic, "is_correct": answer['is_correct'],
+                                                       "created_at": answer['created_at']})
+        per_topic = params.get('p_per_topic', 5)
+        return [row for topic in sorted(by_topic) for row in by_topic[topic][-per_topic:]]
+
+    def _rpc_increment_lesson_progress(self, params: dict) -> bool:
+        for progress in self.tables.get("student_progress", []):
+            if progress['user_id'] == params['p_user_id'] and progress['module_id'] == params['p_module_id']:
+                progress['current_lesson_order'] += 1
+                return True
+        return False
+
+    def _rpc_get_recently_seen_unit_ids(self, params: dict) -> List[dict]:
+        since = (datetime.now(timezone.utc) - timedelta(days=params['p_days_ago'])).isoformat()
+        seen = {r['unit_id'] for r in self.tables.get("student_performance", [])
+                if r['user_id'] == params['p_user_id'] and r['created_at'] >= since}
+        return [{"unit_id": unit_id} for unit_id in seen]
+
+    def _rpc_try_acquire_lesson_generation_lock(self, params: dict) -> bool:
+        now = datetime.now(timezone.utc)
+        locks = self.tables.setdefault("lesson_generation_locks", [])
+        for lock in locks:
+            if lock['user_id'] == params['p_user_id']:
+                if lock['expires_at'] >= now:
+                    return False
+                locks.remove(lock)
+                break
+        locks.append({"user_id": params['p_user_id'], "owner": params['p_owner'],
+                      "expires_at": now + timedelta(seconds=params['p_ttl_seconds'])})
+        self.rows_written["lesson_generation_locks"] = self.rows_written.get("lesson_generation_locks", 0) + 1
+        return True
+
+    def _rpc_create_lesson_from_template(self, params: dict) -> str:
+        """ Mesma semântica de create_lesson_from_template em sql/lesson_templates.sql. """
+        template_id = lesson_template_id(params['p_unit_ids'])
+        templates = self.tables.setdefault("lesson_templates", [])
+        if not any(t['id'] == template_id for t in templates):
+            templates.append(self._prepare_insert("lesson_templates", {"id": template_id}))
+            items = self.tables.setdefault("lesson_template_items", [])
+            for order, unit_id in enumerate(params['p_unit_ids'], start=1):
+                items.append(self._prepare_insert("lesson_template_items",
+                                                  {"template_id": template_id, "unit_id": unit_id, "item_order": order}))
+        lesson = self._prepare_insert("lessons", {"user_id": params['p_user_id'], "title": params['p_title'],
+                                                  "objective": params['p_objective'], "template_id": template_id})
+        self.tables.setdefault("lessons", []).append(lesson)
+        return lesson['id']
+
+    def _rpc_complete_lesson(self, params: dict) -> List[dict]:
+        """ Mesma semântica de sql/complete_lesson.sql (executa sob o lock do banco, como a transação). """
+        lesson = next((l for l in self.tables.get("lessons", []) if l['id'] == params['p_lesson_id']
+                       and l['user_id'] == params['p_user_id'] and l['status'] != "completed"), None)
+        if lesson is None:
+            return []
+        lesson['status'] = "completed"
+        self.rows_written["lessons"] = self.rows_written.get("lessons", 0) + 1
+        units = {u['id']: u for u in self.tables.get("learning_units", [])}
+        completed = []
+        for item in self.tables.get("lesson_template_items", []):
+            if item['template_id'] == lesson['template_id'] and item['unit_id'] in units:
+                self.tables.setdefault("student_performance", []).append(self._prepare_insert("student_performance", {
+                    "user_id": params['p_user_id'], "lesson_id": lesson['id'], "unit_id": item['unit_id'], "is_correct": True,
+                    "response_data": {"note": "Marked as seen upon lesson completion."}}))
+                completed.append({"unit_id": item['unit_id'],
+                                  "topics": (units[item['unit_id']].get('metadata') or {}).get('topic', [])})
+        return completed
+
+    def _rpc_match_learning_units(self, params: dict) -> List[dict]:
+        query = params['query_embedding']
+        scored = []
+        for unit in self.tables.get("learning_units", []):
+            if unit['metadata'].get('level') != params['p_level']:
+                continue
+            embedding = unit.get('embedding') or []
+            score = sum(a * b for a, b in zip(query, embedding))
+            scored.append((score, unit))
+        scored.sort(key=lambda pair: pair[0], reverse=True)
+        return [{k: v for k, v in unit.items() if k != 'embedding'} for _, unit in scored[:params['match_count']]]
+
+
+def lesson_template_id(unit_ids: List[str]) -> str:
+    """ Equivalente a public.lesson_template_id: sha256 da sequência ordenada de ids. """
+    return hashlib.sha256(",".join(unit_ids).encode("utf-8")).hexdigest()
+
+
+def fake_embedding(text: str, dimensions: int = 64) -> List[float]:
+    """ Embedding determinístico (e normalizado) derivado do hash do texto. """
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    rng = random.Random(seed)
+    vector = [rng.gauss(0, 1) for _ in range(dimensions)]
+    norm = math.sqrt(sum(v * v for v in vector))
+    return [v / norm for v in vector]
+
+
+def seed_catalogue(db: FakeSupabase, units_per_topic: int = 12, modules: int = 4, lessons_per_module: int = 3,
+                   level: str = "A1", dimensions: int = 64) -> None:
+    """ Popula o banco com unidades, dependências, módulos e itens de módulo realistas. """
+    rng = random.Random(7)
+    units, module_rows, module_items = [], [], []
+    for topic in TOPICS:
+        for i in range(units_per_topic):
+            unit_type = ANCHOR_TYPES[i % 2] if i < 2 else EXERCISE_TYPES[i % 3]
+            topics = [topic] + ([rng.choice(TOPICS)] if rng.random() < 0.3 else [])
+            content = {"title": f"{topic.title()} #{i}", "question": f"Pergunta {i} sobre {topic}"}
+            if unit_type in ("exercise", "review_exercise"):
+                content.update({"correct_answer": f"answer {i}", "feedback": {"correct": "Muito bem!", "incorrect": "Quase!"}})
+            units.append({"id": str(uuid.UUID(int=rng.getrandbits(128))), "unit_code": f"{level}-{topic[:3]}-{i}",
+                          "type": unit_type, "content": content,
+                          "metadata": {"level": level, "topic": list(dict.fromkeys(topics)), "dependencies": []},
+                          "embedding": fake_embedding(f"{topic} {i}", dimensions)})
+    # Exercícios dependem da âncora do seu tópico (lições contextuais do planejador)
+    for start in range(0, len(units), units_per_topic):
+        anchors = units[start:start + 2]
+        for unit in units[start + 2:start + units_per_topic]:
+            unit['metadata']['dependencies'] = [rng.choice(anchors)['id']]
+    for m in range(modules):
+        module_id = str(uuid.UUID(int=rng.getrandbits(128)))
+        module_rows.append({"id": module_id, "level": level, "is_published": True, "module_order": m + 1,
+                            "title": f"Módulo {m + 1}", "description": f"Descrição do módulo {m + 1}"})
+        for lesson_order in range(1, lessons_per_module + 1):
+            for item_order, unit in enumerate(rng.sample(units, 5), start=1):
+                module_items.append({"id": str(uuid.uuid4()), "module_id": module_id, "lesson_order": lesson_order,
+                                     "item_order": item_order, "unit_id": unit['id'],
+                                     "lesson_title": f"Módulo {m + 1} - Lição {lesson_order}"})
+    db.tables["learning_units"] = units
+    db.tables["modules"] = module_rows
+    db.tables["module_items"] = module_items
+
+
+# --- Servidor OpenAI local ---
+
+def _chat_reply(messages: List[dict]) -> str:
+    system = next((m['content'] for m in messages if m['role'] == 'system'), "")
+    user = next((m['content'] for m in reversed(messages) if m['role'] == 'user'), "")
+    if "roteia" in system:
+        text = user.lower()
+        topic = next((t for t in TOPICS if t in text), "general-practice")
+        if any(word in text for word in ("lição", "licao", "praticar", "exercício", "lesson")):
+            return json.dumps({"tool_name": "plan_new_lesson", "topic_tag": topic, "needs_history": True})
+        return json.dumps({"tool_name": "general_conversation", "topic_tag": topic, "needs_history": "?" not in text})
+    if "Curriculum Designer" in system:
+        return f"A short lesson practicing {random.choice(TOPICS)} with everyday examples."
+    return "Boa pergunta! Vamos praticar juntos com alguns exemplos simples."
+
+
+class FakeOpenAIServer:
+    """
+    Servidor HTTP local compatível com a API da OpenAI (chat e embeddings).
+    A latência de cada chamada segue uma log-normal: mediana `median_latency`, dispersão `sigma`.
+    """
+
+    def __init__(self, median_latency: float = 0.3, sigma: float = 0.5, dimensions: int = 64,
+                 latency_sampler: Optional[Callable[[], float]] = None):
+        self.median_latency = median_latency
+        self.sigma = sigma
+        self.dimensions = dimensions
+        self.latency_sampler = latency_sampler
+        self.calls = 0
+        self.abandoned = 0
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def sample_latency(self) -> float:
+        if self.latency_sampler:
+            return self.latency_sampler()
+        if self.median_latency <= 0:
+            return 0.0
+        return random.lognormvariate(math.log(self.median_latency), self.sigma)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "FakeOpenAIServer":
+        owner = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                owner.calls += 1
+                time.sleep(owner.sample_latency())
+                if self.path.endswith("/embeddings"):
+                    payload = owner._embeddings(body)
+                else:
+                    payload = owner._chat(body)
+                data = json.dumps(payload).encode("utf-8")
+                try:
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    # O cliente desistiu da chamada (ex.: requisição perdedora de um hedge)
+                    owner.abandoned += 1
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def _chat(self, body: dict) -> dict:
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}", "object": "chat.completion", "created": int(time.time()),
+            "model": body.get("model", "gpt-4o-mini"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": _chat_reply(body.get("messages", []))}}],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 10, "total_tokens": 20},
+        }
+
+    def _embeddings(self, body: dict) -> dict:
+        inputs = body.get("input")
+        inputs = inputs if isinstance(inputs, list) and inputs and not isinstance(inputs[0], int) else [inputs]
+        data = []
+        for i, item in enumerate(inputs):
+            vector = fake_embedding(json.dumps(item), self.dimensions)
+            if body.get("encoding_format") == "base64":
+                encoded = base64.b64encode(struct.pack(f"<{len(vector)}f", *vector)).decode("ascii")
+                data.append({"object": "embedding", "index": i, "embedding": encoded})
+            else:
+                data.append({"object": "embedding", "index": i, "embedding": vector})
+        return {"object": "list", "data": data, "model": body.get("model", "text-embedding-ada-002"),
+                "usage": {"prompt_tokens": 1, "total_tokens": 1}}
+
+
+# --- Montagem da aplicação com os substitutos ---
+
+JWT_SECRET = "local-benchmark-secret"
+
+
+def use_standins(db: FakeSupabase, openai_base_url: str) -> None:
+    """ Aponta o app (get_db e os clientes da OpenAI) para os substitutos, sem importar a aplicação FastAPI. """
+    import os
+    os.environ["SUPABASE_JWT_SECRET"] = JWT_SECRET
+    os.environ["OPENAI_API_KEY"] = "sk-local-standin"
+    os.environ["OPENAI_BASE_URL"] = openai_base_url
+    os.environ["OPENAI_API_BASE"] = openai_base_url
+    from app import agents, database
+    database._supabase_client = db
+    agents._create_embeddings = _offline_embeddings
+
+
+def _offline_embeddings(**client_options):
+    # Sem rede, a tokenização com tiktoken (que baixa o BPE no primeiro uso) falharia: o servidor local aceita texto.
+    from langchain_openai import OpenAIEmbeddings
+    return OpenAIEmbeddings(check_embedding_ctx_length=False, **client_options)
+
+
+def load_app_with_standins(db: FakeSupabase, llm_server: FakeOpenAIServer):
+    """ Configura o ambiente para os substitutos e devolve a aplicação FastAPI (main.app). """
+    use_standins(db, llm_server.base_url)
+    import main
+    return main.app
+
+
+def make_token(user_id: str, ttl: int = 3600) -> str:
+    import jwt
+    claims = {"sub": user_id, "aud": "authenticated", "role": "authenticated", "exp": int(time.time()) + ttl}
+    return jwt.encode(claims, JWT_SECRET, algorithm="HS256")
@@ -1,9 +1,14 @@
 # /main.py
 
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, JSONResponse
 from dotenv import load_dotenv
 from typing import List
+from contextlib import asynccontextmanager
+import math
+import time
+import uuid
 
 # Carrega as variáveis de ambiente do arquivo .env
 load_dotenv()
@@ -12,13 +17,31 @@ load_dotenv()
 from app.agents import tutor_orchestrator, original_process_student_answer
 from app.schemas import UserIntent, AIResponse, AnswerPayload, AnswerResponse, TutorMessage
 from app.dependencies import get_current_user
+from app.admission import admit_tutor_intent
 from app.database import get_db, get_unread_tutor_messages
 from app.study_plan import router as study_plan_router
+from app.tracing import TRACING_ENABLED, start_request_trace, server_timing_header, export_trace
+from app.log import get_logger, request_id_var
+from app.metrics import METRICS_ENABLED, registry, http_request_duration
+from app.deadline import DEADLINE_HEADER, start_deadline, request_timeout
+from app.circuit_breaker import CircuitOpenError
+from app.warmup import start_warmup, warmup_state
+
+logger = get_logger("app.main")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Clientes, pools de conexão e caches aquecidos em background; o /ready só libera o worker ao final (app.warmup)
+    start_warmup()
+    yield
+
 
 app = FastAPI(
     title="EnglishTutor API",
     description="API para a plataforma de aprendizado de inglês EnglishTutor.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configuração do CORS para permitir que o frontend se comunique com a API
@@ -30,14 +53,51 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Cada requisição recebe um id (ou reaproveita o X-Request-ID do cliente) que acompanha todos os registros de log
+# e um prazo (app.deadline) respeitado pelo planner; sua duração vai para o histograma do /metrics, agrupada pelo template da rota.
+@app.middleware("http")
+async def request_context(request: Request, call_next):
+    request_id = request.headers.get("x-request-id") or uuid.uuid4().hex[:16]
+    request_id_var.set(request_id)
+    start_deadline(request_timeout(request.headers.get(DEADLINE_HEADER)))
+    started = time.perf_counter()
+    response = await call_next(request)
+    if METRICS_ENABLED:
+        route = request.scope.get("route")
+        http_request_duration.observe(time.perf_counter() - started, method=request.method,
+                                      route=getattr(route, "path", "unmatched"), status=str(response.status_code))
+    response.headers["X-Request-ID"] = request_id
+    return response
+
+# Rastreamento por requisição: soma o tempo gasto no Supabase e nos chains e devolve no cabeçalho Server-Timing
+if TRACING_ENABLED:
+    @app.middleware("http")
+    async def trace_request(request: Request, call_next):
+        spans = start_request_trace()
+        started = time.perf_counter()
+        response = await call_next(request)
+        total = time.perf_counter() - started
+        response.headers["Server-Timing"] = server_timing_header(spans, total)
+        try:
+            export_trace(request.method, request.url.path, response.status_code, spans, total)
+        except Exception as e:
+            logger.error("ERRO ao exportar o trace: %s", e)
+        return response
+
+# Dependência com o circuito aberto e sem caminho degradado: 503 imediato, com Retry-After até a próxima chamada de teste
+@app.exception_handler(CircuitOpenError)
+async def circuit_open_handler(request: Request, exc: CircuitOpenError):
+    return JSONResponse(status_code=503, content={"detail": "Serviço temporariamente indisponível. Tente novamente em instantes."},
+                        headers={"Retry-After": str(max(1, math.ceil(exc.retry_after)))})
+
 # Inclui os endpoints do Plano de Estudos e outros
 app.include_router(study_plan_router)
 
 # --- ENDPOINTS PRINCIPAIS ---
 
 @app.post("/api/v1/tutor/interact", response_model=AIResponse)
-def interact_with_tutor(intent: UserIntent, user_id: str = Depends(get_current_user)):
-    """ Endpoint unificado para interação com o tutor de IA (Modo Prática). """
+def interact_with_tutor(intent: UserIntent, user_id: str = Depends(admit_tutor_intent)):
+    """ Endpoint unificado para interação com o tutor de IA (Modo Prática). O que pode chamar o LLM passa pelo controle de admissão. """
     supabase = get_db()
     return tutor_orchestrator(supabase, user_id, intent)
 
@@ -62,6 +122,19 @@ def get_tutor_messages(user_id: str = Depends(get_current_user)):
     return messages
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """ Métricas no formato texto do Prometheus. Assíncrono para não ocupar o threadpool que está sendo medido. """
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/ready", include_in_schema=False)
+async def ready():
+    """ Prontidão para o balanceador: 503 até o warm-up da subida terminar, com o resumo das etapas. """
+    summary = warmup_state.summary()
+    return JSONResponse(status_code=200 if summary["ready"] else 503, content=summary)
+
+
 @app.get("/")
 def read_root():
     return {"message": "Welcome to EnglishTutor API v1"}
\ No newline at end of file
@@ -0,0 +1,37 @@
+-- /sql/complete_lesson.sql
+-- Conclusão da lição do Modo Prática numa única transação: muda o status para 'completed', grava as unidades
+-- da lição como vistas (registros sintéticos em student_performance) e devolve essas unidades com seus tópicos.
+-- Só a primeira conclusão grava: repetir a ação não duplica os registros.
+-- Depende de sql/lesson_templates.sql (itens da lição vêm do template).
+
+create or replace function public.complete_lesson(p_lesson_id uuid, p_user_id uuid)
+returns table (unit_id uuid, topics jsonb)
+language plpgsql
+as $$
+#variable_conflict use_column
+declare
+    v_template_id text;
+begin
+    update public.lessons
+    set status = 'completed'
+    where id = p_lesson_id and user_id = p_user_id and status <> 'completed'
+    returning template_id into v_template_id;
+    if not found then
+        return;
+    end if;
+
+    return query
+    with items as (
+        select ti.unit_id, coalesce(lu.metadata -> 'topic', '[]'::jsonb) as topics
+        from public.lesson_template_items ti
+        join public.learning_units lu on lu.id = ti.unit_id
+        where ti.template_id = v_template_id
+    ), seen as (
+        insert into public.student_performance (user_id, lesson_id, unit_id, is_correct, response_data)
+        select p_user_id, p_lesson_id, items.unit_id, true,
+               jsonb_build_object('note', 'Marked as seen upon lesson completion.')
+        from items
+    )
+    select items.unit_id, items.topics from items;
+end;
+$$;
@@ -0,0 +1,24 @@
+-- /sql/lesson_generation_locks.sql
+-- Lock por aluno para a geração de lições entre workers (LESSON_LOCK_BACKEND=supabase).
+-- Um lock expirado (worker que morreu no meio da geração) pode ser tomado por outro worker.
+
+create table if not exists public.lesson_generation_locks (
+    user_id uuid primary key,
+    owner text not null,
+    expires_at timestamptz not null
+);
+
+create or replace function public.try_acquire_lesson_generation_lock(p_user_id uuid, p_owner text, p_ttl_seconds integer)
+returns boolean
+language sql
+as $$
+    with acquired as (
+        insert into public.lesson_generation_locks as l (user_id, owner, expires_at)
+        values (p_user_id, p_owner, now() + make_interval(secs => p_ttl_seconds))
+        on conflict (user_id) do update
+            set owner = excluded.owner, expires_at = excluded.expires_at
+            where l.expires_at < now()
+        returning 1
+    )
+    select exists (select 1 from acquired);
+$$;
@@ -0,0 +1,74 @@
+-- /sql/lesson_templates.sql
+-- Templates de lição endereçados pelo conteúdo: o id é o sha256 da sequência ordenada de ids das unidades.
+-- A lista de itens é gravada uma única vez por template; cada lição do aluno só aponta para o template.
+-- Aplicar antes de sql/complete_lesson.sql. A tabela lesson_items fica só com as lições antigas (pode ser removida
+-- depois do backfill).
+
+create table if not exists public.lesson_templates (
+    id text primary key,
+    created_at timestamptz not null default now()
+);
+
+create table if not exists public.lesson_template_items (
+    template_id text not null references public.lesson_templates(id),
+    unit_id uuid not null references public.learning_units(id),
+    item_order integer not null,
+    primary key (template_id, item_order)
+);
+
+alter table public.lessons add column if not exists template_id text references public.lesson_templates(id);
+
+create or replace function public.lesson_template_id(p_unit_ids uuid[])
+returns text
+language sql
+immutable
+as $$
+    select encode(sha256(convert_to(array_to_string(p_unit_ids, ','), 'UTF8')), 'hex');
+$$;
+
+-- Backfill: as lições existentes passam a apontar para o template dos seus itens
+with lesson_units as (
+    select lesson_id, array_agg(unit_id order by item_order) as unit_ids
+    from public.lesson_items
+    group by lesson_id
+), hashed as (
+    select lesson_id, unit_ids, public.lesson_template_id(unit_ids) as template_id
+    from lesson_units
+), templates as (
+    insert into public.lesson_templates (id)
+    select distinct template_id from hashed
+    on conflict (id) do nothing
+), template_items as (
+    insert into public.lesson_template_items (template_id, unit_id, item_order)
+    select distinct h.template_id, u.unit_id, u.item_order::integer
+    from hashed h, unnest(h.unit_ids) with ordinality as u(unit_id, item_order)
+    on conflict (template_id, item_order) do nothing
+)
+update public.lessons l
+set template_id = h.template_id
+from hashed h
+where l.id = h.lesson_id and l.template_id is null;
+
+-- Cria a lição do aluno num round trip: o template (e seus itens) só é gravado se ainda não existir.
+-- Com duas criações simultâneas do mesmo template, o "on conflict" espera a primeira transação terminar.
+create or replace function public.create_lesson_from_template(p_user_id uuid, p_title text, p_objective text,
+                                                              p_unit_ids uuid[])
+returns uuid
+language plpgsql
+as $$
+declare
+    v_template_id text := public.lesson_template_id(p_unit_ids);
+    v_lesson_id uuid;
+begin
+    insert into public.lesson_templates (id) values (v_template_id) on conflict (id) do nothing;
+    if found then
+        insert into public.lesson_template_items (template_id, unit_id, item_order)
+        select v_template_id, u.unit_id, u.item_order::integer
+        from unnest(p_unit_ids) with ordinality as u(unit_id, item_order);
+    end if;
+    insert into public.lessons (user_id, title, objective, status, template_id)
+    values (p_user_id, p_title, p_objective, 'not_started', v_template_id)
+    returning id into v_lesson_id;
+    return v_lesson_id;
+end;
+$$;
@@ -0,0 +1,25 @@
+-- /sql/recent_topic_answers.sql
+-- Últimas respostas do aluno em cada tópico (até p_per_topic por tópico), em ordem cronológica dentro do tópico.
+-- É a mesma janela usada por student_topic_mastery: a reidratação da maestria em memória (app/mastery.py)
+-- reconstrói a janela exata de cada tópico, por mais respostas que o aluno tenha em outros tópicos.
+
+create or replace function public.recent_topic_answers(p_user_id uuid, p_per_topic integer default 5)
+returns table (topic text, is_correct boolean, created_at timestamptz)
+language sql
+stable
+as $$
+    select ranked.topic, ranked.is_correct, ranked.created_at
+    from (
+        select t.topic, sp.is_correct, sp.created_at,
+               row_number() over (partition by t.topic order by sp.created_at desc) as rn
+        from public.student_performance sp
+        join public.learning_units lu on lu.id = sp.unit_id
+        cross join lateral jsonb_array_elements_text(coalesce(lu.metadata -> 'topic', '[]'::jsonb)) as t(topic)
+        where sp.user_id = p_user_id
+    ) ranked
+    where ranked.rn <= p_per_topic
+    order by ranked.topic, ranked.created_at;
+$$;
+
+create index if not exists student_performance_user_created_idx
+    on public.student_performance (user_id, created_at desc);
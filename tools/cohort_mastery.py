@@ -0,0 +1,154 @@
+# /tools/cohort_mastery.py
+"""
+Calcula a maestria (tópicos fracos/fortes) de todos os alunos de uma vez, a partir de `student_performance`.
+
+Uso:
+    python -m tools.cohort_mastery --output maestria.csv
+    python -m tools.cohort_mastery --input-csv respostas.csv --output maestria.csv
+    python -m tools.cohort_mastery --synthetic-rows 1000000
+
+As respostas são processadas em ordem cronológica por um autômato com tabela de transição: cada par
+(aluno, tópico) guarda um único inteiro que codifica a janela das últimas 5 respostas, e cada resposta
+é uma consulta à tabela. O resultado usa exatamente as regras de `app.mastery`.
+"""
+
+import argparse
+import csv
+import random
+import sys
+import time
+import uuid
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from app.mastery import WINDOW_SIZE, TopicWindow, classify_topic
+
+PAGE_SIZE = 1000
+
+# Estado = length * 2**WINDOW_SIZE + bits. As tabelas são derivadas de TopicWindow para garantir paridade.
+_STATE_COUNT = (WINDOW_SIZE + 1) << WINDOW_SIZE
+
+
+def _build_tables() -> Tuple[List[List[int]], List[tuple]]:
+    transitions = [[0] * _STATE_COUNT, [0] * _STATE_COUNT]
+    counters = [(0, 0, 0)] * _STATE_COUNT
+    for length in range(WINDOW_SIZE + 1):
+        for bits in range(1 << WINDOW_SIZE):
+            state = (length << WINDOW_SIZE) | bits
+            counters[state] = TopicWindow(bits, length).counters()
+            for is_correct in (0, 1):
+                window = TopicWindow(bits, length)
+                window.push(bool(is_correct))
+                transitions[is_correct][state] = (window.length << WINDOW_SIZE) | window.bits
+    return transitions, counters
+
+
+_TRANSITIONS, _COUNTERS = _build_tables()
+
+
+def compute_cohort_mastery(answers: Iterable[tuple], unit_topics: Dict[str, List[str]]) -> Dict[tuple, int]:
+    """
+    `answers`: tuplas (user_id, unit_id, is_correct) em ordem cronológica.
+    Retorna {(user_id, topic): estado codificado da janela}.
+    """
+    on_correct, on_error = _TRANSITIONS[1], _TRANSITIONS[0]
+    states: Dict[tuple, int] = {}
+    get_state = states.get
+    get_topics = unit_topics.get
+    for user_id, unit_id, is_correct in answers:
+        transition = on_correct if is_correct else on_error
+        for topic in get_topics(unit_id, ()):
+            key = (user_id, topic)
+            states[key] = transition[get_state(key, 0)]
+    return states
+
+
+def to_rows(states: Dict[tuple, int]) -> Iterator[tuple]:
+    for (user_id, topic), state in states.items():
+        errors, successes, streak = _COUNTERS[state]
+        yield user_id, topic, errors, successes, streak, classify_topic(errors, successes, streak) or ""
+
+
+def _stream_answers_from_db(supabase) -> Iterator[tuple]:
+    start = 0
+    while True:
+        response = supabase.table("student_performance").select("user_id, unit_id, is_correct").order(
+            "created_at").order("id").range(start, start + PAGE_SIZE - 1).execute()
+        for row in response.data or []:
+            yield row['user_id'], row['unit_id'], row['is_correct']
+        if not response.data or len(response.data) < PAGE_SIZE:
+            return
+        start += PAGE_SIZE
+
+
+def _load_unit_topics_from_db(supabase) -> Dict[str, List[str]]:
+    unit_topics, start = {}, 0
+    while True:
+        response = supabase.table("learning_units").select("id, metadata->topic").range(start, start + PAGE_SIZE - 1).execute()
+        for row in response.data or []:
+            if isinstance(row.get('topic'), list):
+                unit_topics[row['id']] = row['topic']
+        if not response.data or len(response.data) < PAGE_SIZE:
+            return unit_topics
+        start += PAGE_SIZE
+
+
+def _stream_answers_from_csv(path: str) -> Iterator[tuple]:
+    # Colunas esperadas: user_id, unit_id, is_correct, topics (separados por '|'), já em ordem cronológica.
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            yield row['user_id'], row['unit_id'], row['is_correct'].lower() in ("1", "true", "t")
+
+
+def _load_unit_topics_from_csv(path: str) -> Dict[str, List[str]]:
+    with open(path, newline="", encoding="utf-8") as f:
+        return {row['unit_id']: row['topics'].split("|") for row in csv.DictReader(f)}
+
+
+def _synthetic_answers(rows: int, users: int = 20000, units: int = 3000, topics: int = 60) -> Tuple[List[tuple], Dict[str, List[str]]]:
+    rng = random.Random(42)
+    topic_names = [f"topic {i}" for i in range(topics)]
+    unit_ids = [str(uuid.UUID(int=rng.getrandbits(128))) for _ in range(units)]
+    unit_topics = {u: rng.sample(topic_names, rng.choice((1, 1, 2))) for u in unit_ids}
+    user_ids = [str(uuid.UUID(int=rng.getrandbits(128))) for _ in range(users)]
+    answers = [(rng.choice(user_ids), rng.choice(unit_ids), rng.random() < 0.65) for _ in range(rows)]
+    return answers, unit_topics
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Classificação de tópicos fracos/fortes para todos os alunos.")
+    parser.add_argument("--input-csv", help="Respostas exportadas (user_id, unit_id, is_correct, topics).")
+    parser.add_argument("--synthetic-rows", type=int, help="Gera N respostas sintéticas e mede o tempo.")
+    parser.add_argument("--output", help="Arquivo CSV de saída (padrão: stdout).")
+    args = parser.parse_args(argv)
+
+    if args.synthetic_rows:
+        answers, unit_topics = _synthetic_answers(args.synthetic_rows)
+    elif args.input_csv:
+        answers, unit_topics = _stream_answers_from_csv(args.input_csv), _load_unit_topics_from_csv(args.input_csv)
+    else:
+        from dotenv import load_dotenv
+        load_dotenv()
+        from app.database import get_db
+        supabase = get_db()
+        answers, unit_topics = _stream_answers_from_db(supabase), _load_unit_topics_from_db(supabase)
+
+    started = time.perf_counter()
+    states = compute_cohort_mastery(answers, unit_topics)
+    elapsed = time.perf_counter() - started
+
+    if args.output or not args.synthetic_rows:
+        output = open(args.output, "w", newline="", encoding="utf-8") if args.output else sys.stdout
+        try:
+            writer = csv.writer(output)
+            writer.writerow(["user_id", "topic", "errors_in_last_5", "successes_in_last_5",
+                             "successful_streak_in_last_3", "label"])
+            writer.writerows(to_rows(states))
+        finally:
+            if args.output:
+                output.close()
+    print(f"--- [COHORT MASTERY] {len(states)} pares (aluno, tópico) calculados em {elapsed:.2f}s ---", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
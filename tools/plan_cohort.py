@@ -0,0 +1,143 @@
+# /tools/plan_cohort.py
+"""
+Pré-planeja lições do Modo Prática para uma turma inteira, em um pool de processos.
+
+Uso:
+    python -m tools.plan_cohort usuarios.txt --workers 4
+    python -m tools.plan_cohort usuarios.txt --stand-in --stand-in-latency 0.5
+
+Cada worker processa um aluno por vez, então `--workers` é também o limite de chamadas
+simultâneas ao Supabase e à OpenAI. O progresso é gravado (JSONL) em `--state-file`; ao
+reexecutar o comando, alunos já concluídos são pulados.
+
+Com `--stand-in`, o planejador real roda contra os substitutos de benchmarks/standins.py: um
+FakeSupabase com o catálogo de exemplo em cada worker (o banco não é compartilhado entre processos
+nem entre execuções) e um FakeOpenAIServer único, com mediana de `--stand-in-latency` segundos por chamada.
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List, Set
+
+DONE_STATUSES = {"planned", "skipped_active"}
+
+_worker_options: Dict[str, Any] = {}
+
+
+def _init_worker(options: Dict[str, Any]) -> None:
+    global _worker_options
+    _worker_options = options
+    if options['stand_in']:
+        from benchmarks.standins import FakeSupabase, seed_catalogue, use_standins
+        db = FakeSupabase(latency=options['stand_in_db_latency'])
+        seed_catalogue(db, level=options['level'])
+        use_standins(db, options['stand_in_openai_url'])
+        logging.getLogger("app").setLevel(logging.WARNING)
+    else:
+        from dotenv import load_dotenv
+        load_dotenv()
+
+
+def _plan_with_services(user_id: str) -> Dict[str, Any]:
+    from app.database import get_db, get_active_lesson
+    from app.agents import tool_plan_new_lesson
+    supabase = get_db()
+    active_lesson = get_active_lesson(supabase, user_id)
+    if active_lesson:
+        return {"status": "skipped_active", "lesson_id": active_lesson['lesson_id']}
+    lesson = tool_plan_new_lesson(supabase, user_id=user_id, topic_tag=_worker_options['topic'], level=_worker_options['level'])
+    if not lesson:
+        return {"status": "failed", "lesson_id": None}
+    return {"status": "planned", "lesson_id": lesson['lesson_id']}
+
+
+def plan_for_user(user_id: str) -> Dict[str, Any]:
+    started = time.perf_counter()
+    try:
+        result = _plan_with_services(user_id)
+    except Exception as e:
+        result = {"status": "failed", "lesson_id": None, "error": str(e)}
+    result.update({"user_id": user_id, "seconds": round(time.perf_counter() - started, 3)})
+    return result
+
+
+def _read_user_ids(path: str) -> List[str]:
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+def _read_completed(state_file: str) -> Set[str]:
+    if not os.path.exists(state_file):
+        return set()
+    completed = set()
+    with open(state_file, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # Linha truncada por uma interrupção anterior
+            if record.get('status') in DONE_STATUSES:
+                completed.add(record['user_id'])
+    return completed
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Pré-planeja lições para uma lista de alunos.")
+    parser.add_argument("users_file", help="Arquivo com um user_id por linha.")
+    parser.add_argument("--workers", type=int, default=4, help="Processos simultâneos (limite de concorrência).")
+    parser.add_argument("--level", default="A1")
+    parser.add_argument("--topic", default="general-practice")
+    parser.add_argument("--state-file", default="plan_cohort.state.jsonl")
+    parser.add_argument("--stand-in", action="store_true", help="Roda o planejador contra o Supabase e a OpenAI substitutos.")
+    parser.add_argument("--stand-in-latency", type=float, default=1.0, help="Latência mediana de cada chamada à OpenAI substituta (s).")
+    parser.add_argument("--stand-in-db-latency", type=float, default=0.01, help="Latência de cada chamada ao Supabase substituto (s).")
+    args = parser.parse_args(argv)
+
+    user_ids = _read_user_ids(args.users_file)
+    completed = _read_completed(args.state_file)
+    pending = [u for u in dict.fromkeys(user_ids) if u not in completed]
+    print(f"--- [COHORT] {len(user_ids)} alunos, {len(completed)} já concluídos, {len(pending)} pendentes ---")
+    if not pending:
+        return 0
+
+    llm_server = None
+    options = {"stand_in": args.stand_in, "stand_in_db_latency": args.stand_in_db_latency, "level": args.level, "topic": args.topic}
+    if args.stand_in:
+        from benchmarks.standins import FakeOpenAIServer
+        llm_server = FakeOpenAIServer(median_latency=args.stand_in_latency, sigma=0.3).start()
+        options['stand_in_openai_url'] = llm_server.base_url
+    counts: Dict[str, int] = {}
+    started = time.perf_counter()
+    try:
+        with open(args.state_file, "a", encoding="utf-8") as state, \
+                ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker, initargs=(options,)) as pool:
+            futures = [pool.submit(plan_for_user, user_id) for user_id in pending]
+            try:
+                for done, future in enumerate(as_completed(futures), start=1):
+                    result = future.result()
+                    state.write(json.dumps(result) + "\n")
+                    state.flush()
+                    counts[result['status']] = counts.get(result['status'], 0) + 1
+                    print(f"[{done}/{len(pending)}] {result['user_id']}: {result['status']} ({result['seconds']}s)", flush=True)
+            except KeyboardInterrupt:
+                for future in futures:
+                    future.cancel()
+                print("--- [COHORT] Interrompido. Execute novamente para retomar. ---")
+                return 130
+    finally:
+        if llm_server:
+            llm_server.stop()
+
+    elapsed = time.perf_counter() - started
+    processed = sum(counts.values())
+    print(f"--- [COHORT] {processed} alunos em {elapsed:.1f}s ({processed / elapsed:.2f} alunos/s) | {counts} ---")
+    return 0 if not counts.get("failed") else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())